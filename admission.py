@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+Admission control and load shedding for the chat servers.
+
+Detected intents are split into classes with their own concurrency limit:
+- "lookup": greetings and point lookups by purchase order, answered from an
+  index (or the PO cache) in a few milliseconds;
+- "aggregation": everything else, i.e. pipelines that scan the collection
+  (including the item questions, which group every line of an item name).
+
+A burst of aggregations can therefore only occupy ADMISSION_AGGREGATION_LIMIT
+queries at a time (default 4) and never delays the cheap intents, which have
+their own ADMISSION_LOOKUP_LIMIT (default 32). A limit of 0 means unlimited.
+
+A request that finds its class at the limit waits in a bounded queue
+(ADMISSION_QUEUE_SIZE waiting requests over all classes, default 64).
+Interactive requests are admitted before batch requests (header
+X-Request-Priority: batch, or "priority": "batch" in the body) and batch
+requests may only fill ADMISSION_BATCH_QUEUE_SHARE of the queue (default 0.5).
+A request is shed with 429 Too Many Requests and a Retry-After estimate when
+the queue is full or it has waited ADMISSION_QUEUE_TIMEOUT seconds (default 2).
+
+Queue depth, active queries and admission / rejection counts per class are
+reported by stats() (/health, "admission"). ADMISSION_CONTROL=off disables it.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+
+ADMISSION_CONTROL = os.environ.get("ADMISSION_CONTROL", "on") != "off"
+ADMISSION_LOOKUP_LIMIT = int(os.environ.get("ADMISSION_LOOKUP_LIMIT", 32))
+ADMISSION_AGGREGATION_LIMIT = int(os.environ.get("ADMISSION_AGGREGATION_LIMIT", 4))
+ADMISSION_QUEUE_SIZE = int(os.environ.get("ADMISSION_QUEUE_SIZE", 64))
+ADMISSION_BATCH_QUEUE_SHARE = float(os.environ.get("ADMISSION_BATCH_QUEUE_SHARE", 0.5))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", 2.0))
+
+# Intents answered by point lookups; every other intent is an aggregation
+LOOKUP_INTENTS = {
+    "greeting", "purchase_order_details", "purchase_order_items", "purchase_order_supplier", "purchase_order_value",
+}
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+
+class AdmissionRejected(Exception):
+    """
+    A request shed by admission control.
+
+    Args:
+    - reason (str): "queue_full" or "timeout".
+    - retry_after (int): Suggested wait in seconds before retrying.
+    """
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Request rejected ({reason}); retry after {retry_after} s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """
+    One request's place in admission control; granted through its future.
+    """
+
+    def __init__(self, intent_class, priority):
+        self.intent_class = intent_class
+        self.priority = priority
+        self.future = Future()
+        self.queued = time.monotonic()
+        self.started = None
+        self.released = False
+
+
+class IntentClassGate:
+    def __init__(self, name, limit):
+        self.name = name
+        self.limit = limit
+        self.active = 0
+        self.waiting = []  # heap of (priority, sequence, ticket)
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "timeout": 0}
+        self.wait_seconds = 0.0
+        self.service_seconds = 0.0
+        self.completed = 0
+
+    def has_capacity(self):
+        return self.limit <= 0 or self.active < self.limit
+
+    def mean_service_seconds(self):
+        return self.service_seconds / self.completed if self.completed else 1.0
+
+
+class AdmissionController:
+    """
+    Per-intent-class concurrency limits with a shared, bounded, prioritized wait queue.
+
+    Args:
+    - limits (Dict[str, int]): Concurrent queries per class ("lookup", "aggregation"); 0 means unlimited.
+    - queue_size (int): Waiting requests allowed over all classes.
+    - batch_queue_share (float): Share of the queue batch requests may fill.
+    - queue_timeout (float): Seconds a request may wait before it is shed.
+    """
+
+    def __init__(self, limits=None, queue_size=ADMISSION_QUEUE_SIZE, batch_queue_share=ADMISSION_BATCH_QUEUE_SHARE,
+                 queue_timeout=ADMISSION_QUEUE_TIMEOUT):
+        limits = limits or {"lookup": ADMISSION_LOOKUP_LIMIT, "aggregation": ADMISSION_AGGREGATION_LIMIT}
+        self.gates = {name: IntentClassGate(name, limit) for name, limit in limits.items()}
+        self.queue_size = queue_size
+        self.batch_queue_size = int(queue_size * batch_queue_share)
+        self.queue_timeout = queue_timeout
+        self.sequence = itertools.count()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def classify(intent):
+        return "lookup" if intent in LOOKUP_INTENTS else "aggregation"
+
+    def queue_depth(self):
+        return sum(len(gate.waiting) for gate in self.gates.values())
+
+    def _retry_after(self, gate):
+        # Time for the queries running and waiting in this class to drain at the observed service time
+        slots = gate.limit if gate.limit > 0 else max(gate.active, 1)
+        return max(1, math.ceil((gate.active + len(gate.waiting) + 1) * gate.mean_service_seconds() / slots))
+
+    def _grant(self, gate, ticket):
+        gate.admitted += 1
+        ticket.started = time.monotonic()
+        gate.wait_seconds += ticket.started - ticket.queued
+        ticket.future.set_result(True)
+
+    def enqueue(self, intent, priority="interactive"):
+        """
+        Admit a request or queue it behind its class limit.
+
+        Returns:
+        - Ticket: Granted at once (ticket.future done) or when a slot frees up.
+
+        Raises:
+        - AdmissionRejected: The queue is full for this priority.
+        """
+        if priority not in PRIORITIES:
+            priority = "interactive"
+        ticket = Ticket(self.classify(intent), priority)
+        with self.lock:
+            gate = self.gates[ticket.intent_class]
+            if gate.has_capacity() and not gate.waiting:
+                gate.active += 1
+                self._grant(gate, ticket)
+                return ticket
+            capacity = self.queue_size if priority == "interactive" else self.batch_queue_size
+            if self.queue_depth() >= capacity:
+                gate.rejected["queue_full"] += 1
+                raise AdmissionRejected("queue_full", self._retry_after(gate))
+            heapq.heappush(gate.waiting, (PRIORITIES[priority], next(self.sequence), ticket))
+        return ticket
+
+    @staticmethod
+    def _dequeue(gate, ticket):
+        for index, entry in enumerate(gate.waiting):
+            if entry[2] is ticket:
+                gate.waiting.pop(index)
+                heapq.heapify(gate.waiting)
+                return True
+        return False
+
+    def _expire(self, ticket):
+        """
+        Shed a ticket that waited too long, unless it was granted in the meantime.
+        """
+        with self.lock:
+            gate = self.gates[ticket.intent_class]
+            if self._dequeue(gate, ticket):
+                gate.rejected["timeout"] += 1
+                raise AdmissionRejected("timeout", self._retry_after(gate))
+
+    def cancel(self, ticket):
+        """
+        Withdraw a ticket whose request went away: take it off the queue, or release it if already granted.
+        """
+        with self.lock:
+            if self._dequeue(self.gates[ticket.intent_class], ticket):
+                return
+        self.release(ticket)
+
+    def acquire(self, intent, priority="interactive"):
+        """
+        Wait (blocking) until the request may run.
+
+        Raises:
+        - AdmissionRejected: The queue is full or the wait exceeded queue_timeout.
+        """
+        ticket = self.enqueue(intent, priority)
+        try:
+            ticket.future.result(self.queue_timeout)
+        except FutureTimeoutError:
+            self._expire(ticket)
+        return ticket
+
+    async def acquire_async(self, intent, priority="interactive"):
+        """
+        acquire() for coroutines: waits without blocking the event loop.
+        """
+        ticket = self.enqueue(intent, priority)
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(ticket.future)), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._expire(ticket)
+        except asyncio.CancelledError:
+            # The client went away while waiting
+            self.cancel(ticket)
+            raise
+        return ticket
+
+    def release(self, ticket):
+        """
+        Free the ticket's slot for the next waiting request. Releasing twice is a no-op.
+        """
+        with self.lock:
+            if ticket.released or ticket.started is None:
+                return
+            ticket.released = True
+            gate = self.gates[ticket.intent_class]
+            gate.completed += 1
+            gate.service_seconds += time.monotonic() - ticket.started
+            if gate.waiting:
+                # The slot passes straight to the next request, interactive first
+                _, _, waiter = heapq.heappop(gate.waiting)
+                self._grant(gate, waiter)
+            else:
+                gate.active -= 1
+
+    @contextmanager
+    def admit(self, intent, priority="interactive"):
+        ticket = self.acquire(intent, priority)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self):
+        """
+        Returns:
+        - Dict: Queue depth and size, and per class: limit, active, waiting by priority, admitted,
+          rejected by reason, mean queue wait and mean service time.
+        """
+        with self.lock:
+            classes = {}
+            for name, gate in self.gates.items():
+                waiting = [entry[2].priority for entry in gate.waiting]
+                classes[name] = {
+                    "limit": gate.limit,
+                    "active": gate.active,
+                    "waiting": {priority: waiting.count(priority) for priority in PRIORITIES},
+                    "admitted": gate.admitted,
+                    "rejected": dict(gate.rejected),
+                    "mean_wait_ms": round(gate.wait_seconds / gate.admitted * 1000, 2) if gate.admitted else 0.0,
+                    "mean_service_ms": round(gate.service_seconds / gate.completed * 1000, 2) if gate.completed else 0.0,
+                }
+            return {"queue_depth": self.queue_depth(), "queue_size": self.queue_size, "classes": classes}
+
+
+def create_admission_from_env():
+    """
+    The admission controller configured by the ADMISSION_* variables, or None with ADMISSION_CONTROL=off.
+    """
+    if not ADMISSION_CONTROL:
+        return None
+    return AdmissionController()
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+Warm answer cache for the intents whose handlers take only the collection.
+
+Most intents (highest spending quarter, total quantity, acquisition spending,
+cheapest item, top classification code, ...) have no parameters: their answer
+is the same for every user until the data is reloaded. A background warmer
+runs all of these handlers at startup, in a small thread pool, and keeps the
+formatted response bodies, so /chat answers them without any database work.
+
+The warmer checks the dataset version every ANSWER_CACHE_CHECK_INTERVAL
+seconds (default 30) and warms all answers again when it has changed. For a
+MongoDB collection the version is its document count and newest _id, so a
+reload (drop and insert) or an append is noticed; a data source with a
+dataset_version() method provides its own (DuckDBCollection, ColumnarStore,
+PartitionedPurchases). Answers of an older version are no longer served once
+the change is noticed; until they are warmed again those intents are answered
+by their handlers. A source with no version is not cached at all, since its
+answers could never be refreshed.
+
+Cached bodies are shared between requests and must not be mutated.
+
+Warm time, hits and misses, and the age of each answer and of the last
+version check (the most an answer can be out of date) are reported by
+stats() (/health, "answer_cache"). ANSWER_CACHE=off disables the cache;
+ANSWER_CACHE_WORKERS (default 2) bounds the concurrent warm queries.
+
+Usage:
+    ANSWER_CACHE_CHECK_INTERVAL=10 python flask_app_complete_code.py
+"""
+import inspect
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ANSWER_CACHE = os.environ.get("ANSWER_CACHE", "on") != "off"
+ANSWER_CACHE_WORKERS = int(os.environ.get("ANSWER_CACHE_WORKERS", 2))
+ANSWER_CACHE_CHECK_INTERVAL = float(os.environ.get("ANSWER_CACHE_CHECK_INTERVAL", 30))
+
+
+def takes_only_source(handler):
+    """
+    True if the handler can be called with the data source alone (e.g. get_total_quantity(collection) or
+    get_supplier_top_revenue(store, top_n=10)).
+
+    Delegating wrappers (partitioned, columnar fallbacks) must set __wrapped__ (functools.wraps) so the
+    wrapped handler's signature is checked instead of their (source, *args).
+    """
+    try:
+        parameters = list(inspect.signature(handler).parameters.values())
+    except (TypeError, ValueError):
+        return False
+    positional = [p for p in parameters if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD, p.VAR_POSITIONAL)]
+    required = [p for p in parameters if p.default is p.empty and p.kind not in (p.VAR_POSITIONAL, p.VAR_KEYWORD)]
+    return bool(positional) and len(required) == 1 and required[0] is positional[0]
+
+
+def parameterless_intents(intent_map):
+    """
+    The intents of an intent map whose handlers take only the data source, grouped by handler.
+
+    Returns:
+    - Dict[Callable, List[str]]: Intents per handler (e.g. department_spending and
+      department_spending_breakdown share one handler, which is run once).
+    """
+    handlers = {}
+    for intent, handler in intent_map.items():
+        if takes_only_source(handler):
+            handlers.setdefault(handler, []).append(intent)
+    return handlers
+
+
+def dataset_version(source):
+    """
+    Identifies the data the answers were computed from; None if the source cannot tell.
+
+    Returns:
+    - Any: source.dataset_version() if defined; for a MongoDB collection its (document count, newest _id).
+    """
+    # Looked up on the class: attribute access on a pymongo Collection returns a sub-collection
+    if callable(getattr(type(source), "dataset_version", None)):
+        return source.dataset_version()
+    if hasattr(source, "estimated_document_count") and hasattr(source, "find_one"):
+        newest = source.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+        return source.estimated_document_count(), newest["_id"] if newest else None
+    return None
+
+
+class WarmAnswerCache:
+    """
+    Formatted answers to the parameterless intents, warmed in the background and on dataset changes.
+
+    Args:
+    - workers (int): Handlers run concurrently while warming.
+    - check_interval (float): Seconds between dataset version checks.
+    """
+
+    def __init__(self, workers=ANSWER_CACHE_WORKERS, check_interval=ANSWER_CACHE_CHECK_INTERVAL):
+        self.workers = workers
+        self.check_interval = check_interval
+        self.entries = {}  # intent -> {"body", "version", "warmed_at"}
+        self.cacheable = set()
+        self.version = None
+        self.checked_at = None
+        self.warming = False
+        self.unversioned = False
+        self.warms = 0
+        self.last_warm = None
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def get(self, intent):
+        """
+        The cached response body for an intent, or None if it is not cached for the current dataset version.
+        """
+        with self.lock:
+            if intent not in self.cacheable:
+                return None
+            entry = self.entries.get(intent)
+            if entry is None or entry["version"] != self.version:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry["body"]
+
+    def contains(self, intent):
+        """
+        True if a current answer is cached for the intent (not counted as a hit or miss).
+        """
+        with self.lock:
+            entry = self.entries.get(intent)
+            return intent in self.cacheable and entry is not None and entry["version"] == self.version
+
+    def warm(self, source, intent_map, format_answer, version=None):
+        """
+        Run every parameterless handler on the source and cache the formatted answers.
+
+        Args:
+        - source (Any): The data source the handlers take (e.g. the MongoDB collection).
+        - intent_map (Dict[str, Callable]): The intent-function map.
+        - format_answer (Callable): Builds the response body from (intent, handler result).
+        - version (Any): The dataset version the answers are computed from.
+
+        Returns:
+        - Dict: Duration, handlers run, intents cached and failed handlers.
+        """
+        start = time.perf_counter()
+        handlers = parameterless_intents(intent_map)
+        with self.lock:
+            self.cacheable = {intent for intents in handlers.values() for intent in intents}
+        errors = {}
+
+        def run(handler):
+            # Answers that fail to compute or format are left to the handlers at request time
+            bodies = {}
+            try:
+                result = handler(source)
+                for intent in handlers[handler]:
+                    bodies[intent] = format_answer(intent, result)
+            except Exception as e:
+                errors[handler.__name__] = str(e)
+                logging.warning(f"Warming {handler.__name__} failed: {e}")
+            return bodies
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="answer-warmer") as pool:
+            bodies = {intent: body for answers in pool.map(run, handlers) for intent, body in answers.items()}
+
+        warmed_at = time.time()
+        entries = {intent: {"body": body, "version": version, "warmed_at": warmed_at} for intent, body in bodies.items()}
+        summary = {"duration_ms": round((time.perf_counter() - start) * 1000, 2), "handlers": len(handlers),
+                   "intents": len(entries), "errors": errors, "finished_at": warmed_at}
+        with self.lock:
+            self.entries.update(entries)
+            self.warms += 1
+            self.last_warm = summary
+        print(f"Warmed {len(entries)} answers ({len(handlers)} handlers) in {summary['duration_ms']:.0f} ms")
+        return summary
+
+    def check(self, source, intent_map, format_answer):
+        """
+        Warm the answers if the dataset version changed since they were computed (or they never were).
+        """
+        version = dataset_version(source)
+        if version is None:
+            with self.lock:
+                self.checked_at = time.time()
+                self.version = None
+                self.cacheable = set()
+                self.entries.clear()
+                logged, self.unversioned = self.unversioned, True
+            if not logged:
+                logging.warning(f"Answer cache disabled: {type(source).__name__} has no dataset version, "
+                                f"so cached answers could not be refreshed")
+            return
+        with self.lock:
+            self.checked_at = time.time()
+            self.unversioned = False
+            changed = version != self.version or self.warms == 0
+            # Answers of the previous version stop being served right away
+            self.version = version
+            self.warming = changed
+        if changed:
+            try:
+                self.warm(source, intent_map, format_answer, version)
+            finally:
+                self.warming = False
+
+    def start(self, get_source, get_intent_map, format_answer, ready=None):
+        """
+        Warm now and after every dataset change, from a background thread.
+
+        Args:
+        - get_source (Callable): Returns the current data source.
+        - get_intent_map (Callable): Returns the current intent-function map.
+        - format_answer (Callable): Builds the response body from (intent, handler result).
+        - ready (threading.Event): Set once the data source is connected (e.g. the app's startup.ready).
+        """
+        def loop():
+            if ready is not None:
+                while not ready.wait(1):
+                    if self.stopping.is_set():
+                        return
+            while not self.stopping.is_set():
+                try:
+                    self.check(get_source(), get_intent_map(), format_answer)
+                except Exception as e:
+                    logging.warning(f"Answer cache refresh failed: {e}")
+                self.wakeup.wait(self.check_interval)
+                self.wakeup.clear()
+
+        self.stopping.clear()
+        self.thread = threading.Thread(target=loop, name="answer-cache", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop the background warmer once the warm in progress (if any) has finished, e.g. before forking:
+        the cached answers are kept and a forked worker starts its own warmer.
+        """
+        if self.thread is not None:
+            self.stopping.set()
+            self.wakeup.set()
+            self.thread.join()
+            self.thread = None
+
+    def refresh(self):
+        """
+        Check the dataset version now instead of at the next interval (e.g. right after a reload).
+        """
+        self.wakeup.set()
+
+    def stats(self):
+        """
+        Returns:
+        - Dict: Dataset version (and whether the source has none, which disables the cache), seconds since it
+          was last checked, warm runs and the last one's duration, hits and misses (requests for a
+          parameterless intent not cached for the current version), and per intent whether it is current
+          and its age in seconds.
+        """
+        now = time.time()
+        with self.lock:
+            return {
+                "version": str(self.version),
+                "unversioned": self.unversioned,
+                "checked_seconds_ago": round(now - self.checked_at, 1) if self.checked_at else None,
+                "warming": self.warming,
+                "warms": self.warms,
+                "last_warm": dict(self.last_warm) if self.last_warm else None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "intents": {intent: {"current": entry["version"] == self.version,
+                                     "age_seconds": round(now - entry["warmed_at"], 1)}
+                            for intent, entry in sorted(self.entries.items())},
+            }
+
+
+def create_answer_cache_from_env():
+    """
+    The warm answer cache configured by the ANSWER_CACHE_* variables, or None with ANSWER_CACHE=off.
+    """
+    return WarmAnswerCache() if ANSWER_CACHE else None
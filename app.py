@@ -1,16 +1,16 @@
-import logging
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-from transformers import pipeline
-from pymongo import MongoClient
-import json
-from query_functions import *  # Ensure all required functions are defined here
+from startup import STARTUP_MODE, StartupLoader, StartupProfiler, connect_collection, load_intent_pipeline
+profiler = StartupProfiler()
+
+with profiler.phase("imports"):
+    import logging
+    from flask import Flask, request, jsonify
+    from flask_cors import CORS
+    import json
+    from query_functions import *  # Ensure all required functions are defined here
 
 # Database setup
 connection_string = 'mongodb://localhost:27017/'
-client = MongoClient(connection_string)
-db = client['purchases_large']  
-collection = db['purchases_dataset']  
+collection = None  # Set by connect_database()
 
 # Flask app initialization
 app = Flask(__name__)
@@ -19,12 +19,27 @@ app.config['SECRET_KEY'] = 'mysecret'
 
 # Model setup
 model_path = 'procurement_intent_model'  # Path to your model directory
-nlp_model = pipeline("text-classification", model=model_path, tokenizer=model_path)
+nlp_model = None  # Set by load_intent_model()
 
 # Load intent mappings
 with open(f"{model_path}/label_mapping.json", "r") as f:
     label_to_intent = json.load(f)
 
+
+def connect_database():
+    global collection
+    collection = connect_collection(connection_string, 'purchases_large', 'purchases_dataset', profiler)
+
+
+def load_intent_model():
+    global nlp_model
+    nlp_model = load_intent_pipeline(model_path, profiler)
+
+
+# STARTUP_MODE=lazy runs these in a background thread while /health reports not ready (see startup.py)
+startup = StartupLoader(profiler, [(None, connect_database), (None, load_intent_model)]).start(
+    background=STARTUP_MODE == "lazy")
+
 # Intent-to-function mapping
 intent_map = {
     "show_highest_spending_quarter": get_highest_spending_quarter,
@@ -163,9 +178,18 @@ def generate_response(intent, result):
         return "An error occurred while generating the response."
 
 
+# Readiness endpoint
+@app.route('/health', methods=['GET'])
+def health():
+    body, status_code = startup.status()
+    return jsonify(body), status_code
+
 # Chat endpoint
 @app.route('/chat', methods=['POST'])
 def chatbot():
+    if not startup.ready.is_set():
+        return jsonify({"success": False, "message": "The chatbot is still starting up. Please try again shortly."}), 503
+
     data = request.json
     user_input = data.get("message", "")
 
@@ -197,11 +221,11 @@ def chatbot():
 
         # Handle empty results
         if not result:
-            return jsonify({"success": False, "message": "No data found for the query."})
+            return jsonify({"success": False, "intent": intent, "message": "No data found for the query."})
 
         # Generate response
         response_message = generate_response(intent, result)
-        return jsonify({"success": True, "message": response_message, "data": result})
+        return jsonify({"success": True, "intent": intent, "message": response_message, "data": result})
 
     except Exception as e:
         logging.error(f"Error processing request: {e}")
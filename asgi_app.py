@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+Async (ASGI) chat server with the same /chat, /chat/stream and /health contract as flask_app_complete_code.py.
+
+The Flask app handles one message at a time per thread, step after step. Here
+every message is a coroutine:
+- intent detection runs in a small model executor (or on the inference pool,
+  see inference_pool.py), so the event loop never blocks on the model;
+- entity extraction (dates, department, supplier, fiscal year) starts at the
+  same time, since it only needs the message text;
+- the handler query starts as soon as the intent is known, in an I/O executor.
+
+Many conversations are served concurrently by one process. The model, data
+source, intent map and response texts are the ones loaded by
+flask_app_complete_code.py, and responses are encoded by the Flask app's
+response encoder (see serialization.py), so both servers return identical bodies.
+
+ASGI_MODEL_WORKERS (default 2) bounds concurrent model calls; ASGI_IO_WORKERS
+(default 32) bounds concurrent extractions and database queries.
+
+/chat and /chat/stream are traced like the Flask app's (see tracing.py): the
+request's trace follows the work into the executors, responses carry
+Server-Timing and traceparent headers, and a streamed answer's trace is
+exported once its last event has been sent.
+
+Usage:
+    python asgi_app.py --host 127.0.0.1 --port 8000
+    uvicorn asgi_app:app --port 8000
+"""
+import argparse
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask, BackgroundTasks
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+import flask_app_complete_code as chat
+from admission import AdmissionRejected
+from streaming import STREAM_FORMATS, encode_stream, negotiate_format
+from tracing import current_span, span
+
+ASGI_MODEL_WORKERS = int(os.environ.get("ASGI_MODEL_WORKERS", 2))
+ASGI_IO_WORKERS = int(os.environ.get("ASGI_IO_WORKERS", 32))
+
+model_executor = ThreadPoolExecutor(max_workers=ASGI_MODEL_WORKERS, thread_name_prefix="asgi-model")
+io_executor = ThreadPoolExecutor(max_workers=ASGI_IO_WORKERS, thread_name_prefix="asgi-io")
+
+
+def in_context(fn, *args, **kwargs):
+    # run_in_executor does not carry context variables into the thread; the request's trace has to follow
+    return functools.partial(contextvars.copy_context().run, functools.partial(fn, *args, **kwargs))
+
+
+def traced(endpoint):
+    """
+    Run a chat endpoint in a request trace, with Server-Timing and traceparent headers on its response.
+
+    The trace is finished (and exported) by a background task, i.e. after the last byte of the response.
+    """
+    @functools.wraps(endpoint)
+    async def traced_endpoint(request):
+        trace = chat.tracer.start_trace(f"{request.method} {request.url.path}", request.headers.get("traceparent"),
+                                        **{"http.method": request.method, "http.route": request.url.path})
+        trace.activate()
+        try:
+            response = await endpoint(request)
+        except BaseException as e:
+            chat.tracer.finish(trace, e)
+            raise
+        trace.root.set(**{"http.status_code": response.status_code})
+        # For streamed answers this covers the time to the first byte; the end event has the full timing
+        response.headers["Server-Timing"] = trace.server_timing()
+        response.headers["traceparent"] = trace.traceparent()
+        finish = BackgroundTask(chat.tracer.finish, trace)
+        response.background = finish if response.background is None else BackgroundTasks([response.background, finish])
+        return response
+
+    return traced_endpoint
+
+
+def json_response(request, body, status_code=200, orient=None):
+    # Same negotiation and encoding as the Flask app's /chat
+    content, headers = chat.response_encoder.encode(body, request.headers.get("accept"),
+                                                    request.headers.get("accept-encoding"), orient)
+    return Response(content, status_code=status_code, headers=headers)
+
+
+def request_priority(request, data):
+    return request.headers.get("x-request-priority") or data.get("priority") or "interactive"
+
+
+async def admit(request, data, intent):
+    """
+    Admission-control ticket for a streamed answer, or None if it needs none (ADMISSION_CONTROL=off, or a
+    warm answer, which is sent without a slot). The intent must already be routed (see chat.route_intent).
+    """
+    if chat.admission is None or (chat.answer_cache is not None and chat.answer_cache.contains(intent)):
+        return None
+    return await chat.admission.acquire_async(intent, request_priority(request, data))
+
+
+def release(ticket):
+    if ticket is not None:
+        chat.admission.release(ticket)
+
+
+def released_after(chunks, ticket):
+    # In case the stream is closed before its database work is done (stream_answer releases the slot as
+    # soon as it is; releasing twice is a no-op)
+    try:
+        yield from chunks
+    finally:
+        release(ticket)
+
+
+def shed(request, intent, rejection):
+    response = json_response(request, {"success": False, "intent": intent,
+                                       "message": "The server is busy. Please try again shortly."}, 429)
+    response.headers["Retry-After"] = str(rejection.retry_after)
+    return response
+
+
+async def detect(user_input):
+    """
+    Intent and entities of a message, without blocking the event loop.
+    """
+    with span("detect", backend=chat.intent_backend) as detect_span:
+        if chat.inference_pool is not None:
+            intent, entities = await asyncio.wrap_future(chat.inference_pool.submit(user_input))
+        else:
+            loop = asyncio.get_running_loop()
+            intent, entities = await loop.run_in_executor(model_executor, chat.detect_intent_and_entities, user_input)
+        detect_span.set(intent=str(intent), entities=len(entities))
+    # The request's root span
+    current_span().set(intent=str(intent))
+    return intent, entities
+
+
+async def handle_chat(request):
+    if not chat.startup.ready.is_set():
+        return json_response(request, {"success": False,
+                                       "message": "The chatbot is still starting up. Please try again shortly."}, 503)
+
+    data = await request.json()
+    user_input = data.get("message", "")
+    if not user_input:
+        return json_response(request, {"success": False, "message": "Input message is missing."})
+
+    loop = asyncio.get_running_loop()
+    parameters = chat.QueryParameters(user_input)
+    # Entity extraction only needs the text, so it runs while the model is still classifying
+    extraction = loop.run_in_executor(io_executor, in_context(parameters.prefetch))
+    try:
+        intent, entities = await detect(user_input)
+        try:
+            await extraction
+        except Exception as e:
+            # Extraction errors surface again (and are reported) if the intent needs that parameter
+            logging.warning(f"Entity extraction failed: {e}")
+            parameters = chat.QueryParameters(user_input)
+        # Admission is taken in the I/O thread, and only by the call that executes the handler: identical
+        # concurrent questions wait for that execution without a slot (see call_handler)
+        admit_handler = None
+        if chat.admission is not None:
+            priority = request_priority(request, data)
+            admit_handler = lambda: chat.admission.admit(intent, priority)
+        body = await loop.run_in_executor(io_executor, in_context(
+            chat.answer_query, intent, entities, user_input, parameters, admit=admit_handler))
+        return json_response(request, body, orient=data.get("orient"))
+    except AdmissionRejected as e:
+        return shed(request, intent, e)
+    except Exception as e:
+        logging.error(f"Error occurred: {str(e)}")
+        return json_response(request, {"success": False, "message": f"An error occurred: {str(e)}"})
+
+
+async def handle_chat_stream(request):
+    if not chat.startup.ready.is_set():
+        return json_response(request, {"success": False,
+                                       "message": "The chatbot is still starting up. Please try again shortly."}, 503)
+
+    data = await request.json()
+    user_input = data.get("message", "")
+    if not user_input:
+        return json_response(request, {"success": False, "message": "Input message is missing."})
+
+    stream_format = negotiate_format(data.get("format"), request.headers.get("accept"))
+    loop = asyncio.get_running_loop()
+    parameters = chat.QueryParameters(user_input)
+    extraction = loop.run_in_executor(io_executor, in_context(parameters.prefetch))
+    try:
+        intent, entities = await detect(user_input)
+    except Exception as e:
+        logging.error(f"Error occurred: {str(e)}")
+        return json_response(request, {"success": False, "message": f"An error occurred: {str(e)}"})
+    try:
+        await extraction
+    except Exception as e:
+        logging.warning(f"Entity extraction failed: {e}")
+        parameters = chat.QueryParameters(user_input)
+    try:
+        # Admission and the warm-answer check are for the handler that will answer, not the detected intent
+        intent = await loop.run_in_executor(io_executor, in_context(chat.route_intent, intent, parameters))
+    except Exception as e:
+        logging.error(f"Error occurred: {str(e)}")
+        return json_response(request, {"success": False, "message": f"An error occurred: {str(e)}"})
+
+    try:
+        ticket = await admit(request, data, intent)
+    except AdmissionRejected as e:
+        return shed(request, intent, e)
+
+    # Starlette iterates the (blocking) cursor-backed generator in its thread pool, sending each event as it is made
+    events = chat.stream_answer(intent, entities, user_input, parameters, release=lambda: release(ticket))
+    return StreamingResponse(released_after(encode_stream(events, stream_format, chat.dumps_text), ticket),
+                             media_type=STREAM_FORMATS[stream_format], headers={"Cache-Control": "no-cache"},
+                             background=BackgroundTask(release, ticket))
+
+
+async def handle_health(request):
+    body, status_code = chat.startup.status()
+    if chat.inference_pool is not None:
+        body["inference_pool"] = chat.inference_pool.stats()
+    body["responses"] = chat.response_metrics.as_dict()
+    if chat.admission is not None:
+        body["admission"] = chat.admission.stats()
+    if chat.answer_cache is not None:
+        body["answer_cache"] = chat.answer_cache.stats()
+    # Not counted in the per-intent response metrics
+    return Response(chat.dumps(body) + b"\n", status_code=status_code, media_type="application/json")
+
+
+app = Starlette(
+    routes=[Route("/chat", traced(handle_chat), methods=["POST"]),
+            Route("/chat/stream", traced(handle_chat_stream), methods=["POST"]),
+            Route("/health", handle_health, methods=["GET"])],
+    middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])],
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the chat API with an ASGI server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    main()
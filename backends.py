@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Analytics backends for the chat endpoint.
+
+A backend is a data source plus an intent map whose handlers take that source
+as their first argument, exactly like query_functions.intent_map takes a
+MongoDB collection. The chat endpoint only ever calls
+`intent_map[intent](collection, ...)`, so swapping the pair swaps the engine.
+"""
+import os
+
+BACKENDS = ["mongodb", "duckdb", "numpy", "sharded", "partitioned"]
+
+
+def get_backend(name="mongodb", connection_string="mongodb://localhost:27017/", db_name="purchases_large",
+                collection_name="purchases_dataset", parquet_dir="purchases_parquet",
+                columnar_dir="purchases_columnar", shard_mode="fiscal_year"):
+    """
+    Create the data source and intent map for an analytics backend.
+
+    Args:
+    - name (str): "mongodb", "duckdb", "numpy", "sharded" or "partitioned".
+    - connection_string, db_name, collection_name (str): MongoDB location (mongodb backend).
+    - parquet_dir (str): Directory of the partitioned Parquet export (duckdb backend).
+    - columnar_dir (str): Directory of the columnar store (numpy backend); intents it does not implement
+      are delegated to MongoDB.
+    - shard_mode (str): "fiscal_year" or "po_hash" (sharded backend, see sharded_aggregation.py).
+
+    Returns:
+    - Tuple[Any, Dict[str, Callable]]: The data source and its intent-function map.
+    """
+    if name == "mongodb":
+        from pymongo import MongoClient
+        from query_functions import intent_map
+        return MongoClient(connection_string)[db_name][collection_name], intent_map
+
+    if name == "duckdb":
+        from duckdb_backend import DuckDBCollection, duckdb_intent_map
+        if not os.path.isdir(parquet_dir):
+            raise FileNotFoundError(f"Parquet directory '{parquet_dir}' not found. "
+                                    f"Run 'python duckdb_backend.py export' first.")
+        return DuckDBCollection(parquet_dir), duckdb_intent_map
+
+    if name == "numpy":
+        from pymongo import MongoClient
+        from columnar_engine import ColumnarStore, columnar_intent_map
+        if not os.path.isdir(columnar_dir):
+            raise FileNotFoundError(f"Columnar store '{columnar_dir}' not found. "
+                                    f"Run 'python columnar_engine.py build' first.")
+        store = ColumnarStore(columnar_dir, fallback=MongoClient(connection_string)[db_name][collection_name])
+        store.warm()
+        return store, columnar_intent_map
+
+    if name == "sharded":
+        from sharded_aggregation import ShardedExecutor
+        executor = ShardedExecutor(connection_string, db_name, collection_name, mode=shard_mode)
+        return executor.collection, executor.intent_map()
+
+    if name == "partitioned":
+        from pymongo import MongoClient
+        from partitioned_collections import PartitionedPurchases, partitioned_intent_map
+        db = MongoClient(connection_string)[db_name]
+        source = PartitionedPurchases(db, db[collection_name])
+        if not source.catalog:
+            raise FileNotFoundError(f"No partition catalog in '{db_name}'. "
+                                    f"Run 'python partitioned_collections.py build' first.")
+        return source, partitioned_intent_map
+
+    raise ValueError(f"Unknown analytics backend '{name}'. Available backends: {', '.join(BACKENDS)}")
+
+
+def get_backend_from_env():
+    """
+    Select the backend from the ANALYTICS_BACKEND, PARQUET_DIR, COLUMNAR_DIR and SHARD_MODE environment variables.
+    """
+    return get_backend(os.environ.get("ANALYTICS_BACKEND", "mongodb"),
+                       parquet_dir=os.environ.get("PARQUET_DIR", "purchases_parquet"),
+                       columnar_dir=os.environ.get("COLUMNAR_DIR", "purchases_columnar"),
+                       shard_mode=os.environ.get("SHARD_MODE", "fiscal_year"))
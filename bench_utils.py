@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Shared helpers for the benchmark scripts: latency summaries, memory usage,
+JSON reports, baseline comparisons and result comparisons across engines.
+"""
+import json
+import os
+import platform
+import sys
+from datetime import datetime
+
+from latency_stats import percentile, summarize_latencies  # noqa: F401 (re-exported for the benchmarks)
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of the current process in megabytes.
+    """
+    # Unix only, so imported here rather than for every user of this module
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 2)
+
+
+def load_jsonl(path):
+    """
+    Read a JSON-lines file, skipping blank lines.
+    """
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    return records
+
+
+def environment_info():
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def write_report(report, path):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"Report written to {path}")
+
+
+def compare_to_baseline(current, baseline, metrics, key_name="name"):
+    """
+    Build a text table comparing metrics of the current run with a saved baseline.
+
+    Args:
+    - current (List[Dict]): Result rows of the current run.
+    - baseline (List[Dict]): Result rows of the baseline run.
+    - metrics (List[str]): Metric keys to compare.
+    - key_name (str): Key identifying a row in both runs.
+
+    Returns:
+    - str: A formatted comparison table.
+    """
+    baseline_rows = {row[key_name]: row for row in baseline}
+    header = f"{key_name:<40}" + "".join(f"{metric:>24}" for metric in metrics)
+    lines = [header, "-" * len(header)]
+    for row in current:
+        base = baseline_rows.get(row[key_name], {})
+        cells = []
+        for metric in metrics:
+            value, old = row.get(metric), base.get(metric)
+            if isinstance(value, (int, float)) and isinstance(old, (int, float)) and old:
+                cells.append(f"{value:>12.4g} ({(value - old) / old * 100:+6.1f}%)")
+            elif isinstance(value, (int, float)):
+                cells.append(f"{value:>12.4g}          ")
+            else:
+                cells.append(f"{str(value):>22}")
+        lines.append(f"{str(row[key_name]):<40}" + "".join(f"{cell:>24}" for cell in cells))
+    return "\n".join(lines)
+
+
+def normalize_result(value):
+    """
+    Make results from both engines comparable: round floats, stringify dates, drop MongoDB ids.
+    """
+    if isinstance(value, dict):
+        return {key: normalize_result(item) for key, item in value.items() if key != "_id" or isinstance(item, str)}
+    if isinstance(value, (list, tuple)):
+        return [normalize_result(item) for item in value]
+    if isinstance(value, float):
+        return round(value, 2)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def compare_results(expected, actual):
+    expected, actual = normalize_result(expected), normalize_result(actual)
+    if expected == actual:
+        return "identical"
+    if isinstance(expected, list) and isinstance(actual, list):
+        if sorted(map(repr, expected)) == sorted(map(repr, actual)):
+            return "same rows, different order"
+    return "different"
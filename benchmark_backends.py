@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Compare the MongoDB and DuckDB analytics backends intent by intent.
+
+The same synthetic dataset (same rows and seed) is loaded into MongoDB and
+exported to partitioned Parquet, every intent is run on both engines with the
+same parameters, and the report shows median latency, speedup and whether
+the answers match. Before timing, get_total_orders is checked on both engines
+against a count of the Parquet rows by calendar day, for a single-day and a
+fiscal-year question, so a range that drops its last day is reported.
+
+Usage:
+    python benchmark_backends.py --rows 1000000 --output backend_bench.json
+"""
+import argparse
+import os
+import time
+
+from bench_utils import compare_results, environment_info, summarize_latencies, write_report
+from benchmark_queries import ensure_scale, handler_arguments, pick_parameters
+from duckdb_backend import DuckDBCollection, duckdb_intent_map, export_synthetic_to_parquet
+from query_functions import extract_dates_from_query, intent_map
+
+
+def date_range_questions(params):
+    fiscal_year = int(params["fiscal_year"])
+    return [f"How many orders on {params['end_date']}?",
+            f"How many orders in fiscal year {fiscal_year}-{fiscal_year + 1}?"]
+
+
+def check_date_ranges(engines, source, params):
+    """
+    Compare get_total_orders on every engine with the number of rows whose Creation Date falls on one
+    of the days of the extracted range (both ends included).
+
+    Args:
+    - engines (list): (engine, data source) pairs.
+    - source (DuckDBCollection): The Parquet dataset the expected counts are taken from.
+    - params (dict): Parameters from pick_parameters.
+
+    Returns:
+    - list: One dict per question with the expected count and each engine's count.
+    """
+    checks = []
+    for question in date_range_questions(params):
+        start_date, end_date = extract_dates_from_query(question)
+        expected = source.rows('SELECT COUNT(*) AS n FROM purchases '
+                               'WHERE CAST("Creation Date" AS DATE) BETWEEN CAST(? AS DATE) AND CAST(? AS DATE)',
+                               [start_date, end_date])[0]["n"]
+        check = {"question": question, "range": [start_date, end_date], "expected": expected}
+        for engine, handlers, data_source in engines:
+            check[engine] = handlers["total_orders"](data_source, start_date, end_date)
+        check["ok"] = all(check[engine] == expected for engine, _, _ in engines)
+        checks.append(check)
+        print(f"{question:<50}expected {expected:<8}" +
+              "".join(f"{engine} {check[engine]:<8}" for engine, _, _ in engines) +
+              ("ok" if check["ok"] else "MISMATCH"))
+    return checks
+
+
+def time_handler(handler, source, args, repeats):
+    result = handler(source, *args)
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        handler(source, *args)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return result, summarize_latencies(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare MongoDB and DuckDB backends.")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--intents", nargs="*")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/")
+    parser.add_argument("--db", default="purchases_bench")
+    parser.add_argument("--parquet-dir", help="Defaults to purchases_parquet_<rows>.")
+    parser.add_argument("--output", default="backend_bench.json")
+    args = parser.parse_args()
+
+    collection = ensure_scale(args.mongo_uri, args.db, args.rows, args.seed)
+    parquet_dir = args.parquet_dir or f"purchases_parquet_{args.rows}"
+    if not os.path.isdir(parquet_dir):
+        export_synthetic_to_parquet(args.rows, parquet_dir, seed=args.seed)
+    source = DuckDBCollection(parquet_dir)
+    params = pick_parameters(collection)
+    date_checks = check_date_ranges([("mongodb", intent_map, collection), ("duckdb", duckdb_intent_map, source)],
+                                    source, params)
+
+    results = []
+    print(f"{'intent':<40}{'mongodb ms':>12}{'duckdb ms':>12}{'speedup':>10}  match")
+    for intent in args.intents or sorted(intent_map):
+        arguments = handler_arguments(intent, params)
+        row = {"intent": intent}
+        outcomes = {}
+        for engine, handler, data_source in [("mongodb", intent_map[intent], collection),
+                                             ("duckdb", duckdb_intent_map[intent], source)]:
+            try:
+                result, timing = time_handler(handler, data_source, arguments, args.repeats)
+            except Exception as e:
+                row[f"{engine}_error"] = f"{type(e).__name__}: {e}"
+                continue
+            outcomes[engine] = result
+            row[f"{engine}_median_ms"] = timing["p50_ms"]
+            row[f"{engine}_p95_ms"] = timing["p95_ms"]
+
+        if len(outcomes) == 2:
+            row["speedup"] = (round(row["mongodb_median_ms"] / row["duckdb_median_ms"], 2)
+                              if row["duckdb_median_ms"] else None)
+            row["match"] = compare_results(outcomes["mongodb"], outcomes["duckdb"])
+        else:
+            row["match"] = "error"
+        results.append(row)
+        print(f"{intent:<40}{row.get('mongodb_median_ms', '-'):>12}{row.get('duckdb_median_ms', '-'):>12}"
+              f"{row.get('speedup') or '-':>10}  {row['match']}")
+
+    write_report({"environment": environment_info(), "rows": args.rows, "seed": args.seed,
+                  "parameters": params, "date_range_checks": date_checks, "results": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the date extractor against the previous dateparser-based one.
+
+A corpus of date questions (ISO and numeric dates, month names, quarters,
+fiscal years, relative periods, "from X to Y" ranges and questions without
+dates) is generated with the expected range of every question. Both
+extractors are timed over the whole corpus and scored against the expected
+ranges.
+
+Usage:
+    python benchmark_dates.py --size 2000 --output date_bench.json
+    python benchmark_dates.py --corpus date_corpus.jsonl
+    python benchmark_dates.py --write-corpus date_corpus.jsonl
+"""
+import argparse
+import json
+import random
+import re
+import time
+from calendar import monthrange
+from datetime import datetime, timedelta
+
+from bench_utils import environment_info, load_jsonl, summarize_latencies, write_report
+from date_extraction import extract_date_range
+
+MONTH_NAMES = ["january", "february", "march", "april", "may", "june", "july", "august", "september",
+               "october", "november", "december"]
+PREFIXES = ["How many orders were placed", "Total orders", "Show me the number of orders placed",
+            "Count the purchase orders created"]
+
+
+def legacy_extract_dates(query):
+    """
+    The previous extract_dates_from_query (debug prints removed), kept as the benchmark baseline.
+    """
+    from dateparser import parse
+
+    query = query.lower()
+    dates = []
+    now = datetime.now()
+    if "last year" in query:
+        return [datetime(now.year - 1, 1, 1).strftime('%Y-%m-%d'), datetime(now.year - 1, 12, 31).strftime('%Y-%m-%d')]
+    if "this year" in query:
+        return [datetime(now.year, 1, 1).strftime('%Y-%m-%d'), datetime(now.year, 12, 31).strftime('%Y-%m-%d')]
+    if "last month" in query:
+        if now.month == 1:
+            return [datetime(now.year - 1, 12, 1).strftime('%Y-%m-%d'), datetime(now.year - 1, 12, 31).strftime('%Y-%m-%d')]
+        return [datetime(now.year, now.month - 1, 1).strftime('%Y-%m-%d'),
+                (datetime(now.year, now.month, 1) - timedelta(days=1)).strftime('%Y-%m-%d')]
+    if "this month" in query:
+        next_month = datetime(now.year, now.month, 28) + timedelta(days=4)
+        return [datetime(now.year, now.month, 1).strftime('%Y-%m-%d'),
+                (next_month - timedelta(days=next_month.day)).strftime('%Y-%m-%d')]
+
+    range_match = re.search(r'from\s+([\w/-]+)\s+to\s+([\w/-]+)', query)
+    if range_match:
+        try:
+            return [parse(range_match.group(1)).strftime('%Y-%m-%d'), parse(range_match.group(2)).strftime('%Y-%m-%d')]
+        except Exception:
+            pass
+
+    date_patterns = [
+        r'\b\d{4}-\d{2}-\d{2}\b',
+        r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b',
+        r'\b(january|february|march|april|may|june|july|august|september|october|november|december)\s+\d{1,2},?\s+\d{4}\b'
+    ]
+    for pattern in date_patterns:
+        for match in re.findall(pattern, query):
+            try:
+                dates.append(parse(match).strftime('%Y-%m-%d'))
+            except Exception:
+                pass
+    final_dates = sorted(set(dates))
+    if len(final_dates) == 2:
+        return final_dates
+    if len(final_dates) == 1:
+        return [final_dates[0], final_dates[0]]
+    return None
+
+
+def _iso(date):
+    return date.strftime("%Y-%m-%d")
+
+
+def _random_day(rng):
+    year = rng.randint(2012, 2015)
+    month = rng.randint(1, 12)
+    return datetime(year, month, rng.randint(1, monthrange(year, month)[1]))
+
+
+def generate_corpus(size, seed=0, now=None):
+    """
+    Date questions with their expected ranges.
+
+    Returns:
+    - List[Dict]: {"query", "expected"} records; expected is ['YYYY-MM-DD', 'YYYY-MM-DD'] or None.
+    """
+    rng = random.Random(seed)
+    now = now or datetime.now()
+
+    def single(rng):
+        day = _random_day(rng)
+        text = rng.choice([_iso(day), day.strftime("%m/%d/%Y"),
+                           f"{MONTH_NAMES[day.month - 1]} {day.day}, {day.year}"])
+        return f"on {text}", [_iso(day), _iso(day)]
+
+    def date_range(rng):
+        first, second = sorted([_random_day(rng), _random_day(rng)])
+        text = rng.choice([f"from {_iso(first)} to {_iso(second)}",
+                           f"from {first.strftime('%m/%d/%Y')} to {second.strftime('%m/%d/%Y')}",
+                           f"between {_iso(first)} and {_iso(second)}"])
+        return text, [_iso(first), _iso(second)]
+
+    def month_range(rng):
+        # The year is only given on one side ("from March to May 2013")
+        year = rng.randint(2012, 2015)
+        first, last = sorted(rng.sample(range(1, 13), 2))
+        text = rng.choice([f"from {MONTH_NAMES[first - 1]} to {MONTH_NAMES[last - 1]} {year}",
+                           f"from {MONTH_NAMES[first - 1]} {year} to {MONTH_NAMES[last - 1]}"])
+        return text, [_iso(datetime(year, first, 1)), _iso(datetime(year, last, monthrange(year, last)[1]))]
+
+    def since(rng):
+        year, month = rng.randint(2012, 2015), rng.randint(1, 12)
+        return (f"{rng.choice(['since', 'after'])} {MONTH_NAMES[month - 1]} {year}",
+                [_iso(datetime(year, month, 1)), _iso(now)])
+
+    def month(rng):
+        year, month = rng.randint(2012, 2015), rng.randint(1, 12)
+        return (f"in {MONTH_NAMES[month - 1]} {year}",
+                [_iso(datetime(year, month, 1)), _iso(datetime(year, month, monthrange(year, month)[1]))])
+
+    def quarter(rng):
+        year, quarter = rng.randint(2012, 2015), rng.randint(1, 4)
+        end_month = 3 * quarter
+        return (rng.choice([f"in Q{quarter} {year}", f"during {year} Q{quarter}"]),
+                [_iso(datetime(year, end_month - 2, 1)), _iso(datetime(year, end_month, monthrange(year, end_month)[1]))])
+
+    def fiscal_year(rng):
+        year = rng.randint(2012, 2015)
+        return (rng.choice([f"in FY{year}-{(year + 1) % 100:02d}", f"in fiscal year {year}-{year + 1}"]),
+                [_iso(datetime(year, 7, 1)), _iso(datetime(year + 1, 6, 30))])
+
+    def relative(rng):
+        if rng.random() < 0.5:
+            year = now.year - 1 if rng.random() < 0.5 else now.year
+            text = "last year" if year < now.year else "this year"
+            return text, [_iso(datetime(year, 1, 1)), _iso(datetime(year, 12, 31))]
+        index = now.year * 12 + now.month - 1 - (1 if rng.random() < 0.5 else 0)
+        year, month = index // 12, index % 12 + 1
+        text = "last month" if (year, month) != (now.year, now.month) else "this month"
+        return text, [_iso(datetime(year, month, 1)), _iso(datetime(year, month, monthrange(year, month)[1]))]
+
+    def no_date(rng):
+        return rng.choice(["by the Department of Transportation", "for toner cartridges", "overall"]), None
+
+    generators = [single, single, date_range, date_range, month_range, since, month, quarter, fiscal_year, relative,
+                  no_date]
+    corpus = []
+    for _ in range(size):
+        text, expected = rng.choice(generators)(rng)
+        corpus.append({"query": f"{rng.choice(PREFIXES)} {text}?", "expected": expected})
+    return corpus
+
+
+def run_extractor(extract, corpus):
+    latencies, correct = [], 0
+    for record in corpus:
+        start = time.perf_counter()
+        result = extract(record["query"])
+        latencies.append((time.perf_counter() - start) * 1000)
+        correct += result == record["expected"]
+    return {"latency": summarize_latencies(latencies), "total_ms": round(sum(latencies), 2),
+            "accuracy": round(correct / len(corpus), 4) if corpus else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark date extraction.")
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--corpus", help="JSONL corpus with query and expected fields (generated if omitted).")
+    parser.add_argument("--write-corpus", help="Write the generated corpus to this JSONL file and exit.")
+    parser.add_argument("--output", default="date_bench.json")
+    args = parser.parse_args()
+
+    corpus = load_jsonl(args.corpus) if args.corpus else generate_corpus(args.size, args.seed)
+    if args.write_corpus:
+        with open(args.write_corpus, "w", encoding="utf-8") as f:
+            for record in corpus:
+                f.write(json.dumps(record) + "\n")
+        print(f"Wrote {len(corpus)} questions to {args.write_corpus}")
+        return
+
+    # Warm both extractors so import and first-call costs are not counted
+    legacy_extract_dates("from 01/01/2022 to 12/31/2022")
+    extract_date_range("from 01/01/2022 to 12/31/2022")
+
+    results = {"legacy": run_extractor(legacy_extract_dates, corpus),
+               "grammar": run_extractor(extract_date_range, corpus)}
+    speedup = results["legacy"]["total_ms"] / max(results["grammar"]["total_ms"], 1e-9)
+
+    print(f"{'extractor':<12}{'mean ms':>10}{'p99 ms':>10}{'total ms':>12}{'accuracy':>10}")
+    for name, result in results.items():
+        print(f"{name:<12}{result['latency']['mean_ms']:>10.4f}{result['latency']['p99_ms']:>10.4f}"
+              f"{result['total_ms']:>12.1f}{result['accuracy']:>10.2%}")
+    print(f"Speedup: {speedup:.1f}x over {len(corpus)} questions")
+
+    write_report({"environment": environment_info(), "questions": len(corpus), "results": results,
+                  "speedup": round(speedup, 2)}, args.output)
+
+
+if __name__ == "__main__":
+    main()
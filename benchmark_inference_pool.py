@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Sweep inference-pool settings (replicas x threads per replica) on this host.
+
+For every combination the pool is started, warmed up, and driven by a closed
+loop of concurrent clients sending messages from the intent CSV. The report
+lists throughput, latency percentiles and mean replica utilization per
+setting, the setting with the best throughput (optionally among those meeting
+a p95 target) and the one with the lowest p95.
+
+Usage:
+    python benchmark_inference_pool.py --replicas 1 2 4 --threads 1 2 4 --clients 16 --duration 20
+    python benchmark_inference_pool.py --backend index --pin auto --p95-target-ms 50 --output pool_sweep.json
+"""
+import argparse
+import itertools
+import os
+import threading
+import time
+
+from bench_utils import environment_info, summarize_latencies, write_report
+from benchmark_intents import load_benchmark_messages
+from inference_pool import InferencePool
+
+
+def drive(pool, messages, clients, duration, warmup):
+    """
+    Closed-loop load: each client sends its next message as soon as the previous answer arrives.
+
+    Returns:
+    - Dict: Requests, errors, throughput and latency summary.
+    """
+    for message in messages[:warmup]:
+        pool.predict(message)
+
+    cursor = itertools.cycle(messages)
+    cursor_lock = threading.Lock()
+    latencies, errors = [], [0]
+    results_lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client():
+        while time.perf_counter() < stop_at:
+            with cursor_lock:
+                message = next(cursor)
+            start = time.perf_counter()
+            try:
+                pool.predict(message)
+                failed = False
+            except Exception:
+                failed = True
+            elapsed = (time.perf_counter() - start) * 1000
+            with results_lock:
+                if failed:
+                    errors[0] += 1
+                else:
+                    latencies.append(elapsed)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {"requests": len(latencies), "errors": errors[0],
+            "throughput_msg_s": round(len(latencies) / elapsed, 2), **summarize_latencies(latencies)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep inference-pool replicas x threads.")
+    parser.add_argument("--backend", default="pipeline", help="pipeline, index or joint.")
+    parser.add_argument("--replicas", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--pin", help='Core pinning: "auto" or None (no pinning).')
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--warmup", type=int, default=16)
+    parser.add_argument("--oversubscribe", action="store_true", help="Also run settings with replicas x threads > cores.")
+    parser.add_argument("--p95-target-ms", type=float, help="Pick the best throughput among settings meeting this p95.")
+    parser.add_argument("--csv", default="updated_balanced_procurement_intents.csv")
+    parser.add_argument("--output", default="pool_sweep.json")
+    args = parser.parse_args()
+
+    messages, _ = load_benchmark_messages(args.csv)
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+
+    results = []
+    print(f"{'replicas':>8}{'threads':>8}{'msg/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'util':>8}")
+    for replicas, threads in itertools.product(args.replicas, args.threads):
+        if replicas * threads > cores and not args.oversubscribe:
+            print(f"{replicas:>8}{threads:>8}  skipped ({replicas * threads} threads > {cores} cores)")
+            continue
+        pool = InferencePool(args.backend, replicas, threads, args.pin).start()
+        try:
+            load = drive(pool, messages, args.clients, args.duration, args.warmup)
+            stats = pool.stats()
+        finally:
+            pool.close()
+        utilization = round(sum(r["utilization"] for r in stats) / len(stats), 4)
+        results.append({"replicas": replicas, "threads": threads, "pinned": bool(args.pin), **load,
+                        "mean_utilization": utilization, "per_replica": stats})
+        print(f"{replicas:>8}{threads:>8}{load['throughput_msg_s']:>10.1f}{load['p50_ms']:>10.2f}"
+              f"{load['p95_ms']:>10.2f}{load['p99_ms']:>10.2f}{utilization:>8.0%}")
+
+    eligible = [r for r in results if args.p95_target_ms is None or r["p95_ms"] <= args.p95_target_ms]
+    best = max(eligible, key=lambda r: r["throughput_msg_s"]) if eligible else None
+    lowest_latency = min(results, key=lambda r: r["p95_ms"]) if results else None
+    if best:
+        print(f"Best throughput: {best['replicas']} replicas x {best['threads']} threads "
+              f"({best['throughput_msg_s']} msg/s, p95 {best['p95_ms']} ms)")
+    if lowest_latency:
+        print(f"Lowest p95: {lowest_latency['replicas']} replicas x {lowest_latency['threads']} threads "
+              f"({lowest_latency['p95_ms']} ms)")
+
+    write_report({"environment": environment_info(), "backend": args.backend, "clients": args.clients,
+                  "duration_s": args.duration, "cores": cores, "results": results,
+                  "best": {"replicas": best["replicas"], "threads": best["threads"]} if best else None,
+                  "lowest_p95": ({"replicas": lowest_latency["replicas"], "threads": lowest_latency["threads"]}
+                                 if lowest_latency else None)}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Intent-model benchmark: accuracy and latency per classifier backend.
+
+Loads updated_balanced_procurement_intents.csv (plus an optional replay file of
+chat messages in JSON-lines format, one {"message": ..., "intent": ...} object
+per line) and runs every available backend single-message and batched. Each
+backend runs in its own process so model load time and peak RSS are measured
+in isolation.
+
+Usage:
+    python benchmark_intents.py --output intent_bench.json --baseline intent_baseline.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue as queue_module
+import time
+
+import pandas as pd
+
+from bench_utils import (compare_to_baseline, environment_info, load_jsonl, peak_rss_mb,
+                         summarize_latencies, write_report)
+
+BACKENDS = ["pipeline", "index", "joint"]
+# Seconds between checks that an isolated benchmark process is still alive
+ISOLATED_POLL_INTERVAL = 1.0
+
+
+# Backend adapters
+class PipelineBackend:
+    def __init__(self, model_path="procurement_intent_model"):
+        from transformers import pipeline
+        self.nlp_model = pipeline("text-classification", model=model_path, tokenizer=model_path)
+        with open(f"{model_path}/label_mapping.json", "r") as f:
+            self.label_to_intent = json.load(f)
+
+    def predict_batch(self, texts):
+        results = self.nlp_model(list(texts))
+        return [self.label_to_intent.get(result["label"].replace("LABEL_", "")) for result in results]
+
+
+class IndexBackend:
+    def __init__(self):
+        from intent_index import IntentIndex
+        self.index = IntentIndex().load()
+
+    def predict_batch(self, texts):
+        return self.index.classify(list(texts))
+
+
+class JointBackend:
+    def __init__(self):
+        from joint_model import JointPredictor
+        self.predictor = JointPredictor()
+
+    def predict_batch(self, texts):
+        return [self.predictor.predict(text)[0] for text in texts]
+
+
+BACKEND_FACTORIES = {"pipeline": PipelineBackend, "index": IndexBackend, "joint": JointBackend}
+BACKEND_PATHS = {"pipeline": "procurement_intent_model", "index": "intent_index", "joint": "procurement_joint_model"}
+
+
+def available_backends():
+    return [name for name in BACKENDS if os.path.isdir(BACKEND_PATHS[name])]
+
+
+# Metrics
+def accuracy_and_macro_f1(expected, predicted):
+    """
+    Compute accuracy and macro-averaged F1 over the labelled examples.
+    """
+    pairs = [(e, p) for e, p in zip(expected, predicted) if e is not None]
+    if not pairs:
+        return None, None
+    accuracy = sum(e == p for e, p in pairs) / len(pairs)
+
+    f1_scores = []
+    for label in sorted({e for e, _ in pairs}):
+        tp = sum(e == label and p == label for e, p in pairs)
+        fp = sum(e != label and p == label for e, p in pairs)
+        fn = sum(e == label and p != label for e, p in pairs)
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        f1_scores.append(2 * precision * recall / (precision + recall) if precision + recall else 0.0)
+    return round(accuracy, 4), round(sum(f1_scores) / len(f1_scores), 4)
+
+
+def load_benchmark_messages(csv_path, replay_path=None):
+    """
+    Returns:
+    - Tuple[List[str], List[str]]: Messages and their expected intents (None when unlabelled).
+    """
+    df = pd.read_csv(csv_path).dropna(subset=["user_input", "intent"])
+    messages, intents = df["user_input"].tolist(), df["intent"].tolist()
+    if replay_path:
+        for record in load_jsonl(replay_path):
+            message = record.get("message") or record.get("user_input")
+            if message:
+                messages.append(message)
+                intents.append(record.get("intent"))
+    return messages, intents
+
+
+def run_backend(name, messages, intents, batch_size, warmup):
+    """
+    Benchmark one backend in the current process.
+    """
+    start = time.perf_counter()
+    backend = BACKEND_FACTORIES[name]()
+    load_time = time.perf_counter() - start
+
+    backend.predict_batch(messages[:warmup])
+
+    single_latencies, predictions = [], []
+    single_start = time.perf_counter()
+    for message in messages:
+        t0 = time.perf_counter()
+        predictions.extend(backend.predict_batch([message]))
+        single_latencies.append((time.perf_counter() - t0) * 1000)
+    single_elapsed = time.perf_counter() - single_start
+
+    batch_latencies = []
+    batch_start = time.perf_counter()
+    for offset in range(0, len(messages), batch_size):
+        t0 = time.perf_counter()
+        backend.predict_batch(messages[offset:offset + batch_size])
+        batch_latencies.append((time.perf_counter() - t0) * 1000)
+    batch_elapsed = time.perf_counter() - batch_start
+
+    accuracy, macro_f1 = accuracy_and_macro_f1(intents, predictions)
+    single = summarize_latencies(single_latencies)
+    batched = summarize_latencies(batch_latencies)
+    return {
+        "name": name,
+        "accuracy": accuracy,
+        "macro_f1": macro_f1,
+        "load_time_s": round(load_time, 3),
+        "peak_rss_mb": peak_rss_mb(),
+        "single_p50_ms": single["p50_ms"],
+        "single_p95_ms": single["p95_ms"],
+        "single_p99_ms": single["p99_ms"],
+        "single_throughput_msg_s": round(len(messages) / single_elapsed, 2) if single_elapsed else None,
+        "batch_size": batch_size,
+        "batch_p50_ms": batched["p50_ms"],
+        "batch_p95_ms": batched["p95_ms"],
+        "batch_p99_ms": batched["p99_ms"],
+        "batch_throughput_msg_s": round(len(messages) / batch_elapsed, 2) if batch_elapsed else None,
+    }
+
+
+def _run_backend_worker(queue, *args):
+    try:
+        queue.put(run_backend(*args))
+    except Exception as e:
+        queue.put({"name": args[0], "error": str(e)})
+
+
+def run_isolated(name, messages, intents, batch_size, warmup, timeout=None):
+    """
+    Run a backend benchmark in a fresh process so peak RSS and load time are not shared.
+
+    Returns:
+    - Dict: The backend's results, or {"name", "error"} if the process died (e.g. killed for running out of
+      memory) or ran longer than timeout seconds.
+    """
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_run_backend_worker,
+                              args=(queue, name, messages, intents, batch_size, warmup))
+    process.start()
+    deadline = time.monotonic() + timeout if timeout else None
+    result = None
+    while result is None:
+        try:
+            result = queue.get(timeout=ISOLATED_POLL_INTERVAL)
+        except queue_module.Empty:
+            if not process.is_alive():
+                # The result may have been put just before the process exited
+                try:
+                    result = queue.get(timeout=ISOLATED_POLL_INTERVAL)
+                except queue_module.Empty:
+                    result = {"name": name, "error": f"Benchmark process exited with code {process.exitcode} "
+                                                     "without a result."}
+            elif deadline is not None and time.monotonic() > deadline:
+                process.terminate()
+                result = {"name": name, "error": f"Benchmark timed out after {timeout:.0f} s."}
+    process.join()
+    return result
+
+
+COMPARED_METRICS = ["accuracy", "macro_f1", "single_p50_ms", "single_p95_ms", "single_p99_ms",
+                    "batch_throughput_msg_s", "load_time_s", "peak_rss_mb"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark intent classifier backends.")
+    parser.add_argument("--csv", default="updated_balanced_procurement_intents.csv")
+    parser.add_argument("--replay", help="Optional JSON-lines file of recorded chat messages.")
+    parser.add_argument("--backends", nargs="*", default=None, help=f"Subset of {BACKENDS}.")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--warmup", type=int, default=8)
+    parser.add_argument("--timeout", type=float, help="Seconds allowed per backend (default: no limit).")
+    parser.add_argument("--output", default="intent_bench.json")
+    parser.add_argument("--baseline", help="Previous report to compare against.")
+    args = parser.parse_args()
+
+    messages, intents = load_benchmark_messages(args.csv, args.replay)
+    backends = args.backends or available_backends()
+    print(f"Benchmarking {backends} on {len(messages)} messages.")
+
+    results = []
+    for name in backends:
+        result = run_isolated(name, messages, intents, args.batch_size, args.warmup, args.timeout)
+        print(json.dumps(result))
+        results.append(result)
+
+    report = {"environment": environment_info(), "messages": len(messages), "results": results}
+    write_report(report, args.output)
+
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        print(compare_to_baseline([r for r in results if "error" not in r], baseline["results"], COMPARED_METRICS))
+
+
+if __name__ == "__main__":
+    main()
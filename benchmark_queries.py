@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Query-function microbenchmark across dataset scales.
+
+Loads synthetic purchase data (see generate_dataset.py) at several scales into
+a local mongod, one collection per scale, and times every handler in
+`intent_map` with representative parameters. For each handler it reports
+median/p95 latency, documents examined and round trips (from the database
+profiler), result size, and the scaling exponent of latency against the
+number of lines. Handlers whose cost grows faster than linearly are flagged.
+
+Usage:
+    python benchmark_queries.py --scales 10000 100000 1000000 --output query_bench.json
+"""
+import argparse
+import json
+import math
+import time
+
+from bench_utils import compare_to_baseline, environment_info, summarize_latencies, write_report
+from generate_dataset import load_into_mongodb
+from query_functions import connect_to_mongodb, intent_map
+
+SUPERLINEAR_THRESHOLD = 1.15
+
+
+def pick_parameters(collection):
+    """
+    Pick representative parameter values (the most common department, supplier, etc.) from a collection.
+    """
+    def most_common(field):
+        result = list(collection.aggregate([
+            {"$sample": {"size": 5000}},
+            {"$group": {"_id": f"${field}", "n": {"$sum": 1}}},
+            {"$sort": {"n": -1}},
+            {"$limit": 1},
+        ]))
+        return result[0]["_id"] if result else None
+
+    sample = collection.find_one({}, {"_id": 0}) or {}
+    fiscal_year = str(most_common("Fiscal Year") or "2013")[:4]
+    return {
+        "department": most_common("Department Name"),
+        "supplier": most_common("Supplier Name"),
+        "item": most_common("Item Name"),
+        "fiscal_year": fiscal_year,
+        "po_number": sample.get("Purchase Order Number"),
+        "start_date": f"{fiscal_year}-07-01",
+        "end_date": f"{int(fiscal_year) + 1}-06-30",
+    }
+
+
+def handler_arguments(intent, params):
+    """
+    Build the positional arguments (after `collection`) the chat endpoint would pass for an intent.
+    """
+    supplier_query = f"What is the total spending with supplier {params['supplier']}?"
+    po_query = f"Show me the details of purchase order {params['po_number']}"
+    item_query = f"Show me the details for item '{params['item']}'"
+    fiscal_year = int(params["fiscal_year"])
+    arguments = {
+        "total_orders": (params["start_date"], params["end_date"]),
+        "supplier_orders": (params["supplier"],),
+        "acquisition_spending": ("What is the total spending by acquisition type 'IT Goods'?",),
+        "department_suppliers": (params["department"],),
+        "department_spending_by_name": (params["department"],),
+        "department_top_purchases": (f"Which items did {params['department']} buy the most?",),
+        "fiscal_year_expensive_item": (params["fiscal_year"],),
+        "fiscal_year_orders": (params["fiscal_year"],),
+        "fiscal_year_spending": (params["fiscal_year"],),
+        "fiscal_year_top_department": (params["fiscal_year"],),
+        "filtered_spending": (f"CalCard spending for {params['department']} in fiscal year "
+                              f"{fiscal_year}-{fiscal_year + 1}",),
+        "item_details": (item_query,),
+        "unit_price_item": (item_query,),
+        "purchase_order_details": (po_query,),
+        "purchase_order_items": (po_query,),
+        "purchase_order_supplier": (po_query,),
+        "purchase_order_value": (po_query,),
+        "supplier_items": (supplier_query,),
+        "supplier_spending": (supplier_query,),
+        "supplier_top_orders": (supplier_query,),
+    }
+    return arguments.get(intent, ())
+
+
+class ProfilerProbe:
+    """
+    Count documents examined and operations issued against a collection using the database profiler.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.db = collection.database
+        self.namespace = f"{self.db.name}.{collection.name}"
+
+    def __enter__(self):
+        self.db.command("profile", 0)
+        self.db.drop_collection("system.profile")
+        self.db.command("profile", 2)
+        return self
+
+    def __exit__(self, *exc):
+        self.db.command("profile", 0)
+        entries = list(self.db["system.profile"].find({"ns": self.namespace}))
+        self.round_trips = len(entries)
+        self.docs_examined = sum(entry.get("docsExamined", 0) for entry in entries)
+        self.keys_examined = sum(entry.get("keysExamined", 0) for entry in entries)
+        return False
+
+
+def result_size(result):
+    rows = len(result) if isinstance(result, (list, tuple)) else (0 if result is None else 1)
+    return rows, len(json.dumps(result, default=str))
+
+
+def benchmark_handler(collection, intent, handler, args, repeats):
+    """
+    Time one handler on one collection.
+
+    Returns:
+    - Dict: Latency summary, documents examined, round trips and result size.
+    """
+    try:
+        result = handler(collection, *args)  # warm-up, also used for the result size
+    except Exception as e:
+        return {"intent": intent, "error": f"{type(e).__name__}: {e}"}
+
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        handler(collection, *args)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    with ProfilerProbe(collection) as probe:
+        handler(collection, *args)
+
+    rows, payload_bytes = result_size(result)
+    summary = summarize_latencies(latencies)
+    return {
+        "intent": intent,
+        "handler": handler.__name__,
+        "median_ms": summary["p50_ms"],
+        "p95_ms": summary["p95_ms"],
+        "docs_examined": probe.docs_examined,
+        "keys_examined": probe.keys_examined,
+        "round_trips": probe.round_trips,
+        "result_rows": rows,
+        "result_bytes": payload_bytes,
+    }
+
+
+def scaling_exponent(points):
+    """
+    Least-squares slope of log(latency) against log(rows).
+
+    Args:
+    - points (List[Tuple[int, float]]): (rows, median latency in ms) pairs.
+    """
+    points = [(rows, latency) for rows, latency in points if rows > 0 and latency > 0]
+    if len(points) < 2:
+        return None
+    xs = [math.log(rows) for rows, _ in points]
+    ys = [math.log(latency) for _, latency in points]
+    x_mean, y_mean = sum(xs) / len(xs), sum(ys) / len(ys)
+    denominator = sum((x - x_mean) ** 2 for x in xs)
+    if not denominator:
+        return None
+    return round(sum((x - x_mean) * (y - y_mean) for x, y in zip(xs, ys)) / denominator, 3)
+
+
+def ensure_scale(connection_string, db_name, rows, seed):
+    """
+    Return a collection holding `rows` synthetic lines, generating it only when needed.
+    """
+    collection = connect_to_mongodb(connection_string, db_name, f"purchases_bench_{rows}")
+    if collection.estimated_document_count() != rows:
+        print(f"Loading {rows:,} synthetic rows...")
+        load_into_mongodb(collection, rows, seed=seed)
+    return collection
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark query functions across dataset scales.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--intents", nargs="*", help="Subset of intents to benchmark.")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/")
+    parser.add_argument("--db", default="purchases_bench")
+    parser.add_argument("--output", default="query_bench.json")
+    parser.add_argument("--baseline", help="Previous report to compare against.")
+    args = parser.parse_args()
+
+    intents = args.intents or sorted(intent_map)
+    results = {intent: {"intent": intent, "scales": {}} for intent in intents}
+    for rows in sorted(args.scales):
+        collection = ensure_scale(args.mongo_uri, args.db, rows, args.seed)
+        params = pick_parameters(collection)
+        print(f"\n{rows:,} rows, parameters: {params}")
+        for intent in intents:
+            handler = intent_map[intent]
+            measurement = benchmark_handler(collection, intent, handler,
+                                            handler_arguments(intent, params), args.repeats)
+            results[intent]["scales"][str(rows)] = measurement
+            print(f"  {intent:<40} {measurement.get('median_ms', measurement.get('error'))}")
+
+    summary = []
+    for intent, entry in results.items():
+        points = [(int(rows), m["median_ms"]) for rows, m in entry["scales"].items() if "median_ms" in m]
+        exponent = scaling_exponent(points)
+        entry["scaling_exponent"] = exponent
+        entry["superlinear"] = bool(exponent and exponent > SUPERLINEAR_THRESHOLD)
+        largest = entry["scales"].get(str(max(args.scales)), {})
+        summary.append({"name": intent, "median_ms": largest.get("median_ms"), "p95_ms": largest.get("p95_ms"),
+                        "docs_examined": largest.get("docs_examined"), "scaling_exponent": exponent})
+
+    flagged = [intent for intent, entry in results.items() if entry["superlinear"]]
+    report = {"environment": environment_info(), "scales": sorted(args.scales),
+              "results": list(results.values()), "summary": summary, "superlinear": flagged}
+    write_report(report, args.output)
+    if flagged:
+        print(f"Handlers growing faster than linearly: {', '.join(flagged)}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        print(compare_to_baseline(summary, baseline["summary"],
+                                  ["median_ms", "p95_ms", "docs_examined", "scaling_exponent"]))
+
+
+if __name__ == "__main__":
+    main()
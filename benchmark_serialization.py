@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark response encoding: Flask's jsonify against the encoder in serialization.py.
+
+Answers shaped like item_details / purchase_order_details (raw purchase lines
+with their ObjectId and datetimes) are built from the synthetic dataset at
+several sizes. Each answer is encoded by Flask's JSON provider (as jsonify
+does) and by ResponseEncoder in row- and column-oriented form, uncompressed,
+gzip, brotli and MessagePack (the last two when installed). The report gives
+payload bytes and mean / p95 encode time per variant.
+
+Flask's provider cannot encode ObjectIds; the baseline is reported as failing
+on the raw documents and is timed on the documents without _id.
+
+Usage:
+    python benchmark_serialization.py --rows 10 100 1000 10000 --repeat 20 --output serialization_bench.json
+"""
+import argparse
+import time
+
+from bson import ObjectId
+from flask import Flask
+
+from bench_utils import environment_info, summarize_latencies, write_report
+from generate_dataset import chunk_to_records, generate_chunks
+from serialization import ResponseEncoder, brotli, msgpack
+
+
+def build_answer(rows, seed=0):
+    """
+    An item_details-style answer with `rows` raw purchase lines, each with an ObjectId.
+    """
+    records = []
+    for chunk in generate_chunks(rows, seed, chunk_size=rows):
+        records.extend(chunk_to_records(chunk))
+    for record in records:
+        record["_id"] = ObjectId()
+    return {"success": True, "intent": "item_details", "message": f"Found {rows} purchase record(s).",
+            "data": records}
+
+
+def time_encoder(encode, repeat):
+    """
+    Encode `repeat` times.
+
+    Returns:
+    - Dict: Payload bytes and the encode time summary in milliseconds.
+    """
+    latencies, size = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = len(encode())
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {"bytes": size, **summarize_latencies(latencies)}
+
+
+def variants():
+    """
+    (name, accept, accept_encoding, orient) for every encoding available here.
+    """
+    specs = []
+    for orient in ("records", "columns"):
+        specs.append((f"json/{orient}", None, None, orient))
+        specs.append((f"json+gzip/{orient}", None, "gzip", orient))
+        if brotli is not None:
+            specs.append((f"json+br/{orient}", None, "br", orient))
+        if msgpack is not None:
+            specs.append((f"msgpack/{orient}", "application/msgpack", None, orient))
+    return specs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response serialization and compression.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", default="serialization_bench.json")
+    args = parser.parse_args()
+
+    flask_json = Flask("benchmark").json
+    encoder = ResponseEncoder(min_compress_bytes=0)
+    results = []
+    print(f"{'rows':>7}  {'variant':<22}{'bytes':>12}{'mean ms':>10}{'p95 ms':>10}")
+    for rows in args.rows:
+        answer = build_answer(rows)
+        try:
+            flask_json.dumps(answer)
+            baseline_error = None
+        except TypeError as e:
+            baseline_error = str(e)
+        without_ids = {**answer, "data": [{k: v for k, v in row.items() if k != "_id"} for row in answer["data"]]}
+
+        measured = {"jsonify (no _id)": time_encoder(lambda: flask_json.dumps(without_ids).encode("utf-8"),
+                                                     args.repeat)}
+        for name, accept, accept_encoding, orient in variants():
+            measured[name] = time_encoder(lambda: encoder.encode(answer, accept, accept_encoding, orient)[0],
+                                          args.repeat)
+
+        for name, result in measured.items():
+            print(f"{rows:>7}  {name:<22}{result['bytes']:>12,}{result['mean_ms']:>10.3f}{result['p95_ms']:>10.3f}")
+        if baseline_error:
+            print(f"{rows:>7}  jsonify on the raw documents fails: {baseline_error}")
+        results.append({"rows": rows, "baseline_error": baseline_error, "variants": measured})
+
+    write_report({"environment": environment_info(), "repeat": args.repeat, "results": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
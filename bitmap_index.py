@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Roaring-bitmap indexes over the columnar store.
+
+For each indexed categorical column (CalCard, Acquisition Type, Fiscal Year,
+Department Name) one compressed bitmap of row ids is kept per distinct value.
+Predicates are evaluated with bitmap AND / OR instead of scanning the
+collection, and handlers aggregate only the selected row ids, so the cost of a
+filtered question grows with the size of the selection.
+
+The index is written next to the columns when the store is built
+(see columnar_engine.py) and loaded automatically by ColumnarStore.
+
+Usage:
+    python bitmap_index.py build --store purchases_columnar
+"""
+import argparse
+import array
+import json
+import os
+
+import numpy as np
+from pyroaring import BitMap
+
+BITMAP_COLUMNS = ["CalCard", "Acquisition Type", "Fiscal Year", "Department Name"]
+INDEX_DIR = "bitmaps"
+
+
+def _to_bitmap(row_ids):
+    values = array.array("I")
+    values.frombytes(np.ascontiguousarray(row_ids, dtype=np.uint32).tobytes())
+    return BitMap(values)
+
+
+class BitmapIndex:
+    """
+    One roaring bitmap of row ids per value of each indexed column.
+
+    Args:
+    - store (ColumnarStore): The store whose rows the bitmaps refer to.
+    - bitmaps (Dict[str, List[BitMap]]): Column -> bitmap per dictionary code.
+    """
+
+    def __init__(self, store, bitmaps):
+        self.store = store
+        self.bitmaps = bitmaps
+        self.codes = {column: {value: code for code, value in enumerate(store.dictionaries[column])}
+                      for column in bitmaps}
+
+    @classmethod
+    def build(cls, store, columns=None):
+        bitmaps = {}
+        for column in columns or BITMAP_COLUMNS:
+            codes = np.asarray(store.columns[column])
+            size = len(store.dictionaries[column])
+            order = np.argsort(codes, kind="stable")
+            bounds = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=size))])
+            bitmaps[column] = [_to_bitmap(order[bounds[code]:bounds[code + 1]]) for code in range(size)]
+        return cls(store, bitmaps)
+
+    def save(self, path=None):
+        directory = os.path.join(path or self.store.path, INDEX_DIR)
+        os.makedirs(directory, exist_ok=True)
+        layout = {}
+        for column, bitmaps in self.bitmaps.items():
+            file_name = column.replace(" ", "_").lower() + ".roaring"
+            offsets = [0]
+            with open(os.path.join(directory, file_name), "wb") as f:
+                for bitmap in bitmaps:
+                    offsets.append(offsets[-1] + f.write(bitmap.serialize()))
+            layout[column] = {"file": file_name, "offsets": offsets}
+        with open(os.path.join(directory, "index.json"), "w") as f:
+            json.dump({"rows": self.store.rows, "columns": layout}, f)
+
+    @classmethod
+    def load(cls, store):
+        directory = os.path.join(store.path, INDEX_DIR)
+        with open(os.path.join(directory, "index.json"), "r") as f:
+            layout = json.load(f)
+        if layout["rows"] != store.rows:
+            raise ValueError(f"Bitmap index in '{directory}' is stale; rebuild it with 'python bitmap_index.py build'.")
+        bitmaps = {}
+        for column, entry in layout["columns"].items():
+            with open(os.path.join(directory, entry["file"]), "rb") as f:
+                data = f.read()
+            offsets = entry["offsets"]
+            bitmaps[column] = [BitMap.deserialize(data[offsets[i]:offsets[i + 1]]) for i in range(len(offsets) - 1)]
+        return cls(store, bitmaps)
+
+    # Predicates
+    def equals(self, column, value):
+        """
+        Rows where `column` equals `value` (an empty bitmap for unknown values).
+        """
+        code = self.codes[column].get(value)
+        return self.bitmaps[column][code] if code is not None else BitMap()
+
+    def any_of(self, column, values):
+        """
+        Rows where `column` is one of `values` (bitmap OR).
+        """
+        bitmaps = [self.equals(column, value) for value in values]
+        return BitMap.union(*bitmaps) if bitmaps else BitMap()
+
+    def contains(self, column, text):
+        """
+        Rows whose `column` contains `text`, case-insensitively. Replaces an un-indexed $regex:
+        the pattern is matched against the (small) dictionary, then the matching bitmaps are ORed.
+        """
+        text = str(text).lower()
+        return self.any_of(column, [value for value in self.codes[column]
+                                    if value is not None and text in str(value).lower()])
+
+    def equals_ignore_case(self, column, value):
+        value = str(value).lower()
+        return self.any_of(column, [v for v in self.codes[column] if v is not None and str(v).lower() == value])
+
+    def select(self, filters):
+        """
+        Evaluate a conjunction of per-column predicates.
+
+        Args:
+        - filters (Dict[str, Any]): Column -> value, or column -> list of values (ORed).
+
+        Returns:
+        - BitMap: Selected row ids.
+        """
+        selection = None
+        for column, value in filters.items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            bitmap = self.any_of(column, values)
+            selection = bitmap if selection is None else selection & bitmap
+            if not selection:
+                break
+        return selection if selection is not None else BitMap(range(self.store.rows))
+
+    @staticmethod
+    def row_ids(bitmap):
+        """
+        Selected row ids as a sorted NumPy array, ready for fancy indexing into the columns.
+        """
+        return np.frombuffer(bitmap.to_array(), dtype=np.uint32).astype(np.int64)
+
+
+def build_bitmap_index(store_path, columns=None):
+    """
+    Build and save the bitmap index for a columnar store directory.
+    """
+    from columnar_engine import ColumnarStore
+
+    store = ColumnarStore(store_path, bitmaps=False)
+    index = BitmapIndex.build(store, columns)
+    index.save()
+    sizes = {column: sum(len(b.serialize()) for b in bitmaps) for column, bitmaps in index.bitmaps.items()}
+    print(f"Bitmap index written to {os.path.join(store_path, INDEX_DIR)}: "
+          + ", ".join(f"{column} {size / 1024:,.0f} KiB" for column, size in sizes.items()))
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build roaring-bitmap indexes for the columnar store.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build")
+    build.add_argument("--store", default="purchases_columnar")
+    build.add_argument("--columns", nargs="*", default=BITMAP_COLUMNS)
+    args = parser.parse_args()
+    build_bitmap_index(args.store, args.columns)
+
+
+if __name__ == "__main__":
+    main()
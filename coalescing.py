@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Single-flight coalescing of identical concurrent handler calls.
+
+When many users ask the same question at once (a dashboard loads, a report
+link is shared), every request used to start its own aggregation. With
+SingleFlight, the first call for a given handler and parameters executes it;
+calls with the same key that arrive while it is running wait for that
+execution and all receive its result (or its exception). Once it finishes,
+the next call starts a new execution, so answers are never older than the
+query they were waiting for.
+
+Coalesced results are shared between requests and must not be mutated.
+
+Per handler, executions and coalesced calls are counted and reported by
+stats() (/health, "coalescing"). SINGLE_FLIGHT=off disables coalescing.
+"""
+import os
+import threading
+from concurrent.futures import Future
+
+SINGLE_FLIGHT = os.environ.get("SINGLE_FLIGHT", "on") != "off"
+
+
+def _freeze(value):
+    # Handler arguments may be lists (e.g. date ranges); keys must be hashable
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+class SingleFlight:
+    """
+    Share one in-flight execution among concurrent calls with the same key.
+    """
+
+    def __init__(self):
+        self.flights = {}
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def do(self, key, fn, name=None):
+        """
+        Run fn() unless a call with the same key is already running, in which case wait for its result.
+
+        Args:
+        - key (Tuple): Identifies identical calls (e.g. handler and arguments).
+        - fn (Callable): Executes the call.
+        - name (str): Name the call is counted under in stats() (default: str(key[0])).
+
+        Returns:
+        - Any: The result of the (shared) execution; its exception is raised in every caller.
+        """
+        key = _freeze(key)
+        name = name or str(key[0])
+        with self.lock:
+            future = self.flights.get(key)
+            leader = future is None
+            if leader:
+                future = self.flights[key] = Future()
+            counts = self.counts.setdefault(name, {"executions": 0, "coalesced": 0})
+            counts["executions" if leader else "coalesced"] += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                self.flights.pop(key, None)
+
+    def stats(self):
+        """
+        Returns:
+        - Dict: In-flight executions, and per name: calls, executions, coalesced calls and the share coalesced.
+        """
+        with self.lock:
+            return {
+                "in_flight": len(self.flights),
+                "handlers": {name: {
+                    "calls": counts["executions"] + counts["coalesced"],
+                    **counts,
+                    "coalesced_ratio": round(counts["coalesced"] / (counts["executions"] + counts["coalesced"]), 4),
+                } for name, counts in self.counts.items()},
+            }
+
+
+def create_single_flight_from_env():
+    """
+    The handler coalescer, or None with SINGLE_FLIGHT=off.
+    """
+    return SingleFlight() if SINGLE_FLIGHT else None
@@ -0,0 +1,837 @@
+# -*- coding: utf-8 -*-
+"""
+In-process NumPy columnar engine.
+
+Purchase lines are stored on disk as one flat binary file per column and
+memory-mapped at load time. Categorical columns are dictionary-encoded into
+int32 codes; Quantity, Unit Price and Total Price stay numeric. Group-by sum,
+count, average and top-k are computed with np.bincount / np.argpartition, and
+each aggregate is memoised on the store, so after the first call the
+parameterless intents are answered without touching MongoDB or rescanning the
+columns.
+
+Intents that are not implemented here are delegated to a fallback data source
+(the MongoDB collection) through the usual query_functions handlers.
+
+Usage:
+    python columnar_engine.py build --output purchases_columnar             # from MongoDB
+    python columnar_engine.py build --synthetic 1000000 --output purchases_columnar
+"""
+import argparse
+import functools
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from query_functions import (extract_fiscal_year_from_query, extract_spending_filters, format_currency,
+                             format_large_number, handle_greeting, intent_map)
+
+CATEGORICAL_COLUMNS = [
+    "Fiscal Year", "Purchase Order Number", "Acquisition Type", "Acquisition Method", "Department Name",
+    "Supplier Code", "Supplier Name", "CalCard", "Item Name", "Item Description", "Classification Codes",
+]
+NUMERIC_COLUMNS = {"Quantity": "float64", "Unit Price": "float64", "Total Price": "float64",
+                   "Normalized UNSPSC": "float64", "Creation Date": "datetime64[s]"}
+DENSE_GROUP_LIMIT = 5000000
+
+
+def _file_name(column):
+    return column.replace(" ", "_").lower() + ".bin"
+
+
+# Building
+class ColumnarStoreWriter:
+    """
+    Append purchase lines chunk by chunk to a columnar store directory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.rows = 0
+        self.dictionaries = {column: {} for column in CATEGORICAL_COLUMNS}
+        # Quantity is stored as float64 and shown as an integer if every chunk held whole numbers
+        self.quantity_is_integer = True
+        self.files = {column: open(os.path.join(path, _file_name(column)), "wb")
+                      for column in CATEGORICAL_COLUMNS + list(NUMERIC_COLUMNS)}
+
+    def _encode(self, column, values):
+        local_codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=True)
+        dictionary = self.dictionaries[column]
+        mapping = np.empty(len(uniques) + 1, dtype=np.int32)
+        for i, value in enumerate(uniques):
+            mapping[i] = dictionary.setdefault(value, len(dictionary))
+        mapping[-1] = dictionary.setdefault(None, len(dictionary))  # missing values (code -1)
+        return mapping[local_codes]
+
+    def write(self, chunk):
+        """
+        Append a chunk given as a dict of column name -> sequence of values.
+        """
+        n = len(chunk["Total Price"])
+        for column in CATEGORICAL_COLUMNS:
+            values = chunk.get(column)
+            values = [None] * n if values is None else [None if v is None else str(v) for v in values]
+            self._encode(column, values).tofile(self.files[column])
+        for column, dtype in NUMERIC_COLUMNS.items():
+            values = chunk.get(column)
+            if values is None:
+                values = np.zeros(n)
+            if column == "Creation Date":
+                array = np.array(values, dtype="datetime64[s]").astype(np.int64)
+            else:
+                array = pd.to_numeric(pd.Series(values), errors="coerce").fillna(0).to_numpy()
+                if column == "Quantity" and self.quantity_is_integer:
+                    self.quantity_is_integer = bool(np.all(np.mod(array, 1) == 0))
+                array = array.astype(dtype)
+            array.tofile(self.files[column])
+        self.rows += n
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump({
+                "rows": self.rows,
+                "dtypes": {column: ("int64" if dtype == "datetime64[s]" else dtype)
+                           for column, dtype in NUMERIC_COLUMNS.items()},
+                "integer_columns": ["Quantity"] if self.quantity_is_integer else [],
+                "dictionaries": {column: list(values) for column, values in self.dictionaries.items()},
+            }, f)
+        print(f"Columnar store with {self.rows:,} rows written to {self.path}")
+
+
+def build_from_collection(collection, path="purchases_columnar", batch_size=100000, bitmaps=True):
+    """
+    Build the columnar store (and its bitmap index) from the cleaned MongoDB collection, streaming the cursor.
+    """
+    writer = ColumnarStoreWriter(path)
+    batch = []
+
+    def flush(documents):
+        writer.write({column: [doc.get(column) for doc in documents]
+                      for column in CATEGORICAL_COLUMNS + list(NUMERIC_COLUMNS)})
+
+    for document in collection.find({}, {"_id": 0}, batch_size=10000):
+        batch.append(document)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    writer.close()
+    if bitmaps:
+        from bitmap_index import build_bitmap_index
+        build_bitmap_index(path)
+    return path
+
+
+def build_from_synthetic(rows, path="purchases_columnar", seed=0, bitmaps=True):
+    """
+    Build the columnar store (and its bitmap index) from the synthetic generator (see generate_dataset.py).
+    """
+    from generate_dataset import generate_chunks
+
+    writer = ColumnarStoreWriter(path)
+    for chunk in generate_chunks(rows, seed=seed):
+        writer.write(chunk)
+    writer.close()
+    if bitmaps:
+        from bitmap_index import build_bitmap_index
+        build_bitmap_index(path)
+    return path
+
+
+# Store
+class ColumnarStore:
+    """
+    Memory-mapped, dictionary-encoded purchase lines with memoised aggregates.
+
+    Args:
+    - path (str): Directory written by ColumnarStoreWriter.
+    - fallback: Data source (MongoDB collection) for intents the engine does not implement.
+    - bitmaps (bool): Load the bitmap index (see bitmap_index.py) when one was built.
+    """
+
+    def __init__(self, path="purchases_columnar", fallback=None, bitmaps=True):
+        self.path = path
+        self.fallback = fallback
+        meta_path = os.path.join(path, "meta.json")
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        self.rows = meta["rows"]
+        # The store is read once; a rebuilt store is served after it is opened again
+        self.written_at = os.stat(meta_path).st_mtime_ns
+        self.dictionaries = {column: np.array(values, dtype=object) for column, values in meta["dictionaries"].items()}
+        self.columns = {}
+        for column in CATEGORICAL_COLUMNS:
+            self.columns[column] = self._map(column, "int32")
+        for column, dtype in meta["dtypes"].items():
+            self.columns[column] = self._map(column, dtype)
+        # Stores written before integer_columns existed kept an all-integer Quantity as int64
+        self.quantity_is_integer = ("Quantity" in meta.get("integer_columns", [])
+                                    or meta["dtypes"].get("Quantity") == "int64")
+        self._cache = {}
+        self._lock = threading.Lock()
+        self.bitmaps = None
+        if bitmaps and os.path.isdir(os.path.join(path, "bitmaps")):
+            from bitmap_index import BitmapIndex
+            self.bitmaps = BitmapIndex.load(self)
+
+    def _map(self, column, dtype):
+        if self.rows == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(os.path.join(self.path, _file_name(column)), dtype=dtype, mode="r", shape=(self.rows,))
+
+    # pymongo-compatible helpers used by the entity extractors
+    def distinct(self, field):
+        return [value for value in self.dictionaries.get(field, []) if value is not None]
+
+    def row(self, index):
+        """
+        Decode one purchase line into a dictionary.
+        """
+        record = {}
+        for column in CATEGORICAL_COLUMNS:
+            record[column] = self.dictionaries[column][self.columns[column][index]]
+        for column in ("Quantity", "Unit Price", "Total Price", "Normalized UNSPSC"):
+            value = self.columns[column][index]
+            record[column] = int(value) if column == "Quantity" and self.quantity_is_integer else float(value)
+        record["Creation Date"] = np.datetime64(int(self.columns["Creation Date"][index]), "s").astype(object)
+        return record
+
+    def dataset_version(self):
+        """
+        Identifies the loaded store (rows and meta.json mtime) and, for the intents delegated to it, the
+        fallback's data (see answer_cache.dataset_version).
+        """
+        from answer_cache import dataset_version
+        return self.rows, self.written_at, dataset_version(self.fallback) if self.fallback is not None else None
+
+    def take(self, column, rows=None):
+        """
+        A column, or only the selected row ids of it.
+        """
+        return self.columns[column] if rows is None else self.columns[column][rows]
+
+    def _memoize(self, key, compute):
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = compute()
+            return self._cache[key]
+
+    # Aggregation primitives
+    def group(self, column, measure=None, agg="sum", rows=None):
+        """
+        Aggregate a measure by one categorical column.
+
+        Args:
+        - column (str): Categorical column to group by.
+        - measure (str): Numeric column (ignored for agg="count").
+        - agg (str): "sum", "count" or "avg".
+        - rows (np.ndarray): Aggregate only these row ids (not memoised).
+
+        Returns:
+        - Tuple[np.ndarray, np.ndarray]: Group values (decoded) and aggregate per group, for non-empty groups.
+        """
+        def compute():
+            codes = self.take(column, rows)
+            size = len(self.dictionaries[column])
+            counts = np.bincount(codes, minlength=size)
+            if agg == "count":
+                values = counts.astype(np.int64)
+            else:
+                sums = np.bincount(codes, weights=self.take(measure, rows), minlength=size)
+                values = sums if agg == "sum" else np.divide(sums, counts, out=np.zeros(size), where=counts > 0)
+            present = np.nonzero(counts)[0]
+            return self.dictionaries[column][present], values[present]
+        if rows is not None:
+            return compute()
+        return self._memoize(("group", column, measure, agg), compute)
+
+    def group2(self, first, second, measure=None, agg="sum"):
+        """
+        Aggregate a measure by two categorical columns.
+
+        Returns:
+        - Tuple[np.ndarray, np.ndarray, np.ndarray]: First values, second values and aggregates.
+        """
+        def compute():
+            size_second = len(self.dictionaries[second])
+            keys = self.columns[first].astype(np.int64) * size_second + self.columns[second]
+            total = len(self.dictionaries[first]) * size_second
+            if total <= DENSE_GROUP_LIMIT:
+                counts = np.bincount(keys, minlength=total)
+                present = np.nonzero(counts)[0]
+                sums = np.bincount(keys, weights=self.columns[measure], minlength=total)[present] if measure else None
+                counts = counts[present]
+            else:
+                present, inverse = np.unique(keys, return_inverse=True)
+                counts = np.bincount(inverse)
+                sums = np.bincount(inverse, weights=self.columns[measure]) if measure else None
+            values = counts if agg == "count" else (sums if agg == "sum" else sums / counts)
+            return (self.dictionaries[first][present // size_second],
+                    self.dictionaries[second][present % size_second], values)
+        return self._memoize(("group2", first, second, measure, agg), compute)
+
+    def total(self, measure, agg="sum", rows=None):
+        def compute():
+            values = self.take(measure, rows)
+            if not len(values):
+                return None
+            return float(values.sum()) if agg == "sum" else float(values.mean())
+        if rows is not None:
+            return compute()
+        return self._memoize(("total", measure, agg), compute)
+
+    def quarter_totals(self):
+        def compute():
+            months = self.columns["Creation Date"].astype("datetime64[s]").astype("datetime64[M]").astype(np.int64) % 12
+            quarters = months // 3 + 1
+            sums = np.bincount(quarters, weights=self.columns["Total Price"], minlength=5)
+            present = np.nonzero(np.bincount(quarters, minlength=5))[0]
+            return present, sums[present]
+        return self._memoize(("quarters",), compute)
+
+    def top_rows(self, measure, k, ascending=False, rows=None):
+        """
+        Row indexes of the k largest (or smallest) values of a measure, sorted; among `rows` when given.
+        """
+        def compute():
+            data = np.asarray(self.take(measure, rows))
+            signed = data if ascending else -data
+            count = min(k, len(data)) if k else len(data)
+            if not count:
+                return np.zeros(0, dtype=np.int64)
+            top = np.argpartition(signed, count - 1)[:count] if count < len(data) else np.arange(len(data))
+            top = top[np.argsort(signed[top], kind="stable")]
+            return rows[top] if rows is not None else top
+        if rows is not None:
+            return compute()
+        return self._memoize(("top_rows", measure, k, ascending), compute)
+
+    def quantity(self, value):
+        return int(round(value)) if self.quantity_is_integer else float(value)
+
+    def warm(self):
+        """
+        Precompute the aggregates behind every implemented handler.
+        """
+        for intent, handler in columnar_intent_map.items():
+            if getattr(handler, "columnar", False):
+                handler(self)
+
+
+def _sorted_desc(labels, values, limit=None):
+    order = np.argsort(-values, kind="stable")
+    if limit:
+        order = order[:limit]
+    return list(zip(labels[order].tolist(), values[order].tolist()))
+
+
+def _top_one(labels, values):
+    if not len(values):
+        return None
+    best = int(np.argmax(values))
+    return labels[best], values[best]
+
+
+def columnar(handler):
+    """
+    Mark a handler as implemented by the columnar engine.
+    """
+    handler.columnar = True
+    return handler
+
+
+# Handlers (same names, signatures and output shapes as query_functions.py)
+@columnar
+def get_highest_spending_quarter(store):
+    quarters, sums = store.quarter_totals()
+    if not len(sums):
+        return {}
+    best = int(np.argmax(sums))
+    return {"_id": f"Q{int(quarters[best])}", "total_spending": float(sums[best])}
+
+
+@columnar
+def get_total_price_by_quarter(store):
+    quarters, sums = store.quarter_totals()
+    return [{"Quarter": f"Q{int(q)}", "Total Price": round(float(s), 2)} for q, s in zip(quarters, sums)]
+
+
+@columnar
+def get_frequent_line_items(store, top_n=5):
+    labels, counts = store.group("Item Name", agg="count")
+    return [{"Item Name": name, "Frequency": int(count)} for name, count in _sorted_desc(labels, counts, top_n)]
+
+
+@columnar
+def get_total_quantity(store):
+    total = store.total("Quantity") or 0
+    return {"success": True, "total_quantity": store.quantity(total)}
+
+
+@columnar
+def get_avg_quantity_per_order(store):
+    average = store.total("Quantity", agg="avg")
+    return {"Average Quantity Per Order": round(average, 2)} if average is not None else {}
+
+
+# Acquisition Methods
+@columnar
+def get_acquisition_method_avg_price(store):
+    labels, values = store.group("Acquisition Method", "Unit Price", "avg")
+    return [{"Acquisition Method": m, "Average Price": round(float(v), 2)} for m, v in _sorted_desc(labels, values)]
+
+
+@columnar
+def get_acquisition_method_department(store):
+    methods, departments, sums = store.group2("Acquisition Method", "Department Name", "Total Price")
+    order = sorted(range(len(sums)), key=lambda i: (str(methods[i]), str(departments[i])))
+    return [{"Acquisition Method": methods[i], "Department": departments[i],
+             "Total Spending": round(float(sums[i]), 2)} for i in order]
+
+
+@columnar
+def get_acquisition_method_frequency(store):
+    labels, counts = store.group("Acquisition Method", agg="count")
+    return [{"Acquisition Method": m, "Frequency": int(c)} for m, c in _sorted_desc(labels, counts)]
+
+
+@columnar
+def get_acquisition_method_spending(store):
+    labels, sums = store.group("Acquisition Method", "Total Price")
+    return [{"Acquisition Method": m, "Total Spending": round(float(s), 2)} for m, s in _sorted_desc(labels, sums)]
+
+
+# Acquisition Types
+@columnar
+def get_acquisition_spending(store):
+    labels, sums = store.group("Acquisition Type", "Total Price")
+    return [{"Acquisition Type": t, "Total Spending": round(float(s), 2)} for t, s in _sorted_desc(labels, sums)]
+
+
+@columnar
+def get_acquisition_type_department_usage(store):
+    types, departments, sums = store.group2("Acquisition Type", "Department Name", "Total Price")
+    order = sorted(range(len(sums)), key=lambda i: (str(types[i]), str(departments[i])))
+    return [{"Acquisition Type": types[i], "Department": departments[i],
+             "Total Spending": round(float(sums[i]), 2)} for i in order]
+
+
+@columnar
+def get_acquisition_type_orders(store):
+    labels, counts = store.group("Acquisition Type", agg="count")
+    return [{"Acquisition Type": t, "Total Orders": int(c)} for t, c in _sorted_desc(labels, counts)]
+
+
+@columnar
+def get_acquisition_type_top_suppliers(store):
+    types, suppliers, sums = store.group2("Acquisition Type", "Supplier Name", "Total Price")
+    order = np.argsort(-sums, kind="stable")[:10]
+    return [{"Acquisition Type": types[i], "Supplier": suppliers[i],
+             "Total Spending": round(float(sums[i]), 2)} for i in order]
+
+
+# Quantity and Unit Price
+@columnar
+def get_avg_unit_price_by_category(store):
+    labels, values = store.group("Classification Codes", "Unit Price", "avg")
+    return [{"Classification Code": c, "Average Unit Price": round(float(v), 2)} for c, v in _sorted_desc(labels, values)]
+
+
+@columnar
+def get_bulk_items(store):
+    rows = [i for i in store.top_rows("Quantity", 10) if store.columns["Quantity"][i] >= 100]
+    return [{"Item Name": store.dictionaries["Item Name"][store.columns["Item Name"][i]],
+             "Quantity": store.quantity(store.columns["Quantity"][i])} for i in rows]
+
+
+# CalCard
+@columnar
+def get_calcard_frequent_items(store):
+    labels, counts = store.group("Item Name", agg="count")
+    return [{"Item Name": name, "Frequency": int(count)} for name, count in _sorted_desc(labels, counts, 10)]
+
+
+@columnar
+def get_calcard_orders(store):
+    labels, counts = store.group("CalCard", agg="count")
+    return [{"CalCard": c, "Total Orders": int(n)} for c, n in _sorted_desc(labels, counts)]
+
+
+@columnar
+def get_calcard_top_departments(store):
+    calcards, departments, sums = store.group2("CalCard", "Department Name", "Total Price")
+    order = np.argsort(-sums, kind="stable")
+    return [{"CalCard": calcards[i], "Department": departments[i],
+             "Total Spending": round(float(sums[i]), 2)} for i in order]
+
+
+@columnar
+def get_calcard_total_spending(store):
+    labels, sums = store.group("CalCard", "Total Price")
+    return [{"CalCard": c, "Total Spending": round(float(s), 2)} for c, s in _sorted_desc(labels, sums)]
+
+
+# Miscellaneous
+@columnar
+def get_cheapest_item(store):
+    rows = store.top_rows("Unit Price", 1, ascending=True)
+    if not len(rows):
+        return None
+    item = store.row(int(rows[0]))
+    return {
+        "Item Name": item.get("Item Name", "N/A"),
+        "Unit Price": item.get("Unit Price", "N/A"),
+        "Department Name": item.get("Department Name", "N/A"),
+        "Supplier Name": item.get("Supplier Name", "N/A"),
+        "Purchase Order Number": item.get("Purchase Order Number", "N/A"),
+        "Description": item.get("Item Description", "N/A"),
+    }
+
+
+@columnar
+def get_highest_total_price_order(store):
+    labels, sums = store.group("Purchase Order Number", "Total Price")
+    best = _top_one(labels, sums)
+    return [{"Purchase Order Number": best[0], "Total Price": round(float(best[1]), 2)}] if best else []
+
+
+@columnar
+def get_largest_order(store):
+    labels, sums = store.group("Purchase Order Number", "Quantity")
+    best = _top_one(labels, sums)
+    if not best:
+        return {"Message": "No orders found in the database."}
+
+    def first_line():
+        code = int(np.nonzero(store.dictionaries["Purchase Order Number"] == best[0])[0][0])
+        return int(np.argmax(store.columns["Purchase Order Number"] == code))
+    details = store.row(store._memoize(("largest_order_row",), first_line))
+    return {
+        "Purchase Order Number": details.get("Purchase Order Number", "N/A"),
+        "Department Name": details.get("Department Name", "N/A"),
+        "Supplier Name": details.get("Supplier Name", "N/A"),
+        "Total Quantity": store.quantity(best[1]),
+    }
+
+
+# Classification
+@columnar
+def get_total_price_by_category(store):
+    labels, sums = store.group("Classification Codes", "Total Price")
+    return [{"Classification Code": c, "Total Price": round(float(s), 2)} for c, s in _sorted_desc(labels, sums)]
+
+
+@columnar
+def get_classification_frequent_items(store, top_n=10):
+    labels, counts = store.group("Classification Codes", agg="count")
+    return [{"Classification Code": c, "Frequency": int(n)} for c, n in _sorted_desc(labels, counts, top_n)]
+
+
+@columnar
+def get_classification_items(store, classification_code=None):
+    codes, items, sums = store.group2("Classification Codes", "Item Name", "Quantity")
+    order = np.argsort(-sums, kind="stable")
+    if classification_code:
+        order = [i for i in order if codes[i] == classification_code]
+    return [{"Classification Code": codes[i], "Item Name": items[i], "Total Quantity": store.quantity(sums[i])}
+            for i in order]
+
+
+@columnar
+def get_classification_spending_breakdown(store):
+    labels, sums = store.group("Classification Codes", "Total Price")
+    return [{"Classification Code": c, "Total Spending": round(float(s), 2)} for c, s in _sorted_desc(labels, sums)]
+
+
+@columnar
+def get_top_classification_code(store):
+    labels, sums = store.group("Classification Codes", "Total Price")
+    best = _top_one(labels, sums)
+    if best:
+        return {"Classification Code": best[0], "Total Spending": round(float(best[1]), 2)}
+    return {"Message": "No data found for classification codes."}
+
+
+# Department
+@columnar
+def get_department_item_count(store):
+    labels, sums = store.group("Department Name", "Quantity")
+    return [{"Department Name": d, "Total Item Count": format_large_number(store.quantity(s))}
+            for d, s in _sorted_desc(labels, sums)]
+
+
+@columnar
+def get_department_spending_breakdown(store):
+    labels, sums = store.group("Department Name", "Total Price")
+    return [{"Department Name": d, "Total Spending": format_currency(float(s))} for d, s in _sorted_desc(labels, sums)]
+
+
+@columnar
+def get_quantity_top_department(store):
+    labels, sums = store.group("Department Name", "Quantity")
+    best = _top_one(labels, sums)
+    if best:
+        return {"Department Name": best[0], "Total Quantity": store.quantity(best[1])}
+    return {"Message": "No data found for department quantities."}
+
+
+@columnar
+def get_highest_spending_department(store):
+    labels, sums = store.group("Department Name", "Total Price")
+    best = _top_one(labels, sums)
+    if best:
+        return {"Department Name": best[0], "Total Spending": f"${float(best[1]):,.2f}"}
+    return {"Message": "No spending data found for any department."}
+
+
+# Supplier
+@columnar
+def get_supplier_top_revenue(store, top_n=10):
+    labels, sums = store.group("Supplier Name", "Total Price")
+    return [{"supplier_name": s, "total_revenue": float(v)} for s, v in _sorted_desc(labels, sums, top_n)]
+
+
+# Filtered intents, answered from the bitmap index by aggregating only the selected rows
+def indexed(intent):
+    """
+    Mark a handler as answered from the bitmap index; stores without an index use the MongoDB handler.
+    """
+    def decorate(handler):
+        @functools.wraps(handler)
+        def wrapper(store, *args):
+            if store.bitmaps is None:
+                return _fallback(intent)(store, *args)
+            return handler(store, *args)
+        return wrapper
+    return decorate
+
+
+def _mentioned_value(store, column, query):
+    """
+    Return the longest value of `column` that appears in the query (case-insensitive).
+    """
+    query = query.lower()
+    matches = [value for value in store.distinct(column) if str(value).lower() in query]
+    return max(matches, key=lambda value: len(str(value))) if matches else None
+
+
+def filter_predicates(store, filters):
+    """
+    Turn the spending filters of a question (see extract_spending_filters) into categorical predicates.
+    The fiscal year becomes every stored fiscal year containing it, like the $regex match in MongoDB.
+
+    Returns:
+    - Dict[str, Any]: Column -> value (or list of values, ORed) for BitmapIndex.select.
+    """
+    predicates = dict(filters)
+    if "Fiscal Year" in predicates:
+        fiscal_year = predicates["Fiscal Year"]
+        predicates["Fiscal Year"] = [value for value in store.distinct("Fiscal Year") if fiscal_year in str(value)]
+    return predicates
+
+
+@indexed("filtered_spending")
+def get_filtered_spending(store, query):
+    """
+    Total spending and number of lines for every predicate in the question combined (bitmap AND).
+
+    Args:
+    - store (ColumnarStore): Store with a bitmap index.
+    - query (str): The user's question.
+
+    Returns:
+    - Dict: The filters applied, total spending and number of lines.
+    """
+    filters = extract_spending_filters(store, query)
+    if not filters:
+        return {"Message": "No CalCard, department, acquisition type or fiscal year found in the query."}
+    selection = store.bitmaps.select(filter_predicates(store, filters))
+    spending = store.total("Total Price", rows=store.bitmaps.row_ids(selection)) or 0
+    return {"Filters": filters, "Total Spending": format_currency(spending), "Total Orders": len(selection)}
+
+
+@indexed("fiscal_year_spending")
+def get_fiscal_year_spending(store, query):
+    fiscal_year = extract_fiscal_year_from_query(query)
+    if not fiscal_year:
+        return [{"Message": "Fiscal year not found in the query."}]
+    selection = store.bitmaps.contains("Fiscal Year", fiscal_year)
+    if not selection:
+        return []
+    return [{"Fiscal Year": fiscal_year, "Total Spending": store.total("Total Price", rows=store.bitmaps.row_ids(selection))}]
+
+
+@indexed("fiscal_year_top_department")
+def get_fiscal_year_top_department(store, query):
+    fiscal_year = extract_fiscal_year_from_query(query)
+    if not fiscal_year:
+        return [{"Message": "Fiscal year not found in the query."}]
+    selection = store.bitmaps.row_ids(store.bitmaps.contains("Fiscal Year", fiscal_year))
+    best = _top_one(*store.group("Department Name", "Total Price", rows=selection))
+    return [{"Department Name": best[0], "Total Spending": format_currency(float(best[1]))}] if best else []
+
+
+@indexed("fiscal_year_expensive_item")
+def get_fiscal_year_expensive_item(store, query):
+    fiscal_year = extract_fiscal_year_from_query(query)
+    if not fiscal_year:
+        return [{"Message": "Fiscal year not found in the query. Could you please specify the fiscal year?"}]
+    selection = store.bitmaps.row_ids(store.bitmaps.equals("Fiscal Year", fiscal_year))
+    top = store.top_rows("Unit Price", 1, rows=selection)
+    if not len(top):
+        return [{"Message": f"No data found for fiscal year: {fiscal_year}."}]
+    item = store.row(int(top[0]))
+    return [{
+        "Item Name": item.get("Item Name", "N/A"),
+        "Unit Price": f"${item.get('Unit Price', 0):,.2f}",
+        "Purchase Order Number": item.get("Purchase Order Number", "N/A"),
+        "Department Name": item.get("Department Name", "N/A"),
+    }]
+
+
+@indexed("fiscal_year_orders")
+def get_fiscal_year_orders(store, query):
+    fiscal_year = extract_fiscal_year_from_query(query)
+    if not fiscal_year:
+        return [{"Message": "Fiscal year not found in the query. Could you please clarify?"}]
+    total_orders = len(store.bitmaps.equals("Fiscal Year", fiscal_year))
+    if total_orders:
+        return [{"Message": f"The total number of orders placed in fiscal year {fiscal_year} is {total_orders}."}]
+    return [{"Message": f"No orders found for the fiscal year {fiscal_year}."}]
+
+
+@indexed("department_spending_by_name")
+def get_department_spending_by_name(store, query):
+    department_name = query
+    if not department_name:
+        return {"Message": "Department name not found in the query. Could you please clarify?"}
+    selection = store.bitmaps.row_ids(store.bitmaps.equals_ignore_case("Department Name", department_name))
+    labels, sums = store.group("Department Name", "Total Price", rows=selection)
+    if len(labels):
+        return {"Department Name": labels[0], "Total Spending": f"${float(sums[0]):,.2f}"}
+    return {"Message": f"No spending data found for department: {department_name}"}
+
+
+@indexed("department_suppliers")
+def get_department_suppliers(store, department_name):
+    if not department_name:
+        return [{"Message": "No department name provided. Please specify a department."}]
+    selection = store.bitmaps.row_ids(store.bitmaps.equals_ignore_case("Department Name", department_name))
+    suppliers, _ = store.group("Supplier Name", agg="count", rows=selection)
+    return ([{"Supplier Name": supplier} for supplier in suppliers.tolist()] if len(suppliers)
+            else [{"Message": f"No suppliers found for department: {department_name}."}])
+
+
+@indexed("department_top_purchases")
+def get_department_top_purchases(store, query, top_n=10):
+    department_name = _mentioned_value(store, "Department Name", query)
+    if not department_name:
+        return [{"Message": "Department name not found in the query."}]
+    selection = store.bitmaps.row_ids(store.bitmaps.equals("Department Name", department_name))
+    labels, sums = store.group("Item Name", "Total Price", rows=selection)
+    return [{"Item Name": item, "Total Spending": format_currency(total)} for item, total in _sorted_desc(labels, sums, top_n)]
+
+
+@indexed("acquisition_spending")
+def get_spending_by_acquisition_type(store, query):
+    acquisition_type = _mentioned_value(store, "Acquisition Type", query)
+    if not acquisition_type:
+        return [{"Message": "Acquisition type not found in the query. Could you please clarify?"}]
+    selection = store.bitmaps.equals("Acquisition Type", acquisition_type)
+    if not selection:
+        return [{"Message": f"No spending data found for acquisition type: {acquisition_type}."}]
+    total = store.total("Total Price", rows=store.bitmaps.row_ids(selection))
+    return [{"Acquisition Type": acquisition_type, "Total Spending": f"${total:,.2f}"}]
+
+
+def _fallback(intent):
+    handler = intent_map[intent]
+
+    @functools.wraps(handler)
+    def delegate(store, *args):
+        if store.fallback is None:
+            return {"Message": f"The columnar engine cannot answer '{intent}' without a database connection."}
+        return handler(store.fallback, *args)
+    return delegate
+
+
+# Intent-function map for the columnar engine: implemented handlers, the rest delegated to MongoDB
+columnar_intent_map = {intent: _fallback(intent) for intent in intent_map}
+columnar_intent_map.update({
+    "show_highest_spending_quarter": get_highest_spending_quarter,
+    "frequent_items": get_frequent_line_items,
+    "total_quantity": get_total_quantity,
+    "acquisition_method_avg_price": get_acquisition_method_avg_price,
+    "acquisition_method_department": get_acquisition_method_department,
+    "acquisition_method_frequency": get_acquisition_method_frequency,
+    "acquisition_method_spending": get_acquisition_method_spending,
+    "acquisition_type_department_usage": get_acquisition_type_department_usage,
+    "acquisition_type_orders": get_acquisition_type_orders,
+    "acquisition_type_spending": get_acquisition_spending,
+    "acquisition_type_top_suppliers": get_acquisition_type_top_suppliers,
+    "avg_quantity_per_order": get_avg_quantity_per_order,
+    "avg_unit_price_by_category": get_avg_unit_price_by_category,
+    "bulk_items": get_bulk_items,
+    "calcard_frequent_items": get_calcard_frequent_items,
+    "calcard_orders": get_calcard_orders,
+    "calcard_top_departments": get_calcard_top_departments,
+    "calcard_total_spending": get_calcard_total_spending,
+    "cheapest_item": get_cheapest_item,
+    "classification_frequent_items": get_classification_frequent_items,
+    "classification_items": get_classification_items,
+    "classification_spending_breakdown": get_classification_spending_breakdown,
+    "department_item_count": get_department_item_count,
+    "department_spending_breakdown": get_department_spending_breakdown,
+    "highest_total_price_order": get_highest_total_price_order,
+    "quantity_top_department": get_quantity_top_department,
+    "supplier_top_revenue": get_supplier_top_revenue,
+    "top_classification_code": get_top_classification_code,
+    "total_price_by_category": get_total_price_by_category,
+    "total_price_by_quarter": get_total_price_by_quarter,
+    "greeting": handle_greeting,
+    "frequent_line_items": get_frequent_line_items,
+    "highest_spending_department": get_highest_spending_department,
+    "largest_order": get_largest_order,
+    "department_spending": get_department_spending_breakdown,
+    "acquisition_spending": get_spending_by_acquisition_type,
+    "department_suppliers": get_department_suppliers,
+    "department_spending_by_name": get_department_spending_by_name,
+    "department_top_purchases": get_department_top_purchases,
+    "fiscal_year_expensive_item": get_fiscal_year_expensive_item,
+    "fiscal_year_orders": get_fiscal_year_orders,
+    "fiscal_year_spending": get_fiscal_year_spending,
+    "fiscal_year_top_department": get_fiscal_year_top_department,
+    "filtered_spending": get_filtered_spending,
+})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the NumPy columnar store.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build")
+    build.add_argument("--output", default="purchases_columnar")
+    build.add_argument("--synthetic", type=int, help="Build from this many synthetic rows instead of MongoDB.")
+    build.add_argument("--seed", type=int, default=0)
+    build.add_argument("--no-bitmaps", action="store_true", help="Skip building the bitmap index.")
+    build.add_argument("--mongo-uri", default="mongodb://localhost:27017/")
+    build.add_argument("--db", default="purchases_large")
+    build.add_argument("--collection", default="purchases_dataset")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        build_from_synthetic(args.synthetic, args.output, seed=args.seed, bitmaps=not args.no_bitmaps)
+    else:
+        from query_functions import connect_to_mongodb
+        build_from_collection(connect_to_mongodb(args.mongo_uri, args.db, args.collection), args.output,
+                              bitmaps=not args.no_bitmaps)
+
+
+if __name__ == "__main__":
+    main()
@@ -51,6 +51,7 @@ data = [
     {"user_input": "Which departments use CalCard the most?", "intent": "calcard_top_departments"},
     {"user_input": "Show me all orders made using CalCard.", "intent": "calcard_orders"},
     {"user_input": "Which items are frequently purchased using CalCard?", "intent": "calcard_frequent_items"},
+    {"user_input": "What is the CalCard spending for the Health department in fiscal year 2013-2014?", "intent": "filtered_spending"},
     
     # Item Name & Item Description
     {"user_input": "What is the most frequently ordered item?", "intent": "frequent_items"},
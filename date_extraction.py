@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+Fast date and fiscal-period extraction for chat questions.
+
+A small hand-written grammar over precompiled patterns turns a question into a
+date range:
+- relative periods: "last/this/next year|month|quarter"
+- fiscal years: "FY2022-23", "fiscal year 2013-2014", "FY2023" (July 1 - June 30)
+- quarters: "Q2 2023", "2023 Q2", "second quarter of 2023"
+- explicit ranges: "from X to Y", "between X and Y"; a side without a year takes
+  the other side's ("from March to May 2013")
+- open ranges: "since X", "after X" (from the start of X through today)
+- dates: ISO "2022-01-31", numeric "01/31/2022" or "31-01-22", "January 31, 2022",
+  "31 January 2022", and whole months such as "March 2022"
+- whole years: "in 2022"
+
+dateparser is imported lazily and only used for residual phrasings the grammar
+does not cover ("3 weeks ago", "yesterday"), so importing this module is cheap.
+"""
+import re
+from calendar import monthrange
+from datetime import datetime
+
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+ORDINAL_QUARTERS = {"first": 1, "1st": 1, "second": 2, "2nd": 2, "third": 3, "3rd": 3, "fourth": 4, "4th": 4}
+MONTH = (r"(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+         r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\.?")
+
+RELATIVE_PATTERN = re.compile(r"\b(last|previous|this|current|next)\s+(year|month|quarter)\b")
+FISCAL_PATTERN = re.compile(r"\b(?:fy|fiscal\s+year)\s*'?(\d{4}|\d{2})(?:\s*[-/]\s*'?(\d{4}|\d{2}))?\b")
+QUARTER_PATTERNS = [
+    re.compile(r"\bq([1-4])\s*(?:of\s+|,\s*|/\s*|-\s*)?(\d{4})\b"),
+    re.compile(r"\b(\d{4})\s*[-/]?\s*q([1-4])\b"),
+    re.compile(r"\b(first|1st|second|2nd|third|3rd|fourth|4th)\s+quarter\s+(?:of\s+)?(\d{4})\b"),
+]
+RANGE_PATTERN = re.compile(r"\b(?:from|between)\s+(.+?)\s+(?:to|and|until|through|thru|-)\s+(.+?)"
+                           r"(?=$|[?!;]|\.(?:\s|$)|\s+(?:for|by|with|in\s+the)\b)")
+SINCE_PATTERN = re.compile(r"\b(?:since|after)\s+(.+?)(?=$|[?!;]|\.(?:\s|$)|\s+(?:for|by|with|in\s+the)\b)")
+ISO_PATTERN = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+NUMERIC_PATTERN = re.compile(r"\b(\d{1,2})[/-](\d{1,2})[/-](\d{4}|\d{2})\b")
+MONTH_DAY_YEAR_PATTERN = re.compile(r"\b" + MONTH + r"\s+(\d{1,2})(?:st|nd|rd|th)?,?\s+(\d{4})\b")
+DAY_MONTH_YEAR_PATTERN = re.compile(r"\b(\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?" + MONTH + r",?\s+(\d{4})\b")
+MONTH_YEAR_PATTERN = re.compile(r"\b" + MONTH + r",?\s+(\d{4})\b")
+YEAR_PATTERN = re.compile(r"^(\d{4})$|\b(?:in|during|for|of|year)\s+(\d{4})\b")
+RESIDUAL_HINT_PATTERN = re.compile(r"\b(?:today|yesterday|tomorrow|ago|week|weekend|monday|tuesday|wednesday"
+                                   r"|thursday|friday|saturday|sunday)\b|" + MONTH + r"|\d")
+
+
+def _year(text, reference=None):
+    year = int(text)
+    if year < 100:
+        century = (reference // 100 * 100) if reference else 2000
+        year += century
+        if reference and year < reference:
+            year += 100
+    return year
+
+
+def _month(text):
+    return MONTHS[text[:3]]
+
+
+def _day(year, month, day):
+    try:
+        return datetime(year, month, day)
+    except ValueError:
+        return None
+
+
+def _month_range(year, month):
+    return datetime(year, month, 1), datetime(year, month, monthrange(year, month)[1])
+
+
+def _quarter_range(year, quarter):
+    start = datetime(year, 3 * quarter - 2, 1)
+    return start, _month_range(year, 3 * quarter)[1]
+
+
+def _fiscal_range(end_year):
+    # Fiscal years run from July 1 to June 30 and are named after both calendar years ("2013-2014")
+    return datetime(end_year - 1, 7, 1), datetime(end_year, 6, 30)
+
+
+def _relative_range(which, unit, now):
+    offset = {"last": -1, "previous": -1, "this": 0, "current": 0, "next": 1}[which]
+    if unit == "year":
+        return datetime(now.year + offset, 1, 1), datetime(now.year + offset, 12, 31)
+    if unit == "month":
+        index = now.year * 12 + now.month - 1 + offset
+        return _month_range(index // 12, index % 12 + 1)
+    index = now.year * 4 + (now.month - 1) // 3 + offset
+    return _quarter_range(index // 4, index % 4 + 1)
+
+
+def _fiscal_year_match(text):
+    match = FISCAL_PATTERN.search(text)
+    if not match:
+        return None
+    first, second = match.groups()
+    if second:
+        start_year = _year(first)
+        return start_year, _year(second, reference=start_year)
+    end_year = _year(first)
+    return end_year - 1, end_year
+
+
+def _period_ranges(text, now):
+    """
+    Ranges named by periods (relative periods, fiscal years, quarters) in the text.
+    """
+    match = RELATIVE_PATTERN.search(text)
+    if match:
+        return [_relative_range(match.group(1), match.group(2), now)]
+    fiscal_years = _fiscal_year_match(text)
+    if fiscal_years:
+        start, _ = _fiscal_range(fiscal_years[0] + 1)
+        _, end = _fiscal_range(fiscal_years[1])
+        return [(start, end)]
+    for index, pattern in enumerate(QUARTER_PATTERNS):
+        match = pattern.search(text)
+        if match:
+            if index == 0:
+                quarter, year = match.groups()
+            elif index == 1:
+                year, quarter = match.groups()
+            else:
+                quarter, year = ORDINAL_QUARTERS[match.group(1)], match.group(2)
+            return [_quarter_range(int(year), int(quarter))]
+    return []
+
+
+def _date_ranges(text):
+    """
+    Ranges named by explicit dates or months in the text, in order of appearance.
+    """
+    found = []
+    taken = []
+
+    def add(match, start, end):
+        if start is None or end is None or any(a < match.end() and match.start() < b for a, b in taken):
+            return
+        taken.append(match.span())
+        found.append((match.start(), start, end))
+
+    for match in ISO_PATTERN.finditer(text):
+        day = _day(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        add(match, day, day)
+    for match in NUMERIC_PATTERN.finditer(text):
+        first, second, year = int(match.group(1)), int(match.group(2)), _year(match.group(3))
+        # Month first (US order) unless that is impossible
+        day = _day(year, first, second) or _day(year, second, first)
+        add(match, day, day)
+    for match in MONTH_DAY_YEAR_PATTERN.finditer(text):
+        day = _day(int(match.group(3)), _month(match.group(1)), int(match.group(2)))
+        add(match, day, day)
+    for match in DAY_MONTH_YEAR_PATTERN.finditer(text):
+        day = _day(int(match.group(3)), _month(match.group(2)), int(match.group(1)))
+        add(match, day, day)
+    for match in MONTH_YEAR_PATTERN.finditer(text):
+        add(match, *_month_range(int(match.group(2)), _month(match.group(1))))
+    return [(start, end) for _, start, end in sorted(found, key=lambda item: item[0])]
+
+
+def _expression_range(text, now):
+    """
+    The range named by one side of "from X to Y".
+    """
+    ranges = _period_ranges(text, now) or _date_ranges(text)
+    if ranges:
+        return ranges[0]
+    match = YEAR_PATTERN.search(text.strip())
+    if match:
+        year = int(match.group(1) or match.group(2))
+        return datetime(year, 1, 1), datetime(year, 12, 31)
+    return None
+
+
+def _range_sides(start_text, end_text, now):
+    """
+    The ranges named by the two sides of "from X to Y"; a side without a year takes the other side's.
+    """
+    start, end = _expression_range(start_text, now), _expression_range(end_text, now)
+    if start is None and end is not None:
+        start = _expression_range(f"{start_text} {end[0].year}", now)
+        if start is not None and start[0] > end[1]:
+            # "from December to March 2014" starts in December 2013
+            start = _expression_range(f"{start_text} {end[0].year - 1}", now)
+    elif end is None and start is not None:
+        end = _expression_range(f"{end_text} {start[1].year}", now)
+        if end is not None and end[1] < start[0]:
+            end = _expression_range(f"{end_text} {start[1].year + 1}", now)
+    return start, end
+
+
+def _residual_range(text, now):
+    """
+    Hand phrasings the grammar does not cover to dateparser (imported on first use).
+    """
+    try:
+        from dateparser.search import search_dates
+    except ImportError:
+        return None
+    results = search_dates(text, settings={"RELATIVE_BASE": now, "PREFER_DATES_FROM": "past"}) or []
+    dates = sorted({date.replace(hour=0, minute=0, second=0, microsecond=0) for _, date in results})
+    if len(dates) == 1:
+        return dates[0], dates[0]
+    if len(dates) == 2:
+        return dates[0], dates[1]
+    return None
+
+
+def parse_date_range(query, now=None, fallback=True):
+    """
+    Extract a date range from a question.
+
+    Args:
+    - query (str): The user's question.
+    - now (datetime): Reference time for relative periods (defaults to the current time).
+    - fallback (bool): Use dateparser for phrasings the grammar does not cover.
+
+    Returns:
+    - Tuple[datetime, datetime]: Start and end of the range (inclusive), or None.
+    """
+    text = query.lower()
+    now = now or datetime.now()
+
+    match = RANGE_PATTERN.search(text)
+    if match:
+        start, end = _range_sides(match.group(1), match.group(2), now)
+        if start and end:
+            return min(start[0], end[0]), max(start[1], end[1])
+
+    match = SINCE_PATTERN.search(text)
+    if match:
+        start = _expression_range(match.group(1), now)
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        if start and start[0] <= today:
+            return start[0], today
+
+    periods = _period_ranges(text, now)
+    if periods:
+        return periods[0]
+
+    dates = _date_ranges(text)
+    if len(dates) == 1:
+        return dates[0]
+    if len(dates) == 2:
+        return min(dates[0][0], dates[1][0]), max(dates[0][1], dates[1][1])
+    if dates:
+        return None
+
+    match = YEAR_PATTERN.search(text)
+    if match:
+        year = int(match.group(1) or match.group(2))
+        return datetime(year, 1, 1), datetime(year, 12, 31)
+
+    if fallback and RESIDUAL_HINT_PATTERN.search(text):
+        return _residual_range(text, now)
+    return None
+
+
+def extract_date_range(query, now=None, fallback=True):
+    """
+    Extract a date range from a question as ['YYYY-MM-DD', 'YYYY-MM-DD'], or None.
+    """
+    result = parse_date_range(query, now=now, fallback=fallback)
+    if not result:
+        return None
+    return [result[0].strftime("%Y-%m-%d"), result[1].strftime("%Y-%m-%d")]
+
+
+def fiscal_year_label(query):
+    """
+    The fiscal year named as a range in a question ("FY2013-14", "fiscal year 2013-2014"), in the
+    dataset's "2013-2014" form, or None. A single year ("FY2014") is left to the caller, since users
+    use it for both fiscal years that touch that calendar year.
+    """
+    match = FISCAL_PATTERN.search(query.lower())
+    if not match or not match.group(2):
+        return None
+    start_year, end_year = _fiscal_year_match(match.group(0))
+    return f"{start_year}-{end_year}"
+
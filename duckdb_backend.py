@@ -0,0 +1,785 @@
+# -*- coding: utf-8 -*-
+"""
+DuckDB analytics backend over partitioned Parquet.
+
+Implements every handler in query_functions.intent_map as DuckDB SQL with the
+same signature (the data source first) and the same output shapes, so the
+chat endpoint can run on a laptop or CI machine with no MongoDB. The cleaned
+dataset from main.py is exported to Parquet partitioned by fiscal year.
+
+Usage:
+    python duckdb_backend.py export --output purchases_parquet            # from MongoDB
+    python duckdb_backend.py export --synthetic 1000000 --output purchases_parquet
+"""
+import argparse
+import os
+import shutil
+from datetime import datetime
+
+import duckdb
+
+from query_functions import (date_range_bounds, extract_fiscal_year_from_query, extract_purchase_order_number_from_query,
+                             extract_spending_filters, extract_supplier_name_from_query, format_currency,
+                             format_large_number, handle_greeting)
+
+PARTITION_COLUMN = "fiscal_year"
+
+
+# Export
+def _partition_value(fiscal_year):
+    return str(fiscal_year) if fiscal_year else "unknown"
+
+
+def _clear_output(output_dir):
+    # Every export writes a new file per batch and partition, so a previous export would be read as well.
+    # Only the partition directories are removed, in case output_dir holds anything else.
+    if not os.path.isdir(output_dir):
+        return
+    for name in os.listdir(output_dir):
+        path = os.path.join(output_dir, name)
+        if name.startswith(f"{PARTITION_COLUMN}=") and os.path.isdir(path):
+            shutil.rmtree(path)
+
+
+def _write_partitioned(table, output_dir):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    partitions = [_partition_value(value) for value in table.column("Fiscal Year").to_pylist()]
+    table = table.append_column(PARTITION_COLUMN, pa.array(partitions, pa.string()))
+    pq.write_to_dataset(table, output_dir, partition_cols=[PARTITION_COLUMN], compression="zstd")
+
+
+def export_collection_to_parquet(collection, output_dir="purchases_parquet", batch_size=100000):
+    """
+    Export the cleaned purchases collection to Parquet partitioned by fiscal year.
+
+    Documents are streamed from the cursor in batches; the column types of the first
+    batch are used for every later batch so all files share one schema. Any previous
+    export in output_dir is replaced.
+    """
+    import pyarrow as pa
+
+    _clear_output(output_dir)
+    schema, batch, written = None, [], 0
+
+    def flush(rows):
+        nonlocal schema
+        table = pa.Table.from_pylist(rows)
+        if schema is None:
+            schema = pa.schema([
+                pa.field(field.name, pa.string() if pa.types.is_null(field.type) else field.type)
+                for field in table.schema
+            ])
+        table = pa.Table.from_pylist(rows, schema=schema)
+        _write_partitioned(table, output_dir)
+
+    for document in collection.find({}, {"_id": 0}, batch_size=10000):
+        batch.append(document)
+        if len(batch) >= batch_size:
+            flush(batch)
+            written += len(batch)
+            batch = []
+            print(f"Exported {written:,} rows", end="\r")
+    if batch:
+        flush(batch)
+        written += len(batch)
+    print(f"\nExported {written:,} rows to {output_dir}")
+    return written
+
+
+def export_synthetic_to_parquet(rows, output_dir="purchases_parquet", seed=0):
+    """
+    Write a synthetic dataset (see generate_dataset.py) as partitioned Parquet, replacing any previous export.
+    """
+    from generate_dataset import chunk_to_table, generate_chunks
+
+    _clear_output(output_dir)
+    written = 0
+    for chunk in generate_chunks(rows, seed=seed):
+        _write_partitioned(chunk_to_table(chunk), output_dir)
+        written += len(chunk["Quantity"])
+    print(f"Exported {written:,} synthetic rows to {output_dir}")
+    return written
+
+
+# Data source
+class DuckDBCollection:
+    """
+    Read-only view of the partitioned Parquet dataset.
+
+    Exposes `distinct` like a pymongo collection so the entity extractors in
+    query_functions.py work unchanged.
+    """
+
+    def __init__(self, parquet_dir="purchases_parquet", threads=None):
+        self.parquet_dir = parquet_dir
+        self.connection = duckdb.connect()
+        if threads:
+            self.connection.execute(f"SET threads TO {int(threads)}")
+        pattern = os.path.join(parquet_dir, "**", "*.parquet").replace("'", "''")
+        self.connection.execute(
+            f"CREATE VIEW purchases AS SELECT * FROM read_parquet('{pattern}', hive_partitioning = true, "
+            f"hive_types_autocast = false, union_by_name = true)"
+        )
+        self._distinct_cache = {}
+
+    def cursor(self):
+        # DuckDB connections are not safe to share between threads; each call gets its own cursor
+        return self.connection.cursor()
+
+    def rows(self, sql, params=None):
+        """
+        Run a query and return the rows as dictionaries.
+        """
+        try:
+            cursor = self.cursor()
+            cursor.execute(sql, params or [])
+            columns = [description[0] for description in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        except Exception as e:
+            print("Query execution failed:", e)
+            return []
+
+    def dataset_version(self):
+        """
+        Identifies the exported data: path, mtime and size of every Parquet file (the view reads them on each query).
+        """
+        files = []
+        for directory, _, names in os.walk(self.parquet_dir):
+            for name in names:
+                if name.endswith(".parquet"):
+                    path = os.path.join(directory, name)
+                    stat = os.stat(path)
+                    files.append((os.path.relpath(path, self.parquet_dir), stat.st_mtime_ns, stat.st_size))
+        return tuple(sorted(files))
+
+    def distinct(self, field):
+        if field not in self._distinct_cache:
+            result = self.rows(f'SELECT DISTINCT "{field}" AS value FROM purchases WHERE "{field}" IS NOT NULL')
+            self._distinct_cache[field] = [row["value"] for row in result]
+        return self._distinct_cache[field]
+
+
+def _contains_value(source, field, query):
+    """
+    Return the first distinct value of `field` that appears in the query (case-insensitive).
+    """
+    query = query.lower()
+    for value in source.distinct(field):
+        if str(value).lower() in query:
+            return value
+    return None
+
+
+def _extract_item_name(source, query):
+    quoted = [part for part in query.split("'")[1::2] if part.strip()]
+    if quoted:
+        return quoted[0]
+    # Prefer the longest catalogue name mentioned in the query
+    query_lower = query.lower()
+    matches = [name for name in source.distinct("Item Name") if str(name).lower() in query_lower]
+    return max(matches, key=len) if matches else None
+
+
+# Handlers (same names, signatures and output shapes as query_functions.py)
+def get_highest_spending_quarter(source):
+    result = source.rows("""
+        SELECT 'Q' || CAST(ceil(month("Creation Date") / 3.0) AS INTEGER) AS _id,
+               SUM("Total Price") AS total_spending
+        FROM purchases GROUP BY 1 ORDER BY total_spending DESC LIMIT 1
+    """)
+    return result[0] if result else {}
+
+
+def get_total_orders(source, start_date, end_date):
+    try:
+        start_date, end_date = date_range_bounds(start_date, end_date)
+        result = source.rows('SELECT COUNT(*) AS total_orders FROM purchases '
+                             'WHERE "Creation Date" >= ? AND "Creation Date" < ?', [start_date, end_date])
+        return result[0]["total_orders"] if result else 0
+    except Exception as e:
+        raise ValueError(f"Error fetching total orders: {e}")
+
+
+def get_frequent_line_items(source, top_n=5):
+    result = source.rows('SELECT "Item Name" AS _id, COUNT(*) AS frequency FROM purchases '
+                         'GROUP BY 1 ORDER BY frequency DESC LIMIT ?', [top_n])
+    return [{"Item Name": item["_id"], "Frequency": item["frequency"]} for item in result]
+
+
+def get_total_quantity(source):
+    try:
+        result = source.rows('SELECT COALESCE(SUM("Quantity"), 0) AS total_quantity FROM purchases')
+        total_quantity = result[0]["total_quantity"] if result else 0
+        return {"success": True, "total_quantity": int(total_quantity)}
+    except Exception as e:
+        return {"success": False, "message": f"An error occurred: {str(e)}"}
+
+
+def get_orders_by_supplier(source, supplier_name):
+    if not supplier_name:
+        return [{"Message": "No supplier name provided. Please specify a supplier."}]
+    supplier_name = supplier_name.strip()
+    try:
+        orders = source.rows('SELECT "Purchase Order Number", "Total Price", "Creation Date" FROM purchases '
+                             'WHERE lower("Supplier Name") = lower(?)', [supplier_name])
+        if not orders:
+            return [{"Message": f"No orders found for supplier: {supplier_name}."}]
+        formatted_orders = []
+        for order in orders:
+            total_price = order.get("Total Price", 0)
+            creation_date = order.get("Creation Date")
+            formatted_orders.append({
+                "Purchase Order Number": order.get("Purchase Order Number", "N/A"),
+                "Total Price": f"${total_price:,.2f}" if isinstance(total_price, (int, float)) else total_price,
+                "Creation Date": creation_date.strftime("%Y-%m-%d") if isinstance(creation_date, datetime) else "N/A",
+            })
+        return formatted_orders
+    except Exception as e:
+        return [{"Message": f"Error fetching orders for supplier {supplier_name}: {str(e)}"}]
+
+
+def _group_sum(source, field, measure, alias, order=None, limit=None):
+    sql = f'SELECT "{field}" AS _id, {measure} AS {alias} FROM purchases GROUP BY 1 ORDER BY {order or alias + " DESC"}'
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    return source.rows(sql)
+
+
+# Acquisition Methods
+def get_acquisition_method_avg_price(source):
+    results = _group_sum(source, "Acquisition Method", 'AVG("Unit Price")', "avg_price")
+    return [{"Acquisition Method": r["_id"], "Average Price": round(r["avg_price"], 2)} for r in results]
+
+
+def get_acquisition_method_department(source):
+    results = source.rows("""
+        SELECT "Acquisition Method" AS method, "Department Name" AS department, SUM("Total Price") AS total_spending
+        FROM purchases GROUP BY 1, 2 ORDER BY method, department
+    """)
+    return [{"Acquisition Method": r["method"], "Department": r["department"],
+             "Total Spending": round(r["total_spending"], 2)} for r in results]
+
+
+def get_acquisition_method_frequency(source):
+    results = _group_sum(source, "Acquisition Method", "COUNT(*)", "frequency")
+    return [{"Acquisition Method": r["_id"], "Frequency": r["frequency"]} for r in results]
+
+
+def get_acquisition_method_spending(source):
+    results = _group_sum(source, "Acquisition Method", 'SUM("Total Price")', "total_spending")
+    return [{"Acquisition Method": r["_id"], "Total Spending": round(r["total_spending"], 2)} for r in results]
+
+
+# Acquisition Types
+def get_acquisition_spending(source):
+    results = _group_sum(source, "Acquisition Type", 'SUM("Total Price")', "total_spending")
+    return [{"Acquisition Type": r["_id"], "Total Spending": round(r["total_spending"], 2)} for r in results]
+
+
+def get_acquisition_type_department_usage(source):
+    results = source.rows("""
+        SELECT "Acquisition Type" AS type, "Department Name" AS department, SUM("Total Price") AS total_spending
+        FROM purchases GROUP BY 1, 2 ORDER BY type, department
+    """)
+    return [{"Acquisition Type": r["type"], "Department": r["department"],
+             "Total Spending": round(r["total_spending"], 2)} for r in results]
+
+
+def get_acquisition_type_orders(source):
+    results = _group_sum(source, "Acquisition Type", "COUNT(*)", "total_orders")
+    return [{"Acquisition Type": r["_id"], "Total Orders": r["total_orders"]} for r in results]
+
+
+def get_acquisition_type_top_suppliers(source):
+    results = source.rows("""
+        SELECT "Acquisition Type" AS type, "Supplier Name" AS supplier, SUM("Total Price") AS total_spending
+        FROM purchases GROUP BY 1, 2 ORDER BY total_spending DESC LIMIT 10
+    """)
+    return [{"Acquisition Type": r["type"], "Supplier": r["supplier"],
+             "Total Spending": round(r["total_spending"], 2)} for r in results]
+
+
+# Quantity and Unit Price
+def get_avg_quantity_per_order(source):
+    result = source.rows('SELECT AVG("Quantity") AS avg_quantity FROM purchases')
+    if not result or result[0]["avg_quantity"] is None:
+        return {}
+    return {"Average Quantity Per Order": round(result[0]["avg_quantity"], 2)}
+
+
+def get_avg_unit_price_by_category(source):
+    results = _group_sum(source, "Classification Codes", 'AVG("Unit Price")', "avg_unit_price")
+    return [{"Classification Code": r["_id"], "Average Unit Price": round(r["avg_unit_price"], 2)} for r in results]
+
+
+def get_bulk_items(source):
+    results = source.rows('SELECT "Item Name", "Quantity" FROM purchases WHERE "Quantity" >= 100 '
+                          'ORDER BY "Quantity" DESC LIMIT 10')
+    return [{"Item Name": r["Item Name"], "Quantity": r["Quantity"]} for r in results]
+
+
+def get_high_unit_price_items(source, threshold=1000, top_n=10):
+    results = source.rows('SELECT "Item Name", "Unit Price", "Purchase Order Number" FROM purchases '
+                          'WHERE "Unit Price" > ? ORDER BY "Unit Price" DESC LIMIT ?', [threshold, top_n])
+    return [
+        {"Item Name": r.get("Item Name") or "Unknown Item", "Unit Price": f"${r['Unit Price']:,.2f}",
+         "Purchase Order Number": r.get("Purchase Order Number") or "Unknown Order"}
+        for r in results
+    ]
+
+
+# CalCard
+def get_calcard_frequent_items(source):
+    results = _group_sum(source, "Item Name", "COUNT(*)", "frequency", limit=10)
+    return [{"Item Name": r["_id"], "Frequency": r["frequency"]} for r in results]
+
+
+def get_calcard_orders(source):
+    results = _group_sum(source, "CalCard", "COUNT(*)", "total_orders")
+    return [{"CalCard": r["_id"], "Total Orders": r["total_orders"]} for r in results]
+
+
+def get_calcard_top_departments(source):
+    results = source.rows("""
+        SELECT "CalCard" AS calcard, "Department Name" AS department, SUM("Total Price") AS total_spending
+        FROM purchases GROUP BY 1, 2 ORDER BY total_spending DESC
+    """)
+    return [{"CalCard": r["calcard"], "Department": r["department"],
+             "Total Spending": round(r["total_spending"], 2)} for r in results]
+
+
+def get_calcard_total_spending(source):
+    results = _group_sum(source, "CalCard", 'SUM("Total Price")', "total_spending")
+    return [{"CalCard": r["_id"], "Total Spending": round(r["total_spending"], 2)} for r in results]
+
+
+# Combined filters
+def get_filtered_spending(source, query):
+    filters = extract_spending_filters(source, query)
+    if not filters:
+        return {"Message": "No CalCard, department, acquisition type or fiscal year found in the query."}
+    clauses, parameters = [], []
+    for field, value in filters.items():
+        if field == "Fiscal Year":
+            clauses.append(_fiscal_year_filter())
+            parameters += [value, value]
+        else:
+            clauses.append(f'"{field}" = ?')
+            parameters.append(value)
+    result = source.rows(f'SELECT SUM("Total Price") AS total_spending, COUNT(*) AS n FROM purchases '
+                         f'WHERE {" AND ".join(clauses)}', parameters)
+    return {"Filters": filters, "Total Spending": format_currency(result[0]["total_spending"] or 0),
+            "Total Orders": result[0]["n"]}
+
+
+# Miscellaneous
+def get_cheapest_item(source):
+    result = source.rows('SELECT * FROM purchases ORDER BY "Unit Price" ASC NULLS FIRST LIMIT 1')
+    if not result:
+        return None
+    cheapest_item = result[0]
+    return {
+        "Item Name": cheapest_item.get("Item Name", "N/A"),
+        "Unit Price": cheapest_item.get("Unit Price", "N/A"),
+        "Department Name": cheapest_item.get("Department Name", "N/A"),
+        "Supplier Name": cheapest_item.get("Supplier Name", "N/A"),
+        "Purchase Order Number": cheapest_item.get("Purchase Order Number", "N/A"),
+        "Description": cheapest_item.get("Item Description", "N/A"),
+    }
+
+
+def get_highest_total_price_order(source):
+    results = _group_sum(source, "Purchase Order Number", 'SUM("Total Price")', "total_price", limit=1)
+    return [{"Purchase Order Number": r["_id"], "Total Price": round(r["total_price"], 2)} for r in results]
+
+
+def get_large_quantity_orders(source):
+    results = source.rows('SELECT "Item Name", "Quantity", "Purchase Order Number" FROM purchases '
+                          'WHERE "Quantity" >= 50 ORDER BY "Quantity" DESC')
+    return [{"Item Name": r["Item Name"], "Quantity": r["Quantity"],
+             "Purchase Order Number": r["Purchase Order Number"]} for r in results]
+
+
+def get_total_price_by_category(source):
+    results = _group_sum(source, "Classification Codes", 'SUM("Total Price")', "total_price")
+    return [{"Classification Code": r["_id"], "Total Price": round(r["total_price"], 2)} for r in results]
+
+
+def get_total_price_by_quarter(source):
+    results = source.rows("""
+        SELECT CAST(ceil(month("Creation Date") / 3.0) AS INTEGER) AS _id, SUM("Total Price") AS total_price
+        FROM purchases GROUP BY 1 ORDER BY 1
+    """)
+    return [{"Quarter": f"Q{r['_id']}", "Total Price": round(r["total_price"], 2)} for r in results]
+
+
+def get_classification_frequent_items(source, top_n=10):
+    results = _group_sum(source, "Classification Codes", "COUNT(*)", "frequency", limit=top_n)
+    return [{"Classification Code": r["_id"], "Frequency": r["frequency"]} for r in results]
+
+
+def get_classification_items(source, classification_code=None):
+    where, params = "", []
+    if classification_code:
+        where, params = 'WHERE "Classification Codes" = ?', [classification_code]
+    results = source.rows(f"""
+        SELECT "Classification Codes" AS classification_code, "Item Name" AS item, SUM("Quantity") AS total_quantity
+        FROM purchases {where} GROUP BY 1, 2 ORDER BY total_quantity DESC
+    """, params)
+    return [{"Classification Code": r["classification_code"], "Item Name": r["item"],
+             "Total Quantity": r["total_quantity"]} for r in results]
+
+
+def get_classification_spending_breakdown(source):
+    results = _group_sum(source, "Classification Codes", 'SUM("Total Price")', "total_spending")
+    return [{"Classification Code": r["_id"], "Total Spending": round(r["total_spending"], 2)} for r in results]
+
+
+def get_top_classification_code(source):
+    try:
+        result = _group_sum(source, "Classification Codes", 'SUM("Total Price")', "total_spending", limit=1)
+        if result:
+            return {"Classification Code": result[0]["_id"], "Total Spending": round(result[0]["total_spending"], 2)}
+        return {"Message": "No data found for classification codes."}
+    except Exception as e:
+        return {"Error": f"An error occurred while fetching the top classification code: {str(e)}"}
+
+
+# Department
+def get_department_item_count(source):
+    results = _group_sum(source, "Department Name", 'SUM("Quantity")', "total_item_count")
+    return [{"Department Name": r["_id"], "Total Item Count": format_large_number(r["total_item_count"])}
+            for r in results]
+
+
+def get_department_spending_breakdown(source):
+    results = _group_sum(source, "Department Name", 'SUM("Total Price")', "total_spending")
+    return [{"Department Name": r["_id"], "Total Spending": format_currency(r["total_spending"])} for r in results]
+
+
+def get_department_suppliers(source, department_name):
+    if not department_name:
+        return [{"Message": "No department name provided. Please specify a department."}]
+    results = source.rows('SELECT DISTINCT "Supplier Name" FROM purchases WHERE lower("Department Name") = lower(?)',
+                          [department_name])
+    return results if results else [{"Message": f"No suppliers found for department: {department_name}."}]
+
+
+def get_department_top_purchases(source, query, top_n=10):
+    department_name = _contains_value(source, "Department Name", query)
+    if not department_name:
+        return [{"Message": "Department name not found in the query."}]
+    results = source.rows("""
+        SELECT "Item Name" AS _id, SUM("Total Price") AS total_spending FROM purchases
+        WHERE "Department Name" = ? GROUP BY 1 ORDER BY total_spending DESC LIMIT ?
+    """, [department_name, top_n])
+    return [{"Item Name": r["_id"], "Total Spending": format_currency(r["total_spending"])} for r in results]
+
+
+def get_quantity_top_department(source):
+    result = _group_sum(source, "Department Name", 'SUM("Quantity")', "total_quantity", limit=1)
+    if result:
+        return {"Department Name": result[0]["_id"], "Total Quantity": result[0]["total_quantity"]}
+    return {"Message": "No data found for department quantities."}
+
+
+def get_department_spending_by_name(source, query):
+    department_name = query
+    if not department_name:
+        return {"Message": "Department name not found in the query. Could you please clarify?"}
+    result = source.rows('SELECT "Department Name" AS _id, SUM("Total Price") AS total FROM purchases '
+                         'WHERE lower("Department Name") = lower(?) GROUP BY 1', [department_name])
+    if result:
+        return {"Department Name": result[0]["_id"], "Total Spending": f"${result[0]['total']:,.2f}"}
+    return {"Message": f"No spending data found for department: {department_name}"}
+
+
+def get_highest_spending_department(source):
+    result = _group_sum(source, "Department Name", 'SUM("Total Price")', "total", limit=1)
+    if result:
+        return {"Department Name": result[0]["_id"], "Total Spending": f"${result[0]['total']:,.2f}"}
+    return {"Message": "No spending data found for any department."}
+
+
+# Fiscal Year (the partition column mirrors "Fiscal Year", so the same predicate prunes files)
+def _fiscal_year_filter(pattern_match=True):
+    if pattern_match:
+        return f'regexp_matches({PARTITION_COLUMN}, ?) AND regexp_matches("Fiscal Year", ?)'
+    return f'{PARTITION_COLUMN} = ? AND "Fiscal Year" = ?'
+
+
+def get_fiscal_year_spending(source, query):
+    fiscal_year = extract_fiscal_year_from_query(query)
+    if not fiscal_year:
+        return [{"Message": "Fiscal year not found in the query."}]
+    results = source.rows(f'SELECT SUM("Total Price") AS total_spending, COUNT(*) AS n FROM purchases '
+                          f'WHERE {_fiscal_year_filter()}', [fiscal_year, fiscal_year])
+    if not results or not results[0]["n"]:
+        return []
+    return [{"Fiscal Year": fiscal_year, "Total Spending": results[0]["total_spending"]}]
+
+
+def get_fiscal_year_top_department(source, query):
+    fiscal_year = extract_fiscal_year_from_query(query)
+    if not fiscal_year:
+        return [{"Message": "Fiscal year not found in the query."}]
+    results = source.rows(f"""
+        SELECT "Department Name" AS _id, SUM("Total Price") AS total_spending FROM purchases
+        WHERE {_fiscal_year_filter()} GROUP BY 1 ORDER BY total_spending DESC LIMIT 1
+    """, [fiscal_year, fiscal_year])
+    return [{"Department Name": results[0]["_id"], "Total Spending": format_currency(results[0]["total_spending"])}
+            ] if results else []
+
+
+def get_fiscal_year_expensive_item(source, query):
+    fiscal_year = extract_fiscal_year_from_query(query)
+    if not fiscal_year:
+        return [{"Message": "Fiscal year not found in the query. Could you please specify the fiscal year?"}]
+    result = source.rows(f'SELECT * FROM purchases WHERE {_fiscal_year_filter(False)} '
+                         f'ORDER BY "Unit Price" DESC LIMIT 1', [fiscal_year, fiscal_year])
+    if result:
+        return [{
+            "Item Name": result[0].get("Item Name", "N/A"),
+            "Unit Price": f"${result[0].get('Unit Price', 0):,.2f}",
+            "Purchase Order Number": result[0].get("Purchase Order Number", "N/A"),
+            "Department Name": result[0].get("Department Name", "N/A"),
+        }]
+    return [{"Message": f"No data found for fiscal year: {fiscal_year}."}]
+
+
+def get_fiscal_year_orders(source, query):
+    fiscal_year = extract_fiscal_year_from_query(query)
+    if not fiscal_year:
+        return [{"Message": "Fiscal year not found in the query. Could you please clarify?"}]
+    result = source.rows(f'SELECT COUNT(*) AS total_orders FROM purchases WHERE {_fiscal_year_filter(False)}',
+                         [fiscal_year, fiscal_year])
+    total_orders = result[0]["total_orders"] if result else 0
+    if total_orders:
+        return [{"Message": f"The total number of orders placed in fiscal year {fiscal_year} is {total_orders}."}]
+    return [{"Message": f"No orders found for the fiscal year {fiscal_year}."}]
+
+
+# Supplier
+def get_supplier_spending(source, query):
+    supplier_name = extract_supplier_name_from_query(source, query)
+    if not supplier_name:
+        return [{"Message": "Supplier name not found in the query."}]
+    results = source.rows('SELECT SUM("Total Price") AS total_spending, COUNT(*) AS n FROM purchases '
+                          'WHERE "Supplier Name" = ?', [supplier_name])
+    if not results or not results[0]["n"]:
+        return []
+    return [{"Supplier Name": supplier_name, "Total Spending": format_currency(results[0]["total_spending"])}]
+
+
+def get_supplier_top_orders(source, query, top_n=10):
+    supplier_name = extract_supplier_name_from_query(source, query)
+    if not supplier_name:
+        return [{"Message": "Supplier name not found in the query."}]
+    results = source.rows("""
+        SELECT "Purchase Order Number" AS _id, SUM("Total Price") AS total_order_value FROM purchases
+        WHERE "Supplier Name" = ? GROUP BY 1 ORDER BY total_order_value DESC LIMIT ?
+    """, [supplier_name, top_n])
+    return [{"Purchase Order Number": r["_id"], "Order Value": format_currency(r["total_order_value"])}
+            for r in results]
+
+
+def get_supplier_top_revenue(source, top_n=10):
+    result = _group_sum(source, "Supplier Name", 'SUM("Total Price")', "total_revenue", limit=top_n)
+    return [{"supplier_name": item["_id"], "total_revenue": item["total_revenue"]} for item in result]
+
+
+def get_supplier_items(source, query):
+    supplier_name = extract_supplier_name_from_query(source, query)
+    if not supplier_name:
+        return "I couldn't find a valid supplier name in your query. Could you please clarify?"
+    result = source.rows("""
+        SELECT "Item Name" AS _id, SUM("Quantity") AS total_quantity FROM purchases
+        WHERE "Supplier Name" = ? GROUP BY 1 ORDER BY total_quantity DESC
+    """, [supplier_name])
+    if result:
+        items = "\n".join([f"{item['_id']} (Quantity: {item['total_quantity']})" for item in result])
+        return f"Items provided by supplier {supplier_name}:\n{items}"
+    return f"No items found for supplier: {supplier_name}"
+
+
+# Items and purchase orders
+def get_spending_by_acquisition_type(source, query):
+    acquisition_type = _contains_value(source, "Acquisition Type", query)
+    if not acquisition_type:
+        return [{"Message": "Acquisition type not found in the query. Could you please clarify?"}]
+    results = source.rows('SELECT "Acquisition Type" AS _id, SUM("Total Price") AS total_spending FROM purchases '
+                          'WHERE "Acquisition Type" = ? GROUP BY 1', [acquisition_type])
+    if results:
+        return [{"Acquisition Type": r["_id"], "Total Spending": f"${r['total_spending']:,.2f}"} for r in results]
+    return [{"Message": f"No spending data found for acquisition type: {acquisition_type}."}]
+
+
+def get_item_details(source, query):
+    item_name = _extract_item_name(source, query)
+    if item_name:
+        return source.rows('SELECT * EXCLUDE (fiscal_year) FROM purchases WHERE "Item Name" = ?', [item_name])
+    return "No item name found in the query. Please clarify."
+
+
+def get_purchase_order_details(source, query):
+    purchase_order_number = extract_purchase_order_number_from_query(query)
+    if purchase_order_number:
+        return source.rows('SELECT * EXCLUDE (fiscal_year) FROM purchases WHERE "Purchase Order Number" = ?',
+                           [purchase_order_number])
+    return "No purchase order number found in the query. Please clarify."
+
+
+def get_purchase_order_supplier(source, query):
+    purchase_order_number = extract_purchase_order_number_from_query(query)
+    if purchase_order_number:
+        result = source.rows('SELECT DISTINCT "Supplier Name" AS _id FROM purchases WHERE "Purchase Order Number" = ?',
+                             [purchase_order_number])
+        return [{"supplier_name": item["_id"]} for item in result]
+    return "No purchase order number found in the query. Please clarify."
+
+
+def get_purchase_order_value(source, query):
+    purchase_order_number = extract_purchase_order_number_from_query(query)
+    if purchase_order_number:
+        result = source.rows('SELECT SUM("Total Price") AS total_value FROM purchases '
+                             'WHERE "Purchase Order Number" = ?', [purchase_order_number])
+        return result[0]["total_value"] if result and result[0]["total_value"] is not None else 0
+    return "No purchase order number found in the query. Please clarify."
+
+
+def get_purchase_order_items(source, query):
+    purchase_order_number = extract_purchase_order_number_from_query(query)
+    if not purchase_order_number:
+        return "I couldn't find a valid purchase order number in your query. Could you please clarify?"
+    result = source.rows('SELECT "Item Name" AS _id, SUM("Quantity") AS total_quantity FROM purchases '
+                         'WHERE "Purchase Order Number" = ? GROUP BY 1', [purchase_order_number])
+    if result:
+        items = "\n".join([f"{item['_id']} (Quantity: {item['total_quantity']})" for item in result])
+        return f"Items in purchase order {purchase_order_number}:\n{items}"
+    return f"No items found for purchase order number: {purchase_order_number}"
+
+
+def get_unit_price_item(source, query):
+    try:
+        item_name = _extract_item_name(source, query)
+        if not item_name:
+            return {"Message": "Item name not found in the query. Could you please clarify?"}
+        result = source.rows('SELECT "Item Name", "Unit Price", "Department Name", "Supplier Name", '
+                             '"Purchase Order Number" FROM purchases WHERE lower("Item Name") = lower(?)', [item_name])
+        if result:
+            return [
+                {
+                    "Item Name": item.get("Item Name", "N/A"),
+                    "Unit Price": f"${item.get('Unit Price', 0):,.2f}",
+                    "Department Name": item.get("Department Name", "N/A"),
+                    "Supplier Name": item.get("Supplier Name", "N/A"),
+                    "Purchase Order Number": item.get("Purchase Order Number", "N/A"),
+                }
+                for item in result
+            ]
+        return {"Message": f"No data found for the item: {item_name}"}
+    except Exception as e:
+        return {"Error": f"An error occurred while fetching the item details: {str(e)}"}
+
+
+def get_largest_order(source):
+    result = _group_sum(source, "Purchase Order Number", 'SUM("Quantity")', "total_quantity", limit=1)
+    if not result:
+        return {"Message": "No orders found in the database."}
+    purchase_order_number = result[0]["_id"]
+    details = source.rows('SELECT "Purchase Order Number", "Department Name", "Supplier Name" FROM purchases '
+                          'WHERE "Purchase Order Number" = ? LIMIT 1', [purchase_order_number])
+    if not details:
+        return {"Message": "Order details not found for the largest order."}
+    return {
+        "Purchase Order Number": details[0].get("Purchase Order Number", "N/A"),
+        "Department Name": details[0].get("Department Name", "N/A"),
+        "Supplier Name": details[0].get("Supplier Name", "N/A"),
+        "Total Quantity": result[0]["total_quantity"],
+    }
+
+
+# Intent-function map for the DuckDB backend (same keys as query_functions.intent_map)
+duckdb_intent_map = {
+    "show_highest_spending_quarter": get_highest_spending_quarter,
+    "total_orders": get_total_orders,
+    "frequent_items": get_frequent_line_items,
+    "acquisition_spending": get_spending_by_acquisition_type,
+    "total_quantity": get_total_quantity,
+    "supplier_orders": get_orders_by_supplier,
+    "acquisition_method_avg_price": get_acquisition_method_avg_price,
+    "acquisition_method_department": get_acquisition_method_department,
+    "acquisition_method_frequency": get_acquisition_method_frequency,
+    "acquisition_method_spending": get_acquisition_method_spending,
+    "acquisition_type_department_usage": get_acquisition_type_department_usage,
+    "acquisition_type_orders": get_acquisition_type_orders,
+    "acquisition_type_spending": get_acquisition_spending,
+    "acquisition_type_top_suppliers": get_acquisition_type_top_suppliers,
+    "avg_quantity_per_order": get_avg_quantity_per_order,
+    "avg_unit_price_by_category": get_avg_unit_price_by_category,
+    "bulk_items": get_bulk_items,
+    "calcard_frequent_items": get_calcard_frequent_items,
+    "calcard_orders": get_calcard_orders,
+    "calcard_top_departments": get_calcard_top_departments,
+    "calcard_total_spending": get_calcard_total_spending,
+    "cheapest_item": get_cheapest_item,
+    "classification_frequent_items": get_classification_frequent_items,
+    "classification_items": get_classification_items,
+    "classification_spending_breakdown": get_classification_spending_breakdown,
+    "department_item_count": get_department_item_count,
+    "department_spending_breakdown": get_department_spending_breakdown,
+    "department_suppliers": get_department_suppliers,
+    "department_top_purchases": get_department_top_purchases,
+    "fiscal_year_expensive_item": get_fiscal_year_expensive_item,
+    "fiscal_year_orders": get_fiscal_year_orders,
+    "fiscal_year_spending": get_fiscal_year_spending,
+    "fiscal_year_top_department": get_fiscal_year_top_department,
+    "highest_total_price_order": get_highest_total_price_order,
+    "item_details": get_item_details,
+    "large_quantity_orders": get_large_quantity_orders,
+    "purchase_order_details": get_purchase_order_details,
+    "purchase_order_items": get_purchase_order_items,
+    "purchase_order_supplier": get_purchase_order_supplier,
+    "purchase_order_value": get_purchase_order_value,
+    "quantity_top_department": get_quantity_top_department,
+    "supplier_items": get_supplier_items,
+    "supplier_spending": get_supplier_spending,
+    "supplier_top_orders": get_supplier_top_orders,
+    "supplier_top_revenue": get_supplier_top_revenue,
+    "top_classification_code": get_top_classification_code,
+    "total_price_by_category": get_total_price_by_category,
+    "total_price_by_quarter": get_total_price_by_quarter,
+    "unit_price_item": get_unit_price_item,
+    "greeting": handle_greeting,
+    "department_spending_by_name": get_department_spending_by_name,
+    "frequent_line_items": get_frequent_line_items,
+    "highest_spending_department": get_highest_spending_department,
+    "largest_order": get_largest_order,
+    "department_spending": get_department_spending_breakdown,
+    "filtered_spending": get_filtered_spending
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the purchases dataset to partitioned Parquet.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export = subparsers.add_parser("export")
+    export.add_argument("--output", default="purchases_parquet")
+    export.add_argument("--synthetic", type=int, help="Export this many synthetic rows instead of MongoDB data.")
+    export.add_argument("--seed", type=int, default=0)
+    export.add_argument("--mongo-uri", default="mongodb://localhost:27017/")
+    export.add_argument("--db", default="purchases_large")
+    export.add_argument("--collection", default="purchases_dataset")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        export_synthetic_to_parquet(args.synthetic, args.output, seed=args.seed)
+    else:
+        from query_functions import connect_to_mongodb
+        export_collection_to_parquet(connect_to_mongodb(args.mongo_uri, args.db, args.collection), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,89 +1,136 @@
-import logging
-from flask import Flask, request, jsonify, session
-from flask_cors import CORS
-from transformers import pipeline
-from pymongo import MongoClient
-from query_functions import *  # Import the functions from your query_functions file
-connection_string = 'mongodb://localhost:27017/'
-client = MongoClient(connection_string)
+from startup import (STARTUP_MODE, StartupLoader, StartupProfiler, connect_collection, load_intent_pipeline,
+                     spawned_child_bootstrap)
+profiler = StartupProfiler()
+
+# Heavy modules (transformers/torch, pymongo, analytics engines) are imported by the startup steps below
+with profiler.phase("imports"):
+    import json
+    import logging
+    import os
+    from contextlib import ExitStack, nullcontext
+    from flask import Flask, Response, g, request, jsonify, session, stream_with_context
+    from flask_cors import CORS
+    from query_functions import *  # Import the functions from your query_functions file
+    from admission import AdmissionRejected, create_admission_from_env
+    from answer_cache import create_answer_cache_from_env
+    from coalescing import create_single_flight_from_env
+    from serialization import ResponseEncoder, ResponseMetrics, dumps, dumps_text
+    from streaming import STREAM_FORMATS, encode_stream, negotiate_format, row_events
+    from tracing import (create_tracer_from_env, current_server_timing, current_span, install_pymongo_listener, span,
+                         start_span)
+    from unspsc_index import format_classification_rollup, get_classification_rollup, parse_hierarchy_query
 
-# Access the database and collection
-db = client['purchases_large']  
-collection = db['purchases_dataset']  
+connection_string = 'mongodb://localhost:27017/'
+collection = None  # Set by connect_database()
 app = Flask(__name__)
 CORS(app)
 app.config['SECRET_KEY'] = 'mysecret'
 
-# Load the pre-trained model and intent mappings
+# Encodes /chat answers (fast JSON with BSON types, MessagePack, gzip/brotli; see serialization.py)
+response_metrics = ResponseMetrics()
+response_encoder = ResponseEncoder(response_metrics)
+
+# Per-intent-class concurrency limits and load shedding (see admission.py); None with ADMISSION_CONTROL=off
+admission = create_admission_from_env()
+
+# Concurrent identical handler calls share one execution (see coalescing.py); None with SINGLE_FLIGHT=off
+handler_flights = create_single_flight_from_env()
+
+# Formatted answers to the parameterless intents, warmed in the background (see answer_cache.py);
+# None with ANSWER_CACHE=off
+answer_cache = create_answer_cache_from_env()
+
+# Per-request spans, Server-Timing headers and trace export (see tracing.py)
+tracer = create_tracer_from_env()
+TRACED_ENDPOINTS = {"chatbot", "chatbot_stream"}
+
+# Path to the pre-trained model and intent mappings
 model_path = 'procurement_intent_model'  # Path to your model directory
-nlp_model = pipeline("text-classification", model=model_path, tokenizer=model_path)
-import json
+nlp_model = None  # Set by load_intent_model()
+
+# Intent backend: "pipeline" (fine-tuned classifier), "index" (nearest-neighbour index, see intent_index.py)
+# or "joint" (intent + entity tagging in one pass, see joint_model.py)
+intent_backend = os.environ.get("INTENT_BACKEND", "pipeline")
+intent_index = None
+joint_predictor = None
+inference_pool = None  # INFERENCE_REPLICAS > 0: model replicas in separate processes (see inference_pool.py)
 
 # Load label mapping from the model directory
 with open(f"{model_path}/label_mapping.json", "r") as f:
     label_to_intent = json.load(f)
 
-# Intent-function map
-intent_map = {
-    "show_highest_spending_quarter": get_highest_spending_quarter,
-    "total_orders": get_total_orders,
-    "frequent_items": get_frequent_line_items,
-    "acquisition_spending": get_spending_by_acquisition_type,
-    "total_quantity": get_total_quantity,
-    "supplier_orders": get_orders_by_supplier,
-    "acquisition_method_avg_price": get_acquisition_method_avg_price,
-    "acquisition_method_department": get_acquisition_method_department,
-    "acquisition_method_frequency": get_acquisition_method_frequency,
-    "acquisition_method_spending": get_acquisition_method_spending,
-    "acquisition_type_department_usage": get_acquisition_type_department_usage,
-    "acquisition_type_orders": get_acquisition_type_orders,
-    "acquisition_type_spending": get_acquisition_spending,
-    "acquisition_type_top_suppliers": get_acquisition_type_top_suppliers,
-    "avg_quantity_per_order": get_avg_quantity_per_order,
-    "avg_unit_price_by_category": get_avg_unit_price_by_category,
-    "bulk_items": get_bulk_items,
-    "calcard_frequent_items": get_calcard_frequent_items,
-    "calcard_orders": get_calcard_orders,
-    "calcard_top_departments": get_calcard_top_departments,
-    "calcard_total_spending": get_calcard_total_spending,
-    "cheapest_item": get_cheapest_item,
-    "classification_frequent_items": get_classification_frequent_items,
-    "classification_items": get_classification_items,
-    "classification_spending_breakdown": get_classification_spending_breakdown,
-    "department_item_count": get_department_item_count,
-    "department_spending_breakdown": get_department_spending_breakdown,
-    "department_suppliers": get_department_suppliers,
-    "department_top_purchases": get_department_top_purchases,
-    "fiscal_year_expensive_item": get_fiscal_year_expensive_item,
-    "fiscal_year_orders": get_fiscal_year_orders,
-    "fiscal_year_spending": get_fiscal_year_spending,
-    "fiscal_year_top_department": get_fiscal_year_top_department,
-    "highest_total_price_order": get_highest_total_price_order,
-    "item_details": get_item_details,
-    "large_quantity_orders": get_large_quantity_orders,
-    "purchase_order_details": get_purchase_order_details,
-    "purchase_order_items": get_purchase_order_items,
-    "purchase_order_supplier": get_purchase_order_supplier,
-    "purchase_order_value": get_purchase_order_value,
-    "quantity_top_department": get_quantity_top_department,
-    "supplier_items": get_supplier_items,
-    "supplier_spending": get_supplier_spending,
-    "supplier_top_orders": get_supplier_top_orders,
-    "supplier_top_revenue": get_supplier_top_revenue,
-    "top_classification_code": get_top_classification_code,
-    "total_price_by_category": get_total_price_by_category,
-    "total_price_by_quarter": get_total_price_by_quarter,
-    "unit_price_item": get_unit_price_item,
-    "greeting": handle_greeting,
-    "department_spending_by_name": get_department_spending_by_name,
-    "frequent_line_items": get_frequent_line_items,
-    "highest_spending_department": get_highest_spending_department,
-    "largest_order": get_largest_order,
-    "department_spending": get_department_spending_breakdown
+
+def connect_database():
+    global collection
+    # Count round trips per span; the listener must be registered before the client is created
+    install_pymongo_listener()
+    # Access the database and collection
+    collection = connect_collection(connection_string, 'purchases_large', 'purchases_dataset', profiler)
+
+
+def load_analytics_backend():
+    global collection, intent_map
+    # Analytics backend: "mongodb" (default), "duckdb", "numpy", "sharded" or "partitioned" (see backends.py)
+    if os.environ.get("ANALYTICS_BACKEND", "mongodb") != "mongodb":
+        from backends import get_backend_from_env
+        collection, intent_map = get_backend_from_env()
+
+
+def load_intent_model():
+    global nlp_model, intent_index, joint_predictor, inference_pool
+    if int(os.environ.get("INFERENCE_REPLICAS", 0)) > 0:
+        with profiler.phase("model_load"):
+            from inference_pool import create_pool_from_env
+            inference_pool = create_pool_from_env(intent_backend)
+    elif intent_backend == "index":
+        with profiler.phase("model_load"):
+            from intent_index import IntentIndex
+            intent_index = IntentIndex().load()
+    elif intent_backend == "joint":
+        with profiler.phase("model_load"):
+            from joint_model import JointPredictor
+            joint_predictor = JointPredictor()
+    else:
+        nlp_model = load_intent_pipeline(model_path, profiler)
+
+
+# STARTUP_MODE=lazy runs these in a background thread while /health reports not ready (see startup.py)
+startup = StartupLoader(profiler, [
+    (None, connect_database),
+    ("analytics_backend", load_analytics_backend),
+    (None, load_intent_model),
+])
+# Spawned inference replicas and shard workers re-import this script; only the serving process starts up
+if not spawned_child_bootstrap():
+    startup.start(background=STARTUP_MODE == "lazy")
+
+# Intent-function map (intent_map) is defined in query_functions.py
+
+# Intents whose handlers find the item or purchase order number in the message text themselves
+TEXT_QUERY_INTENTS = {
+    "item_details", "unit_price_item",
+    "purchase_order_details", "purchase_order_items", "purchase_order_supplier", "purchase_order_value",
+    "filtered_spending",
+}
+
+# Single-filter spending intents; a question combining several filters is answered by filtered_spending
+SPENDING_INTENTS = {
+    "acquisition_type_spending", "calcard_total_spending", "department_spending_by_name", "fiscal_year_spending",
+}
+
+# Classification intents that can be answered per UNSPSC segment/family/class/commodity
+CLASSIFICATION_INTENTS = {
+    "avg_unit_price_by_category", "classification_items", "classification_spending_breakdown",
+    "top_classification_code", "total_price_by_category",
 }
 
 # Function to detect the intent from user input
 def detect_intent(user_input):
+    if inference_pool is not None:
+        return inference_pool.classify(user_input)
+    if intent_index is not None:
+        return intent_index.classify(user_input)
+
     result = nlp_model(user_input)
     label_index = result[0]["label"].replace("LABEL_", "")
     
@@ -93,6 +140,20 @@ def detect_intent(user_input):
         print(f"Unrecognized intent label: {label_index}")
         return None  # Return None if the intent is not recognized
     return intent
+
+def detect_intent_and_entities(user_input):
+    """
+    Detect the intent and, with the joint backend, the entities of the user's message.
+
+    Returns:
+    - Tuple[str, Dict[str, str]]: The intent and entities keyed by type (empty for the other backends).
+    """
+    if inference_pool is not None:
+        return inference_pool.predict(user_input)
+    if joint_predictor is not None:
+        return joint_predictor.predict(user_input)
+    return detect_intent(user_input), {}
+
 def generate_response(intent, result, extracted_dates=None):
     """
     Generate a user-friendly response based on the intent and result.
@@ -164,6 +225,13 @@ def generate_response(intent, result, extracted_dates=None):
     elif intent == "calcard_total_spending":
         return f"The total spending using CalCard is ${result:,.2f}."
 
+    elif intent == "filtered_spending":
+        if isinstance(result, dict) and "Message" not in result:
+            filters = ", ".join(f"{field}: {', '.join(map(str, value)) if isinstance(value, list) else value}"
+                                for field, value in result["Filters"].items())
+            return f"Total spending for {filters} is {result['Total Spending']} ({result['Total Orders']} line items)."
+        return result.get("Message", "No spending data found for the specified filters.")
+
     elif intent == "classification_spending_breakdown":
         if isinstance(result, list) and result:
             breakdown = "\n".join([f"Code: {item['classification_code']}, Spending: ${item['total_spending']:,}" for item in result])
@@ -187,10 +255,46 @@ def generate_response(intent, result, extracted_dates=None):
         if isinstance(result, dict):
             details = "\n".join([f"{key}: {value}" for key, value in result.items()])
             return f"Details of the purchase order:\n{details}"
+        if isinstance(result, list) and result:
+            return f"Purchase order {result[0].get('Purchase Order Number', 'N/A')} has {len(result)} line(s)."
         return "No details found for the specified purchase order."
 
+    elif intent == "purchase_order_items":
+        # The handler words the answer itself (or asks for the order number)
+        return result if isinstance(result, str) else "No items found for the specified purchase order."
+
+    elif intent == "purchase_order_supplier":
+        if isinstance(result, list) and result:
+            suppliers = ", ".join(str(entry.get("supplier_name", "N/A")) for entry in result)
+            return f"The purchase order was fulfilled by: {suppliers}."
+        if isinstance(result, str):
+            return result
+        return "No supplier found for the specified purchase order."
+
+    elif intent == "purchase_order_value":
+        if isinstance(result, (int, float)):
+            return f"The total value of the purchase order is ${result:,.2f}."
+        if isinstance(result, str):
+            return result
+        return "No value found for the specified purchase order."
+
+    elif intent == "item_details":
+        if isinstance(result, list) and result:
+            items = ", ".join(sorted({str(item.get("Item Name", "N/A")) for item in result}))
+            return f"Found {len(result)} purchase record(s) for: {items}."
+        if isinstance(result, str):
+            return result
+        return "No details found for the specified item."
+
     elif intent == "unit_price_item":
-        return f"The unit price for the specified item is ${result:,.2f}."
+        if isinstance(result, list) and result:
+            prices = "\n".join(f"- {item['Item Name']}: {item['Unit Price']} (PO {item['Purchase Order Number']}, "
+                               f"{item['Supplier Name']})" for item in result[:10])
+            more = f"\n... and {len(result) - 10} more purchase(s)." if len(result) > 10 else ""
+            return f"Unit prices for the matching item(s):\n{prices}{more}"
+        if isinstance(result, dict):
+            return result.get("Message") or result.get("Error") or "No unit price found for the specified item."
+        return "No unit price found for the specified item."
 
     elif intent == "supplier_top_revenue":
         if isinstance(result, dict):
@@ -645,103 +749,520 @@ def generate_response(intent, result, extracted_dates=None):
         return "I'm sorry, I couldn't process your request. Could you please try again or rephrase your query?"
     
 
+@app.route('/health', methods=['GET'])
+def health():
+    body, status_code = startup.status()
+    if inference_pool is not None:
+        body["inference_pool"] = inference_pool.stats()
+    body["responses"] = response_metrics.as_dict()
+    if admission is not None:
+        body["admission"] = admission.stats()
+    if handler_flights is not None:
+        body["coalescing"] = handler_flights.stats()
+    if answer_cache is not None:
+        body["answer_cache"] = answer_cache.stats()
+    return jsonify(body), status_code
+
+
+@app.before_request
+def start_trace():
+    if request.endpoint in TRACED_ENDPOINTS:
+        g.trace = tracer.start_trace(f"{request.method} {request.path}", request.headers.get("traceparent"),
+                                     **{"http.method": request.method, "http.route": request.path})
+        g.trace.activate()
+
+
+@app.after_request
+def add_timing_headers(response):
+    trace = g.get("trace")
+    if trace is not None:
+        trace.root.set(**{"http.status_code": response.status_code})
+        # For streamed answers this covers the time to the first byte; the end event has the full timing
+        response.headers["Server-Timing"] = trace.server_timing()
+        response.headers["traceparent"] = trace.traceparent()
+    return response
+
+
+@app.teardown_request
+def finish_trace(error=None):
+    # A streamed answer's trace is finished by traced_stream(), after the teardown of its view
+    if g.get("streaming"):
+        return
+    trace = g.pop("trace", None)
+    if trace is not None:
+        trace.deactivate()
+        tracer.finish(trace, error)
+
+
+def traced_stream(chunks, trace):
+    """
+    Send a streamed answer in its request's trace and finish the trace after the last chunk.
+    """
+    trace.activate()
+    try:
+        yield from chunks
+    finally:
+        trace.deactivate()
+        tracer.finish(trace)
+
+
+def detect(user_input):
+    """
+    detect_intent_and_entities() in a "detect" span; the intent is also set on the request's root span.
+    """
+    with span("detect", backend=intent_backend) as detect_span:
+        intent, entities = detect_intent_and_entities(user_input)
+        detect_span.set(intent=str(intent), entities=len(entities))
+    current_span().set(intent=str(intent))
+    return intent, entities
+
+
+def respond(body, status_code=200):
+    """
+    Encode a /chat response body as negotiated with the client (see serialization.py).
+    """
+    orient = (request.get_json(silent=True) or {}).get("orient")
+    content, headers = response_encoder.encode(body, request.headers.get("Accept"),
+                                               request.headers.get("Accept-Encoding"), orient)
+    return Response(content, status=status_code, headers=headers)
+
+
+def request_priority(data):
+    """
+    "interactive" (default) or "batch", from the X-Request-Priority header or the request body.
+    """
+    return request.headers.get("X-Request-Priority") or data.get("priority") or "interactive"
+
+
+def admission_for(intent, data):
+    """
+    The admit argument of answer_query for this request (None with ADMISSION_CONTROL=off).
+    """
+    if admission is None:
+        return None
+    priority = request_priority(data)
+    return lambda: admission.admit(intent, priority)
+
+
+def shed(intent, rejection):
+    """
+    429 response for a request rejected by admission control.
+    """
+    response = respond({"success": False, "intent": intent,
+                        "message": "The server is busy. Please try again shortly."}, 429)
+    response.headers["Retry-After"] = str(rejection.retry_after)
+    return response
+
+
+class QueryParameters:
+    """
+    Handler parameters found in the message text, extracted on first use and cached.
+
+    The Flask endpoint extracts only what the detected intent needs; the async server (asgi_app.py)
+    extracts everything while intent detection is still running.
+    """
+
+    def __init__(self, user_input):
+        self.user_input = user_input
+        self.values = {}
+
+    def _get(self, name, extract):
+        if name not in self.values:
+            with span("extract", parameter=name) as extract_span:
+                self.values[name] = extract()
+                extract_span.set(found=self.values[name] is not None)
+        return self.values[name]
+
+    def dates(self):
+        return self._get("dates", lambda: extract_dates_from_query(self.user_input))
+
+    def department(self):
+        return self._get("department", lambda: extract_department_from_query(self.user_input, collection))
+
+    def supplier(self):
+        return self._get("supplier", lambda: extract_supplier_name_from_query(collection, self.user_input))
+
+    def fiscal_year(self):
+        return self._get("fiscal_year", lambda: extract_fiscal_year_from_query(self.user_input))
+
+    def spending_filters(self):
+        return self._get("spending_filters", lambda: extract_spending_filters(collection, self.user_input))
+
+    def prefetch(self):
+        self.dates(), self.department(), self.supplier(), self.fiscal_year()
+        return self
+
+    def has_filters(self, entities):
+        """
+        True if the message narrows the question by fiscal year, dates or department.
+        """
+        if any(entities.get(name) for name in ("FISCAL_YEAR", "DATE", "DEPARTMENT")):
+            return True
+        return bool(self.fiscal_year() or self.dates() or self.department())
+
+
+def call_handler(intent, *args, handler=None, admit=None):
+    """
+    Run an intent's handler on the collection, once for all concurrent calls with the same arguments.
+
+    Only the call that executes the handler takes an admission-control slot; identical calls arriving
+    meanwhile wait for its result without one, so a burst of the same question costs one query.
+
+    Args:
+    - intent (str): The detected intent.
+    - *args: Handler arguments after the collection.
+    - handler (Callable): The handler (default: intent_map[intent]).
+    - admit (Callable): Returns the admission-control context to execute in, if any.
+
+    Returns:
+    - Any: The handler's result (shared between coalesced calls; do not mutate).
+    """
+    handler = handler or intent_map[intent]
+    name = getattr(handler, "__name__", intent)
+    executed = []
+
+    def execute():
+        executed.append(True)
+        with ExitStack() as stack:
+            if admit is not None:
+                with span("admission"):
+                    stack.enter_context(admit())
+            return handler(collection, *args)
+
+    with span("query", intent=intent, handler=name, parameters=repr(args)) as query_span:
+        if handler_flights is None:
+            result = execute()
+        else:
+            # Keyed by handler, so intents mapped to the same handler (e.g. department_spending) coalesce too
+            result = handler_flights.do((handler, *args), execute, name)
+        query_span.set(rows=len(result) if isinstance(result, (list, dict)) else int(result is not None),
+                       coalesced=not executed)
+    return result
+
+
+def route_intent(intent, parameters):
+    """
+    The intent whose handler answers the message: spending questions with several filters, or with CalCard
+    negated ("non-calcard spending"), need the combined filtered_spending handler.
+
+    Args:
+    - intent (str): The detected intent.
+    - parameters (QueryParameters): Parameters extracted from the message.
+
+    Returns:
+    - str: The intent to answer.
+    """
+    if intent in SPENDING_INTENTS and "filtered_spending" in intent_map:
+        filters = parameters.spending_filters()
+        if len(filters) > 1 or filters.get("CalCard") == "NO":
+            return "filtered_spending"
+    return intent
+
+
+def answer_query(intent, entities, user_input, parameters=None, admit=None):
+    """
+    Run the handler of a detected intent and build the /chat response body.
+
+    Args:
+    - intent (str): The detected intent.
+    - entities (Dict[str, str]): Entities from the joint backend (empty otherwise); they take precedence
+      over the parameters extracted from the text.
+    - user_input (str): The user's message.
+    - parameters (QueryParameters): Parameters already extracted from the message, if any.
+    - admit (Callable): Returns the admission-control context the handler runs in (see call_handler).
+
+    Returns:
+    - Dict: The response body.
+    """
+    parameters = parameters or QueryParameters(user_input)
+
+    # Check if the intent is in the intent_map
+    if intent not in intent_map:
+        return {"success": False, "message": "Intent not recognized."}
+
+    # Initialize result variable
+    result = None
+
+    intent = route_intent(intent, parameters)
+
+    # Handle specific intents with required parameters
+    if intent == "total_orders":
+        extracted_dates = extract_dates_from_query(entities["DATE"]) if entities.get("DATE") else parameters.dates()
+        if extracted_dates and len(extracted_dates) == 2:
+            start_date, end_date = extracted_dates
+            result = call_handler(intent, start_date, end_date, admit=admit)
+        else:
+            return {"success": False, "message": "Date range not found in query."}
+
+    elif intent == "department_spending_by_name":
+        department_name = entities.get("DEPARTMENT") or parameters.department()
+        if department_name:
+            result = call_handler(intent, department_name, admit=admit)
+        else:
+            return {"success": False, "message": "Department name not found in query."}
+
+    elif intent == "fiscal_year_spending":
+        fiscal_year = entities.get("FISCAL_YEAR") or parameters.fiscal_year()
+        if fiscal_year:
+            result = call_handler(intent, fiscal_year, admit=admit)
+        else:
+            return {"success": False, "message": "Fiscal year not found in query."}
+
+    elif intent == "fiscal_year_orders":
+        fiscal_year = entities.get("FISCAL_YEAR") or parameters.fiscal_year()
+        if fiscal_year:
+            result = call_handler(intent, fiscal_year, admit=admit)
+        else:
+            return {"success": False, "message": "Fiscal year not found in query."}
+
+    elif intent == "supplier_orders":
+        supplier_name = entities.get("SUPPLIER") or parameters.supplier()
+        if supplier_name:
+            result = call_handler(intent, supplier_name, admit=admit)
+        else:
+            return {"success": False, "message": "Supplier name not found in query."}
+    elif intent == "department_suppliers":
+        department_name = entities.get("DEPARTMENT") or parameters.department()
+        print(f"DEBUG: Extracted department name: {department_name}")
+        if department_name:
+            result = call_handler(intent, department_name, admit=admit)
+            print(f"DEBUG: Result from department_suppliers intent: {result}")
+        else:
+            return {"success": False, "message": "Department name not found in query."}
+    
+        if not result:
+            return {"success": False, "message": "No suppliers were found for the specified department."}
+    
+        with span("format", intent=intent):
+            response_message = generate_response(intent, result)
+        return {"success": True, "intent": intent, "message": response_message, "data": result}
+
+    elif intent == "fiscal_year_expensive_item":
+        fiscal_year = entities.get("FISCAL_YEAR") or parameters.fiscal_year()
+        if fiscal_year:
+            result = call_handler(intent, fiscal_year, admit=admit)
+        else:
+            return {"success": False, "message": "Fiscal year not found in query."}
+
+    elif intent in TEXT_QUERY_INTENTS:
+        result = call_handler(intent, user_input, admit=admit)
+
+    # Segment/family/class/commodity questions are answered from the UNSPSC hierarchy index, which holds
+    # all-time totals only; questions with other filters (e.g. a fiscal year) go to the handler
+    elif (intent in CLASSIFICATION_INTENTS and parse_hierarchy_query(user_input)
+          and not parameters.has_filters(entities)):
+        result = call_handler(intent, user_input, handler=get_classification_rollup, admit=admit)
+        with span("format", intent=intent):
+            response_message = format_classification_rollup(result)
+        found = bool(result) and not (isinstance(result, dict) and "Message" in result)
+        return {"success": found, "intent": intent, "message": response_message, "data": result}
+
+    # Handle generic intents without parameters, from the warm answer cache when it has them
+    else:
+        cached = answer_cache.get(intent) if answer_cache is not None else None
+        current_span().set(cached=cached is not None)
+        if cached is not None:
+            return cached
+        result = call_handler(intent, admit=admit)
+
+    return format_answer(intent, result)
+
+
+def format_answer(intent, result):
+    """
+    The /chat response body for a handler's result.
+
+    Args:
+    - intent (str): The detected intent.
+    - result (Any): The handler's result.
+
+    Returns:
+    - Dict: The response body.
+    """
+    # Check if result is None or empty
+    if not result:
+        return {"success": False, "intent": intent, "message": "No data found for the query."}
+
+    # Generate a response
+    with span("format", intent=intent):
+        response_message = generate_response(intent, result)
+
+    # Return a valid response
+    return {"success": True, "intent": intent, "message": response_message, "data": result}
+
+
+def stream_answer(intent, entities, user_input, parameters=None, release=None):
+    """
+    Events of a streamed answer to a detected intent (see streaming.py).
+
+    The header goes out before the query runs. Handlers in streaming_handlers send their rows straight from
+    the MongoDB cursor; every other intent is answered by answer_query and its data sent as rows.
+
+    Args:
+    - intent (str): The detected intent.
+    - entities (Dict[str, str]): Entities from the joint backend (empty otherwise).
+    - user_input (str): The user's message.
+    - parameters (QueryParameters): Parameters already extracted from the message, if any.
+    - release (Callable): Frees the request's admission slot; called as soon as the database work is done
+      (the answer is computed or the cursor exhausted), so sending the rows to a slow client holds no slot.
+
+    Returns:
+    - Iterator[Dict]: Header, row and end (or error) events; the last one carries the request's Server-Timing.
+    """
+    parameters = parameters or QueryParameters(user_input)
+    release = release or (lambda: None)
+    yield {"type": "header", "intent": intent}
+    try:
+        iterate = streaming_handlers.get(intent_map.get(intent))
+        # A warm answer is sent from the cache rather than streamed from the database
+        cached = answer_cache.get(intent) if answer_cache is not None and iterate is not None else None
+        if iterate is None or cached is not None:
+            try:
+                body = cached if cached is not None else answer_query(intent, entities, user_input, parameters)
+            finally:
+                release()
+            # As in the /chat UI, only list answers are tables; any other answer is in the message
+            rows = body["data"] if isinstance(body.get("data"), list) else []
+            yield from timed_events(row_events(rows, body["message"], body["success"]))
+            return
+
+        if intent == "supplier_orders":
+            supplier_name = entities.get("SUPPLIER") or parameters.supplier()
+            if not supplier_name:
+                release()
+                yield {"type": "end", "success": False, "count": 0, "message": "Supplier name not found in query.",
+                       "server_timing": current_server_timing()}
+                return
+            rows = iterate(collection, supplier_name)
+        else:
+            rows = iterate(collection)
+        # The query runs between yields, so its span is not made current (see tracing.start_span)
+        query_span = start_span("query", intent=intent, handler=iterate.__name__, streamed=True)
+        yield from timed_events(row_events(released_when_exhausted(rows, release)), query_span)
+    except Exception as e:
+        release()
+        logging.error(f"Error occurred: {str(e)}")
+        yield {"type": "error", "count": 0, "message": f"An error occurred: {str(e)}",
+               "server_timing": current_server_timing()}
+
+
+def released_when_exhausted(rows, release):
+    """
+    Pass cursor rows through, calling release once the cursor is exhausted (or fails, or is abandoned).
+    """
+    try:
+        yield from rows
+    finally:
+        release()
+
+
+def stream_admission(intent, data):
+    """
+    Admission-control ticket for a streamed answer, or None if it needs none.
+
+    Warm answers are sent without a slot; any other answer holds one until its database work is done
+    (see stream_answer). The intent must already be routed (see route_intent), since a detected intent
+    with a warm answer may be answered by another handler.
+
+    Raises:
+    - AdmissionRejected: The request is shed.
+    """
+    if admission is None or (answer_cache is not None and answer_cache.contains(intent)):
+        return None
+    return admission.acquire(intent, request_priority(data))
+
+
+def timed_events(events, query_span=None):
+    """
+    Pass streamed events through, ending query_span and adding the Server-Timing so far to the end event.
+    """
+    for event in events:
+        if event["type"] in ("end", "error"):
+            if query_span is not None:
+                query_span.set(rows=event["count"]).finish()
+            event["server_timing"] = current_server_timing()
+        yield event
+
+
 @app.route('/chat', methods=['POST'])
 def chatbot():
+    if not startup.ready.is_set():
+        return respond({"success": False, "message": "The chatbot is still starting up. Please try again shortly."}, 503)
+
     data = request.json
     user_input = data.get("message", "")
 
     if not user_input:
-        return jsonify({"success": False, "message": "Input message is missing."})
+        return respond({"success": False, "message": "Input message is missing."})
 
     try:
         # Detect intent
-        intent = detect_intent(user_input)
+        intent, entities = detect(user_input)
         print(f"Detected intent: {intent}")  # Debugging
 
-        # Check if the intent is in the intent_map
-        if intent not in intent_map:
-            return jsonify({"success": False, "message": "Intent not recognized."})
-
-        # Initialize result variable
-        result = None
-
-        # Handle specific intents with required parameters
-        if intent == "total_orders":
-            extracted_dates = extract_dates_from_query(user_input)
-            if extracted_dates and len(extracted_dates) == 2:
-                start_date, end_date = extracted_dates
-                result = intent_map[intent](collection, start_date, end_date)
-            else:
-                return jsonify({"success": False, "message": "Date range not found in query."})
-
-        elif intent == "department_spending_by_name":
-            department_name = extract_department_from_query(user_input,collection)
-            if department_name:
-                result = intent_map[intent](collection, department_name)
-            else:
-                return jsonify({"success": False, "message": "Department name not found in query."})
-
-        elif intent == "fiscal_year_spending":
-            fiscal_year = extract_fiscal_year_from_query(user_input)
-            if fiscal_year:
-                result = intent_map[intent](collection, fiscal_year)
-            else:
-                return jsonify({"success": False, "message": "Fiscal year not found in query."})
-
-        elif intent == "fiscal_year_orders":
-            fiscal_year = extract_fiscal_year_from_query(user_input)
-            if fiscal_year:
-                result = intent_map[intent](collection, fiscal_year)
-            else:
-                return jsonify({"success": False, "message": "Fiscal year not found in query."})
-
-        elif intent == "supplier_orders":
-            supplier_name = extract_supplier_name_from_query(collection, user_input)
-            if supplier_name:
-                result = intent_map[intent](collection, supplier_name)
-            else:
-                return jsonify({"success": False, "message": "Supplier name not found in query."})
-        elif intent == "department_suppliers":
-            department_name = extract_department_from_query(user_input, collection)
-            print(f"DEBUG: Extracted department name: {department_name}")
-            if department_name:
-                result = intent_map[intent](collection, department_name)
-                print(f"DEBUG: Result from department_suppliers intent: {result}")
-            else:
-                return jsonify({"success": False, "message": "Department name not found in query."})
-        
-            if not result:
-                return jsonify({"success": False, "message": "No suppliers were found for the specified department."})
-        
-            response_message = generate_response(intent, result)
-            return jsonify({"success": True, "message": response_message, "data": result})
-
-        elif intent == "fiscal_year_expensive_item":
-            fiscal_year = extract_fiscal_year_from_query(user_input)
-            if fiscal_year:
-                result = intent_map[intent](collection, fiscal_year)
-            else:
-                return jsonify({"success": False, "message": "Fiscal year not found in query."})
+        return respond(answer_query(intent, entities, user_input, admit=admission_for(intent, data)))
 
-        # Handle generic intents without parameters
-        else:
-            result = intent_map[intent](collection)
+    except AdmissionRejected as e:
+        return shed(intent, e)
+    except Exception as e:
+        logging.error(f"Error occurred: {str(e)}")
+        return respond({"success": False, "message": f"An error occurred: {str(e)}"})
 
-        # Check if result is None or empty
-        if not result:
-            return jsonify({"success": False, "message": "No data found for the query."})
 
-        # Generate a response
-        response_message = generate_response(intent, result)
+@app.route('/chat/stream', methods=['POST'])
+def chatbot_stream():
+    """
+    Same request as /chat, answered as NDJSON or SSE events (request "format", or Accept: text/event-stream).
+    """
+    if not startup.ready.is_set():
+        return respond({"success": False, "message": "The chatbot is still starting up. Please try again shortly."}, 503)
 
-        # Return a valid response
-        return jsonify({"success": True, "message": response_message, "data": result})
+    data = request.json
+    user_input = data.get("message", "")
 
+    if not user_input:
+        return respond({"success": False, "message": "Input message is missing."})
 
+    stream_format = negotiate_format(data.get("format"), request.headers.get("Accept"))
+    parameters = QueryParameters(user_input)
+    try:
+        intent, entities = detect(user_input)
+        intent = route_intent(intent, parameters)
     except Exception as e:
         logging.error(f"Error occurred: {str(e)}")
-        return jsonify({"success": False, "message": f"An error occurred: {str(e)}"})
+        return respond({"success": False, "message": f"An error occurred: {str(e)}"})
+
+    try:
+        ticket = stream_admission(intent, data)
+    except AdmissionRejected as e:
+        return shed(intent, e)
+
+    release = (lambda: admission.release(ticket)) if ticket is not None else None
+    events = stream_answer(intent, entities, user_input, parameters, release=release)
+    chunks = encode_stream(events, stream_format, dumps_text)
+    if "trace" in g:
+        chunks = traced_stream(chunks, g.trace)
+        g.streaming = True
+    response = Response(stream_with_context(chunks),
+                        mimetype=STREAM_FORMATS[stream_format],
+                        # Keep proxies from buffering the stream
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    if release is not None:
+        # In case the stream is closed before its database work is done (releasing twice is a no-op)
+        response.call_on_close(release)
+    return response
+
+
+def start_answer_cache():
+    """
+    Warm the parameterless answers once startup has connected the data source, and again on dataset changes.
+    """
+    if answer_cache is not None:
+        answer_cache.start(lambda: collection, lambda: intent_map, format_answer, startup.ready)
+
 
+if not spawned_child_bootstrap():
+    start_answer_cache()
 
 
 if __name__ == "__main__":
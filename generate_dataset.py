@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic procurement dataset generator.
+
+Produces purchase lines with the same columns and types as the cleaned
+collection written by main.py (Creation Date, Fiscal Year, Purchase Order
+Number, Acquisition Type/Method, Department Name, Supplier Code/Name, CalCard,
+Item Name/Description, Quantity, Unit Price, Total Price, Classification Codes
+and Normalized UNSPSC). Departments, suppliers and items follow Zipf-like
+popularity, purchase orders contain several lines that share their header
+fields, and output is deterministic for a given seed and chunk size.
+
+Rows are generated and written chunk by chunk, so 100k to 50M lines can be
+streamed to MongoDB, JSON lines or Parquet without holding them in memory.
+
+Usage:
+    python generate_dataset.py --rows 1000000 --format parquet --output purchases.parquet
+    python generate_dataset.py --rows 100000 --format mongo --collection purchases_dataset
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+COLUMNS = [
+    "Creation Date", "Fiscal Year", "Purchase Order Number", "Acquisition Type", "Acquisition Method",
+    "Department Name", "Supplier Code", "Supplier Name", "CalCard", "Item Name", "Item Description",
+    "Quantity", "Unit Price", "Total Price", "Classification Codes", "Normalized UNSPSC",
+]
+
+# Department names as normalised by main.py (lower case, "Department of" removed)
+DEPARTMENTS = [
+    "corrections and rehabilitation", "transportation", "water resources", "health care services",
+    "state hospitals", "motor vehicles", "california highway patrol", "forestry and fire protection",
+    "parks and recreation", "general services", "public health", "social services", "justice",
+    "education", "technology", "finance", "food and agriculture", "fish and wildlife",
+    "employment development", "consumer affairs", "toxic substances control", "veterans affairs",
+    "developmental services", "military", "state controller", "franchise tax board",
+    "board of equalization", "public employees retirement system", "state teachers retirement system",
+    "housing and community development", "industrial relations", "conservation",
+    "resources recycling and recovery", "energy resources conservation", "air resources board",
+    "state water resources control board", "emergency services", "rehabilitation", "aging",
+    "child support services", "pesticide regulation", "insurance", "real estate", "tax and fee administration",
+    "secretary of state", "state lands commission", "lottery commission", "high speed rail authority",
+    "california state university", "community colleges", "student aid commission", "state library",
+    "arts council", "science center", "exposition park", "office of statewide health planning",
+    "managed health care", "financial protection and innovation", "business oversight", "human resources",
+]
+
+ACQUISITION_METHODS = [
+    ("Statewide Contract", 0.30), ("Informal Competitive", 0.14), ("Formal Competitive", 0.10),
+    ("Not Competitively Bid", 0.09), ("Fair and Reasonable", 0.08), ("WSCA/Coop", 0.07),
+    ("SB/DVBE Option", 0.06), ("CMAS", 0.05), ("Master Agreement", 0.04),
+    ("Special Category Request (SCR)", 0.03), ("Emergency Purchase", 0.02),
+    ("Software License Program (SLP)", 0.01), ("State Price Schedule", 0.01),
+]
+
+# UNSPSC segments with their acquisition type and typical unit price (median, USD)
+SEGMENTS = [
+    (43, "IT Goods", 900.0, ["laptop", "desktop", "monitor", "server", "switch", "router", "toner cartridge",
+                             "keyboard", "docking station", "tablet", "hard drive", "software license"]),
+    (81, "IT Services", 15000.0, ["software maintenance", "it consulting", "cloud hosting",
+                                  "network support", "application development"]),
+    (83, "IT Telecommunications", 2500.0, ["phone service", "data circuit", "wireless plan"]),
+    (44, "NON-IT Goods", 60.0, ["copy paper", "binder", "printer", "stapler", "pen", "envelope"]),
+    (56, "NON-IT Goods", 450.0, ["office chair", "desk", "filing cabinet", "bookcase", "table"]),
+    (42, "NON-IT Goods", 120.0, ["gloves", "syringe", "bandage", "wheelchair", "thermometer"]),
+    (50, "NON-IT Goods", 35.0, ["bread", "milk", "produce", "coffee", "frozen meals"]),
+    (25, "NON-IT Goods", 28000.0, ["sedan", "pickup truck", "tire", "utility vehicle"]),
+    (46, "NON-IT Goods", 300.0, ["body armor", "fire extinguisher", "safety glasses", "radio"]),
+    (39, "NON-IT Goods", 80.0, ["light bulb", "cable", "generator", "battery"]),
+    (72, "NON-IT Services", 22000.0, ["building maintenance", "roof repair", "hvac service", "janitorial"]),
+    (80, "NON-IT Services", 18000.0, ["management consulting", "temporary staffing", "training"]),
+    (85, "NON-IT Services", 9000.0, ["medical services", "dental services", "laboratory testing"]),
+]
+
+ADJECTIVES = ["standard", "heavy duty", "premium", "compact", "recycled", "industrial", "portable", "ergonomic"]
+SUPPLIER_WORDS = ["Pacific", "Golden", "Summit", "Valley", "Coastal", "Sierra", "Capitol", "Western",
+                  "Redwood", "Delta", "Bay", "Central", "Pioneer", "Eureka", "Mission", "Harbor"]
+SUPPLIER_TRADES = ["Office", "Medical", "Technology", "Supply", "Services", "Systems", "Solutions",
+                   "Equipment", "Foods", "Builders", "Networks", "Consulting"]
+SUPPLIER_SUFFIXES = ["Inc.", "LLC", "Corp.", "Co.", "L.P.", "Group"]
+
+
+def _zipf_probabilities(n, exponent):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+class DimensionTables:
+    """
+    Deterministic departments, suppliers and item catalogue for a given seed and scale.
+    """
+
+    def __init__(self, rows, seed=0):
+        rng = np.random.default_rng([seed, 0])
+
+        self.departments = np.array(DEPARTMENTS, dtype=object)
+        self.department_p = _zipf_probabilities(len(self.departments), 1.1)[rng.permutation(len(self.departments))]
+
+        # Supplier count grows sub-linearly with the dataset size
+        n_suppliers = int(min(200000, max(500, 30 * rows ** 0.5)))
+        names = set()
+        supplier_names = []
+        while len(supplier_names) < n_suppliers:
+            name = (f"{rng.choice(SUPPLIER_WORDS)} {rng.choice(SUPPLIER_TRADES)} "
+                    f"{rng.choice(SUPPLIER_SUFFIXES)}")
+            if name in names:
+                name = f"{name.rsplit(' ', 1)[0]} {len(supplier_names)} {name.rsplit(' ', 1)[1]}"
+            names.add(name)
+            supplier_names.append(name)
+        self.supplier_names = np.array(supplier_names, dtype=object)
+        self.supplier_codes = np.array([str(1000000 + i * 7) for i in range(n_suppliers)], dtype=object)
+        self.supplier_p = _zipf_probabilities(n_suppliers, 1.05)
+
+        # Item catalogue: several variants of each base item, each with its own UNSPSC commodity
+        # and the number of distinct models grows with the dataset size like the supplier list
+        base_count = sum(len(base_items) for _, _, _, base_items in SEGMENTS) * len(ADJECTIVES)
+        n_models = max(1, int(min(200000, 10 * rows ** 0.5)) // base_count)
+        items, descriptions, codes, types, prices = [], [], [], [], []
+        for model in range(n_models):
+            for segment, acquisition_type, median_price, base_items in SEGMENTS:
+                for family_idx, base in enumerate(base_items):
+                    for variant_idx, adjective in enumerate(ADJECTIVES):
+                        family = 10 + family_idx % 90
+                        class_code = 15 + variant_idx
+                        commodity = 1 + (family_idx * len(ADJECTIVES) + variant_idx + model) % 99
+                        items.append(f"{adjective} {base}" + (f" model {model}" if model else ""))
+                        descriptions.append(f"{adjective.capitalize()} {base}, {segment}-series, model "
+                                            f"{chr(65 + variant_idx)}{family_idx:02d}-{model}")
+                        codes.append(segment * 1000000 + family * 10000 + class_code * 100 + commodity)
+                        types.append(acquisition_type)
+                        prices.append(median_price * float(np.exp(rng.normal(0, 0.6))))
+        order = rng.permutation(len(items))
+        self.item_names = np.array(items, dtype=object)[order]
+        self.item_descriptions = np.array(descriptions, dtype=object)[order]
+        self.item_unspsc = np.array(codes, dtype=np.int64)[order]
+        self.item_codes_str = np.array([str(code) for code in self.item_unspsc], dtype=object)
+        self.item_types = np.array(types, dtype=object)[order]
+        self.item_prices = np.array(prices, dtype=np.float64)[order]
+        self.item_p = _zipf_probabilities(len(items), 1.0)
+
+        self.methods = np.array([name for name, _ in ACQUISITION_METHODS], dtype=object)
+        method_p = np.array([p for _, p in ACQUISITION_METHODS])
+        self.method_p = method_p / method_p.sum()
+
+
+def _fiscal_years(dates):
+    years = dates.astype("datetime64[Y]").astype(np.int64) + 1970
+    months = dates.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    start = years - (months < 7)
+    labels = {year: f"{year}-{year + 1}" for year in np.unique(start)}
+    return np.array([labels[year] for year in start], dtype=object)
+
+
+def generate_chunks(rows, seed=0, chunk_size=100000, start_date="2012-07-01", end_date="2015-06-30"):
+    """
+    Yield the synthetic dataset as column chunks.
+
+    Args:
+    - rows (int): Total number of purchase lines.
+    - seed (int): Random seed; the same seed and chunk size always give the same data.
+    - chunk_size (int): Approximate number of lines per chunk.
+    - start_date, end_date (str): Creation Date range (ISO dates, inclusive).
+
+    Yields:
+    - Dict[str, np.ndarray]: One array per column in COLUMNS.
+    """
+    dims = DimensionTables(rows, seed)
+    rng = np.random.default_rng([seed, 1])
+    first_day = np.datetime64(start_date, "D")
+    n_days = int((np.datetime64(end_date, "D") - first_day).astype(np.int64)) + 1
+    # Spending rises towards the end of each fiscal year (June)
+    day_offsets = np.arange(n_days)
+    day_months = (first_day + day_offsets).astype("datetime64[M]").astype(np.int64) % 12 + 1
+    day_p = np.where(day_months == 6, 1.8, np.where(day_months == 5, 1.3, 1.0))
+    day_p = day_p / day_p.sum()
+
+    produced, next_po = 0, 0
+    while produced < rows:
+        target = min(chunk_size, rows - produced)
+        # Purchase order headers: each order has a geometric number of lines
+        lines = np.minimum(rng.geometric(0.45, target), 25)
+        cumulative = np.cumsum(lines)
+        n_orders = int(np.searchsorted(cumulative, target) + 1)
+        lines = lines[:n_orders]
+        lines[-1] -= int(lines.sum()) - target
+
+        po_numbers = np.array([str(4500000000 + next_po + i) for i in range(n_orders)], dtype=object)
+        po_dates = first_day + rng.choice(n_days, n_orders, p=day_p).astype("timedelta64[D]")
+        po_seconds = rng.integers(7 * 3600, 18 * 3600, n_orders).astype("timedelta64[s]")
+        po_dates = po_dates.astype("datetime64[s]") + po_seconds
+        po_departments = rng.choice(len(dims.departments), n_orders, p=dims.department_p)
+        po_suppliers = rng.choice(len(dims.supplier_names), n_orders, p=dims.supplier_p)
+        po_methods = rng.choice(len(dims.methods), n_orders, p=dims.method_p)
+
+        # Line level
+        order_of_line = np.repeat(np.arange(n_orders), lines)
+        item_idx = rng.choice(len(dims.item_names), target, p=dims.item_p)
+        quantity = np.maximum(1, np.round(rng.lognormal(1.0, 1.2, target))).astype(np.int64)
+        unit_price = np.round(dims.item_prices[item_idx] * rng.lognormal(0, 0.15, target), 2)
+        total_price = np.round(quantity * unit_price, 2)
+        # CalCard is used for small purchases
+        po_total = np.bincount(order_of_line, weights=total_price, minlength=n_orders)
+        po_calcard = np.where((po_total < 2500) & (rng.random(n_orders) < 0.35), "YES", "NO").astype(object)
+
+        dates = po_dates[order_of_line]
+        yield {
+            "Creation Date": dates,
+            "Fiscal Year": _fiscal_years(dates),
+            "Purchase Order Number": po_numbers[order_of_line],
+            "Acquisition Type": dims.item_types[item_idx],
+            "Acquisition Method": dims.methods[po_methods][order_of_line],
+            "Department Name": dims.departments[po_departments][order_of_line],
+            "Supplier Code": dims.supplier_codes[po_suppliers][order_of_line],
+            "Supplier Name": dims.supplier_names[po_suppliers][order_of_line],
+            "CalCard": po_calcard[order_of_line],
+            "Item Name": dims.item_names[item_idx],
+            "Item Description": dims.item_descriptions[item_idx],
+            "Quantity": quantity,
+            "Unit Price": unit_price,
+            "Total Price": total_price,
+            "Classification Codes": dims.item_codes_str[item_idx],
+            "Normalized UNSPSC": dims.item_unspsc[item_idx],
+        }
+        produced += target
+        next_po += n_orders
+
+
+def chunk_to_records(chunk):
+    """
+    Convert a column chunk to MongoDB-ready dictionaries (datetimes as datetime objects).
+    """
+    columns = [chunk[name].tolist() for name in COLUMNS]
+    return [dict(zip(COLUMNS, values)) for values in zip(*columns)]
+
+
+def chunk_to_table(chunk):
+    """
+    Convert a column chunk to a pyarrow Table.
+    """
+    import pyarrow as pa
+    return pa.table({name: chunk[name] if chunk[name].dtype != object else chunk[name].tolist()
+                     for name in COLUMNS})
+
+
+# Writers
+class MongoWriter:
+    def __init__(self, collection, drop=True):
+        self.collection = collection
+        if drop:
+            collection.drop()
+
+    def write(self, chunk):
+        self.collection.insert_many(chunk_to_records(chunk), ordered=False)
+
+    def close(self):
+        pass
+
+
+class JsonlWriter:
+    def __init__(self, path):
+        self.file = open(path, "w", encoding="utf-8")
+
+    def write(self, chunk):
+        for record in chunk_to_records(chunk):
+            record["Creation Date"] = record["Creation Date"].isoformat()
+            self.file.write(json.dumps(record) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    def __init__(self, path):
+        import pyarrow.parquet as pq
+        self.pq = pq
+        self.path = path
+        self.writer = None
+
+    def write(self, chunk):
+        table = chunk_to_table(chunk)
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, table.schema, compression="zstd")
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def write_dataset(writer, rows, seed=0, chunk_size=100000):
+    """
+    Stream a synthetic dataset of `rows` lines into a writer.
+
+    Returns:
+    - Dict: Rows written and elapsed time.
+    """
+    start = time.perf_counter()
+    written = 0
+    try:
+        for chunk in generate_chunks(rows, seed=seed, chunk_size=chunk_size):
+            writer.write(chunk)
+            written += len(chunk["Quantity"])
+            print(f"Written {written:,}/{rows:,} rows", end="\r")
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+    print(f"\nWrote {written:,} rows in {elapsed:.1f}s")
+    return {"rows": written, "seconds": round(elapsed, 3)}
+
+
+def load_into_mongodb(collection, rows, seed=0, chunk_size=100000):
+    """
+    Replace the contents of a MongoDB collection with a synthetic dataset.
+    """
+    return write_dataset(MongoWriter(collection), rows, seed=seed, chunk_size=chunk_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic procurement dataset.")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--format", choices=["mongo", "jsonl", "parquet"], default="jsonl")
+    parser.add_argument("--output", default="purchases_synthetic.jsonl", help="Output file for jsonl/parquet.")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/")
+    parser.add_argument("--db", default="purchases_large")
+    parser.add_argument("--collection", default="purchases_synthetic")
+    args = parser.parse_args()
+
+    if args.format == "mongo":
+        from query_functions import connect_to_mongodb
+        writer = MongoWriter(connect_to_mongodb(args.mongo_uri, args.db, args.collection))
+    elif args.format == "parquet":
+        writer = ParquetWriter(args.output)
+    else:
+        writer = JsonlWriter(args.output)
+    write_dataset(writer, args.rows, seed=args.seed, chunk_size=args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""
+Multi-replica CPU inference pool for intent detection.
+
+Concurrent detect_intent calls in one process share torch's intra-op thread
+pool, oversubscribe the cores and latency collapses under load. The pool
+instead runs K replicas of the intent model, each in its own process with a
+fixed number of torch/OpenMP threads and, optionally, pinned to its own cores.
+Each request goes to the replica with the fewest requests in flight. Per-replica
+utilization (busy time / wall time), requests served and requests in flight
+are exposed through stats().
+
+Enable it in flask_app_complete_code.py with INFERENCE_REPLICAS=K (plus
+INFERENCE_THREADS and INFERENCE_CORES); benchmark_inference_pool.py sweeps
+K x threads to pick the setting for a host.
+
+The pool is started inside the serving process; do not combine it with
+prefork.py, whose workers would inherit the pool's queues and threads.
+
+A replica that dies after startup is restarted; the requests it was working on
+fail with an error instead of waiting on a dead process.
+
+Cores are given as "auto" (consecutive blocks of `threads` cores per replica)
+or explicitly per replica, e.g. "0-1;2-3;4,5".
+"""
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+INFERENCE_REPLICAS = int(os.environ.get("INFERENCE_REPLICAS", 0))
+INFERENCE_THREADS = int(os.environ.get("INFERENCE_THREADS", 1))
+INFERENCE_CORES = os.environ.get("INFERENCE_CORES") or None
+THREAD_VARIABLES = ["OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"]
+WATCH_INTERVAL = 1.0
+
+
+def _parse_cores(text):
+    cores = []
+    for part in text.split(","):
+        if "-" in part:
+            first, last = part.split("-")
+            cores.extend(range(int(first), int(last) + 1))
+        elif part.strip():
+            cores.append(int(part))
+    return cores
+
+
+def plan_cores(replicas, threads, spec=None):
+    """
+    CPU cores for each replica.
+
+    Args:
+    - replicas (int): Number of replicas.
+    - threads (int): Threads per replica.
+    - spec (str): None (no pinning), "auto", or per-replica core lists separated by ";" (e.g. "0-1;2-3").
+
+    Returns:
+    - List[List[int]]: Cores per replica (empty lists when not pinned).
+    """
+    if not spec:
+        return [[] for _ in range(replicas)]
+    if spec != "auto":
+        plans = [_parse_cores(part) for part in spec.split(";")]
+        if len(plans) != replicas:
+            raise ValueError(f"INFERENCE_CORES lists {len(plans)} core sets for {replicas} replicas.")
+        return plans
+    available = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count()))
+    # Wraps around when replicas x threads exceeds the cores available
+    return [sorted({available[(i * threads + j) % len(available)] for j in range(threads)}) for i in range(replicas)]
+
+
+def _load_model(backend):
+    from benchmark_intents import BACKEND_FACTORIES
+    return BACKEND_FACTORIES[backend]()
+
+
+def _predict(model, backend, text):
+    if backend == "joint":
+        return model.predictor.predict(text)
+    return model.predict_batch([text])[0], {}
+
+
+def _replica_main(index, backend, threads, cores, requests, results):
+    # Runs in a spawned process, so the thread settings apply before torch is imported
+    for variable in THREAD_VARIABLES:
+        os.environ[variable] = str(threads)
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    except ImportError:
+        pass
+    try:
+        model = _load_model(backend)
+    except Exception as e:
+        results.put(("failed", index, None, str(e), 0.0))
+        return
+    results.put(("ready", index, None, None, 0.0))
+
+    while True:
+        item = requests.get()
+        if item is None:
+            break
+        request_id, text = item
+        start = time.perf_counter()
+        try:
+            output, error = _predict(model, backend, text), None
+        except Exception as e:
+            output, error = None, str(e)
+        results.put((request_id, index, output, error, time.perf_counter() - start))
+
+
+class Replica:
+    def __init__(self, index, cores, process, requests):
+        self.index = index
+        self.cores = cores
+        self.process = process
+        self.requests = requests
+        self.in_flight = 0
+        self.served = 0
+        self.busy_seconds = 0.0
+        self.ready = False
+        self.failed = False
+        self.restarts = 0
+
+
+class InferencePool:
+    """
+    K model replicas in separate processes behind least-loaded routing.
+
+    Args:
+    - backend (str): Intent backend ("pipeline", "index" or "joint", see benchmark_intents.py).
+    - replicas (int): Number of replicas.
+    - threads (int): Intra-op threads per replica.
+    - cores (str): Core pinning spec (see plan_cores), or None.
+    """
+
+    def __init__(self, backend="pipeline", replicas=2, threads=1, cores=None):
+        self.backend = backend
+        self.threads = threads
+        self.core_plan = plan_cores(replicas, threads, cores)
+        self.replicas = []
+        self.pending = {}
+        self.ids = itertools.count()
+        self.lock = threading.Lock()
+        self.started = None
+        self.closing = False
+
+    def _spawn(self, index, cores):
+        requests = self.context.Queue()
+        process = self.context.Process(target=_replica_main, name=f"inference-replica-{index}", daemon=True,
+                                       args=(index, self.backend, self.threads, cores, requests, self.results))
+        process.start()
+        return Replica(index, cores, process, requests)
+
+    def start(self, timeout=600):
+        """
+        Start the replicas and wait until all have loaded the model.
+
+        Raises:
+        - RuntimeError: A replica failed to load the model, exited, or did not load it within `timeout` seconds.
+        """
+        self.context = multiprocessing.get_context("spawn")
+        self.results = self.context.Queue()
+        for index, cores in enumerate(self.core_plan):
+            self.replicas.append(self._spawn(index, cores))
+
+        deadline = time.monotonic() + timeout
+        waiting = set(range(len(self.replicas)))
+        while waiting:
+            try:
+                status, index, _, error, _ = self.results.get(timeout=WATCH_INTERVAL)
+            except queue.Empty:
+                for index in sorted(waiting):
+                    exitcode = self.replicas[index].process.exitcode
+                    if exitcode is not None:
+                        self.close()
+                        raise RuntimeError(f"Inference replica {index} exited with code {exitcode} "
+                                           f"while loading the model")
+                if time.monotonic() > deadline:
+                    self.close()
+                    raise RuntimeError(f"Inference replicas {sorted(waiting)} did not load the model "
+                                       f"within {timeout} s")
+                continue
+            if status == "failed":
+                self.close()
+                raise RuntimeError(f"Inference replica {index} failed to load: {error}")
+            self.replicas[index].ready = True
+            waiting.discard(index)
+        self.started = time.monotonic()
+        threading.Thread(target=self._collect, name="inference-pool-results", daemon=True).start()
+        threading.Thread(target=self._watch, name="inference-pool-watch", daemon=True).start()
+        print(f"Inference pool ready: {len(self.replicas)} x {self.backend} replicas, {self.threads} threads each")
+        return self
+
+    def _watch(self):
+        """
+        Restart replicas that died, failing the requests they had in flight.
+        """
+        while not self.closing:
+            time.sleep(WATCH_INTERVAL)
+            for index, replica in enumerate(list(self.replicas)):
+                if self.closing or replica.failed or replica.process.is_alive():
+                    continue
+                with self.lock:
+                    lost = [request_id for request_id, (_, owner) in self.pending.items() if owner is replica]
+                    futures = [self.pending.pop(request_id)[0] for request_id in lost]
+                    restarted = self._spawn(index, replica.cores)
+                    restarted.restarts = replica.restarts + 1
+                    self.replicas[index] = restarted
+                logging.warning(f"Inference replica {index} exited with code {replica.process.exitcode}; "
+                                f"restarting it ({len(futures)} requests failed)")
+                for future in futures:
+                    future.set_exception(RuntimeError(f"Inference replica {index} exited"))
+
+    def _collect(self):
+        while True:
+            item = self.results.get()
+            if item is None:
+                break
+            request_id, index, output, error, seconds = item
+            if request_id in ("ready", "failed"):
+                # A restarted replica has loaded the model (or could not, and is not restarted again)
+                with self.lock:
+                    self.replicas[index].ready = request_id == "ready"
+                    self.replicas[index].failed = request_id == "failed"
+                if error:
+                    logging.error(f"Inference replica {index} failed to load: {error}")
+                continue
+            with self.lock:
+                future, replica = self.pending.pop(request_id, (None, None))
+                if replica is not None:
+                    replica.in_flight -= 1
+                    replica.served += 1
+                    replica.busy_seconds += seconds
+            if future is None:
+                continue
+            if error:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result(output)
+
+    def submit(self, text):
+        """
+        Queue a message on the least-loaded replica.
+
+        Returns:
+        - Future: Resolves to (intent, entities).
+
+        Raises:
+        - RuntimeError: No replica is running (all are restarting).
+        """
+        future = Future()
+        with self.lock:
+            available = [r for r in self.replicas if r.ready and r.process.is_alive()]
+            if not available:
+                raise RuntimeError("No inference replica is available.")
+            replica = min(available, key=lambda r: (r.in_flight, r.busy_seconds))
+            request_id = next(self.ids)
+            self.pending[request_id] = (future, replica)
+            replica.in_flight += 1
+        replica.requests.put((request_id, text))
+        return future
+
+    def predict(self, text, timeout=30):
+        """
+        Intent and entities of a message (entities are only filled by the joint backend).
+        """
+        return self.submit(text).result(timeout)
+
+    def classify(self, text, timeout=30):
+        return self.predict(text, timeout)[0]
+
+    def stats(self):
+        """
+        Per-replica load since the pool started.
+
+        Returns:
+        - List[Dict]: replica, pid, alive, ready, restarts, cores, in_flight, served, busy_s and utilization
+          (busy / wall time).
+        """
+        elapsed = max(time.monotonic() - (self.started or time.monotonic()), 1e-9)
+        with self.lock:
+            return [{
+                "replica": r.index,
+                "pid": r.process.pid,
+                "alive": r.process.is_alive(),
+                "ready": r.ready,
+                "restarts": r.restarts,
+                "cores": r.cores,
+                "threads": self.threads,
+                "in_flight": r.in_flight,
+                "served": r.served,
+                "busy_s": round(r.busy_seconds, 3),
+                "utilization": round(min(r.busy_seconds / elapsed, 1.0), 4),
+            } for r in self.replicas]
+
+    def close(self):
+        self.closing = True
+        for replica in self.replicas:
+            replica.requests.put(None)
+        for replica in self.replicas:
+            replica.process.join(timeout=10)
+            if replica.process.is_alive():
+                replica.process.terminate()
+        if self.started is not None:
+            self.results.put(None)
+
+
+def create_pool_from_env(backend):
+    """
+    The inference pool configured by INFERENCE_REPLICAS / INFERENCE_THREADS / INFERENCE_CORES, or None.
+    """
+    if INFERENCE_REPLICAS <= 0:
+        return None
+    return InferencePool(backend, INFERENCE_REPLICAS, INFERENCE_THREADS, INFERENCE_CORES).start()
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Nearest-neighbour intent index.
+
+Every training utterance is encoded once into a float32 matrix that is saved as
+a memory-mapped .npy file next to its labels. Queries are classified by a
+cosine top-k vote, and new examples or intents can be appended without
+re-running the fine-tune in nlp.py.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import torch
+from transformers import AutoTokenizer, AutoModel
+
+DEFAULT_INDEX_DIR = "intent_index"
+DEFAULT_ENCODER = "procurement_intent_model"
+
+
+def _replace_file(path, write, mode):
+    temporary = f"{path}.tmp"
+    with open(temporary, mode) as f:
+        write(f)
+    os.replace(temporary, path)
+
+
+class SentenceEncoder:
+    """
+    Mean-pooled sentence embeddings from a transformer encoder.
+
+    Args:
+    - model_path (str): Path or hub name of the encoder (the fine-tuned intent model works well).
+    - max_length (int): Maximum number of tokens per utterance.
+    """
+
+    def __init__(self, model_path=DEFAULT_ENCODER, max_length=64):
+        self.model_path = model_path
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        self.model = AutoModel.from_pretrained(model_path)
+        self.model.eval()
+
+    def encode(self, texts, batch_size=64):
+        """
+        Encode a list of texts into L2-normalised float32 vectors.
+
+        Returns:
+        - np.ndarray: Array of shape (len(texts), hidden_size).
+        """
+        vectors = []
+        with torch.no_grad():
+            for start in range(0, len(texts), batch_size):
+                batch = list(texts[start:start + batch_size])
+                tokens = self.tokenizer(batch, truncation=True, padding=True,
+                                        max_length=self.max_length, return_tensors="pt")
+                hidden = self.model(**tokens).last_hidden_state
+                mask = tokens["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1.0)
+                vectors.append(pooled.cpu().numpy().astype(np.float32))
+        if not vectors:
+            return np.zeros((0, self.model.config.hidden_size), dtype=np.float32)
+        return _normalize(np.vstack(vectors))
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+class IntentIndex:
+    """
+    Cosine nearest-neighbour intent classifier backed by a memory-mapped matrix.
+
+    Files in `index_dir`:
+    - embeddings.npy: float32 matrix, one normalised row per example.
+    - labels.json: {"intents": [...], "labels": [intent id per row], "texts": [...]}.
+    """
+
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR, encoder=None):
+        self.index_dir = index_dir
+        self.encoder = encoder
+        self.embeddings = None
+        self.intents = []
+        self.labels = np.zeros(0, dtype=np.int32)
+        self.texts = []
+
+    # Building and persisting
+    def build(self, texts, intents):
+        """
+        Encode all utterances and write a fresh index to disk.
+
+        Args:
+        - texts (List[str]): Training utterances.
+        - intents (List[str]): Intent name for each utterance.
+        """
+        self.intents = sorted(set(intents))
+        intent_ids = {intent: idx for idx, intent in enumerate(self.intents)}
+        self.labels = np.array([intent_ids[intent] for intent in intents], dtype=np.int32)
+        self.texts = list(texts)
+        self.embeddings = self._get_encoder().encode(self.texts)
+        self.save()
+        return self
+
+    def save(self):
+        """
+        Write the index. Each file is written to a temporary file and then renamed over the old one, so the
+        embedding matrix this index (or another process) has memory-mapped is never rewritten in place.
+        """
+        os.makedirs(self.index_dir, exist_ok=True)
+        embeddings = np.asarray(self.embeddings, dtype=np.float32)
+        _replace_file(os.path.join(self.index_dir, "embeddings.npy"), lambda f: np.save(f, embeddings), "wb")
+        meta = {"intents": self.intents, "labels": self.labels.tolist(), "texts": self.texts}
+        _replace_file(os.path.join(self.index_dir, "labels.json"), lambda f: json.dump(meta, f), "w")
+
+    def load(self):
+        """
+        Load the index, memory-mapping the embedding matrix read-only.
+        """
+        self.embeddings = np.load(os.path.join(self.index_dir, "embeddings.npy"), mmap_mode="r")
+        with open(os.path.join(self.index_dir, "labels.json"), "r") as f:
+            meta = json.load(f)
+        self.intents = meta["intents"]
+        self.labels = np.array(meta["labels"], dtype=np.int32)
+        self.texts = meta.get("texts", [])
+        return self
+
+    def add_examples(self, texts, intents):
+        """
+        Append new examples (and any new intents) to the index without retraining.
+
+        Args:
+        - texts (List[str]): New utterances.
+        - intents (List[str]): Intent name for each utterance.
+        """
+        if not texts:
+            return self
+        for intent in intents:
+            if intent not in self.intents:
+                self.intents.append(intent)
+        intent_ids = {intent: idx for idx, intent in enumerate(self.intents)}
+        new_vectors = self._get_encoder().encode(list(texts))
+        new_labels = np.array([intent_ids[intent] for intent in intents], dtype=np.int32)
+
+        if self.embeddings is None or len(self.embeddings) == 0:
+            self.embeddings = new_vectors
+        else:
+            # np.vstack copies the memory-mapped rows into RAM before the file is rewritten
+            self.embeddings = np.vstack([np.asarray(self.embeddings), new_vectors])
+        self.labels = np.concatenate([self.labels, new_labels])
+        self.texts.extend(texts)
+        self.save()
+        return self.load()
+
+    # Querying
+    def classify_vectors(self, vectors, k=5):
+        """
+        Classify pre-encoded query vectors by a similarity-weighted top-k vote.
+
+        Returns:
+        - List[Tuple[str, float]]: (intent, score) for each query vector.
+        """
+        if self.embeddings is None or len(self.embeddings) == 0:
+            return [(None, 0.0)] * len(vectors)
+
+        scores = np.asarray(vectors, dtype=np.float32) @ self.embeddings.T
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+        predictions = []
+        for row, neighbours in enumerate(top):
+            votes = np.bincount(self.labels[neighbours], weights=scores[row, neighbours],
+                                minlength=len(self.intents))
+            best = int(votes.argmax())
+            predictions.append((self.intents[best], float(votes[best] / k)))
+        return predictions
+
+    def classify(self, texts, k=5):
+        """
+        Classify one or more user messages.
+
+        Args:
+        - texts (str | List[str]): User message(s).
+        - k (int): Number of neighbours that vote.
+
+        Returns:
+        - str | List[str]: Predicted intent(s).
+        """
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        predictions = [intent for intent, _ in self.classify_vectors(self._get_encoder().encode(batch), k=k)]
+        return predictions[0] if single else predictions
+
+    def nearest(self, text, k=5):
+        """
+        Return the k most similar training examples for a message (useful for debugging).
+        """
+        vector = self._get_encoder().encode([text])[0]
+        scores = np.asarray(self.embeddings) @ vector
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {"text": self.texts[i] if i < len(self.texts) else None,
+             "intent": self.intents[self.labels[i]],
+             "score": float(scores[i])}
+            for i in top
+        ]
+
+    def _get_encoder(self):
+        if self.encoder is None:
+            self.encoder = SentenceEncoder()
+        return self.encoder
+
+
+def build_index_from_csv(csv_path="updated_balanced_procurement_intents.csv", index_dir=DEFAULT_INDEX_DIR,
+                         encoder_path=DEFAULT_ENCODER):
+    """
+    Build the intent index from the training CSV used by nlp.py.
+    """
+    df = pd.read_csv(csv_path).dropna(subset=["user_input", "intent"])
+    index = IntentIndex(index_dir, SentenceEncoder(encoder_path))
+    return index.build(df["user_input"].tolist(), df["intent"].tolist())
+
+
+if __name__ == "__main__":
+    import sys
+
+    index = build_index_from_csv(*sys.argv[1:2])
+    print(f"Indexed {len(index.labels)} examples across {len(index.intents)} intents in '{index.index_dir}'.")
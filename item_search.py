@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+BM25 item search over Item Name and Item Description.
+
+Each distinct Item Name is one document. Its name and the descriptions it
+appears with are tokenized into two inverted indexes. Postings are stored as
+flat arrays in CSR layout: per-term offsets into uint32 document ids and
+uint16 term frequencies. A question is scored with BM25 over both fields (the
+name weighted higher) using vectorized NumPy operations, so resolving the item
+a user is asking about takes milliseconds even with a large catalogue.
+
+The index is rebuilt at ingest (main.py) and saved to ITEM_INDEX_DIR
+(default "item_index").
+
+Usage:
+    python item_search.py build
+    python item_search.py search "unit price of toner cartridges"
+"""
+import argparse
+import json
+import os
+import re
+
+import numpy as np
+
+ITEM_INDEX_DIR = os.environ.get("ITEM_INDEX_DIR", "item_index")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "and", "are", "at", "by", "can", "details", "did", "do", "for", "from", "give", "how", "i", "in", "is",
+    "it", "item", "items", "me", "much", "of", "on", "or", "price", "show", "tell", "the", "to", "unit", "was",
+    "what", "which", "with",
+}
+FIELD_WEIGHTS = {"name": 2.0, "description": 1.0}
+MAX_DESCRIPTIONS = 20
+
+
+def _stem(token):
+    # Fold simple plurals so "cartridges" matches "cartridge"
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """
+    Lowercase alphanumeric tokens without stopwords, with simple plurals folded.
+    """
+    return [_stem(token) for token in TOKEN_PATTERN.findall(str(text).lower()) if token not in STOPWORDS]
+
+
+class InvertedIndex:
+    """
+    Inverted index of one text field with CSR postings arrays.
+
+    Args:
+    - vocabulary (Dict[str, int]): Term -> term id.
+    - offsets (np.ndarray): Postings of term t are doc_ids[offsets[t]:offsets[t + 1]].
+    - doc_ids (np.ndarray): uint32 document ids, sorted within each term.
+    - term_freqs (np.ndarray): uint16 term frequencies aligned with doc_ids.
+    - doc_lengths (np.ndarray): float32 number of tokens per document.
+    """
+
+    def __init__(self, vocabulary, offsets, doc_ids, term_freqs, doc_lengths):
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+        self.avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+    @classmethod
+    def build(cls, documents):
+        """
+        Args:
+        - documents (List[List[str]]): Tokens per document.
+        """
+        vocabulary, pairs = {}, {}
+        for doc_id, tokens in enumerate(documents):
+            for token in tokens:
+                term = vocabulary.setdefault(token, len(vocabulary))
+                pairs[(term, doc_id)] = pairs.get((term, doc_id), 0) + 1
+        if pairs:
+            keys = np.array(list(pairs.keys()), dtype=np.int64)
+            freqs = np.array(list(pairs.values()), dtype=np.int64)
+            order = np.lexsort((keys[:, 1], keys[:, 0]))
+            terms, doc_ids, freqs = keys[order, 0], keys[order, 1], freqs[order]
+        else:
+            terms = doc_ids = freqs = np.zeros(0, dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(terms, minlength=len(vocabulary)))]).astype(np.int64)
+        return cls(vocabulary, offsets, doc_ids.astype(np.uint32), np.minimum(freqs, 65535).astype(np.uint16),
+                   np.array([len(tokens) for tokens in documents], dtype=np.float32))
+
+    def save(self, directory, field):
+        np.save(os.path.join(directory, f"{field}_offsets.npy"), self.offsets)
+        np.save(os.path.join(directory, f"{field}_doc_ids.npy"), self.doc_ids)
+        np.save(os.path.join(directory, f"{field}_term_freqs.npy"), self.term_freqs)
+        np.save(os.path.join(directory, f"{field}_doc_lengths.npy"), self.doc_lengths)
+        with open(os.path.join(directory, f"{field}_vocabulary.json"), "w", encoding="utf-8") as f:
+            json.dump(self.vocabulary, f)
+
+    @classmethod
+    def load(cls, directory, field):
+        with open(os.path.join(directory, f"{field}_vocabulary.json"), "r", encoding="utf-8") as f:
+            vocabulary = json.load(f)
+        arrays = [np.load(os.path.join(directory, f"{field}_{name}.npy"))
+                  for name in ("offsets", "doc_ids", "term_freqs", "doc_lengths")]
+        return cls(vocabulary, *arrays)
+
+    def scores(self, tokens, k1=1.2, b=0.75):
+        """
+        BM25 score of every document for a tokenized query.
+        """
+        scores = np.zeros(len(self.doc_lengths), dtype=np.float64)
+        n_docs = len(self.doc_lengths)
+        for token in set(tokens):
+            term = self.vocabulary.get(token)
+            if term is None:
+                continue
+            start, end = self.offsets[term], self.offsets[term + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.term_freqs[start:end].astype(np.float64)
+            idf = np.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = k1 * (1 - b + b * self.doc_lengths[docs] / (self.avg_length or 1))
+            scores[docs] += idf * tf * (k1 + 1) / (tf + norm)
+        return scores
+
+
+class ItemSearchIndex:
+    """
+    BM25 search over distinct items (name and descriptions).
+
+    Args:
+    - names (List[str]): Item Name per document id.
+    - fields (Dict[str, InvertedIndex]): "name" and "description" indexes.
+    """
+
+    def __init__(self, names, fields):
+        self.names = names
+        self.fields = fields
+
+    @classmethod
+    def build(cls, items):
+        """
+        Args:
+        - items (Iterable[Tuple[str, Iterable[str]]]): (Item Name, its descriptions) pairs.
+        """
+        names, name_tokens, description_tokens = [], [], []
+        for name, descriptions in items:
+            if not name:
+                continue
+            names.append(name)
+            name_tokens.append(tokenize(name))
+            description_tokens.append([token for description in list(descriptions)[:MAX_DESCRIPTIONS]
+                                       for token in tokenize(description or "")])
+        return cls(names, {"name": InvertedIndex.build(name_tokens),
+                           "description": InvertedIndex.build(description_tokens)})
+
+    def save(self, directory=ITEM_INDEX_DIR):
+        os.makedirs(directory, exist_ok=True)
+        for field, index in self.fields.items():
+            index.save(directory, field)
+        with open(os.path.join(directory, "names.json"), "w", encoding="utf-8") as f:
+            json.dump(self.names, f)
+        print(f"Item index with {len(self.names):,} items saved to {directory}")
+
+    @classmethod
+    def load(cls, directory=ITEM_INDEX_DIR):
+        with open(os.path.join(directory, "names.json"), "r", encoding="utf-8") as f:
+            names = json.load(f)
+        return cls(names, {field: InvertedIndex.load(directory, field) for field in FIELD_WEIGHTS})
+
+    def search(self, query, k=5, min_ratio=0.0):
+        """
+        Rank items for a question.
+
+        Args:
+        - query (str): The user's question.
+        - k (int): Number of items to return.
+        - min_ratio (float): Drop matches scoring below this fraction of the best match.
+
+        Returns:
+        - List[Tuple[str, float]]: (Item Name, BM25 score), best first. When the question contains a whole
+          item name, only that item (or equally long exact matches) is returned.
+        """
+        tokens = tokenize(query)
+        if not tokens or not self.names:
+            return []
+        scores = sum(weight * self.fields[field].scores(tokens) for field, weight in FIELD_WEIGHTS.items())
+        candidates = min(max(k * 4, 20), len(scores))
+        top = np.argpartition(-scores, candidates - 1)[:candidates]
+        top = [i for i in top[np.argsort(-scores[top], kind="stable")] if scores[i] > 0]
+        if not top:
+            return []
+
+        # An item whose whole name is in the question is what the user asked for; prefer the longest such name
+        query_tokens = set(tokens)
+        complete = [i for i in top if set(tokenize(self.names[i])) <= query_tokens]
+        if complete:
+            longest = max(len(tokenize(self.names[i])) for i in complete)
+            return [(self.names[i], float(scores[i])) for i in complete if len(tokenize(self.names[i])) == longest][:k]
+
+        best = scores[top[0]]
+        return [(self.names[i], float(scores[i])) for i in top[:k] if scores[i] >= min_ratio * best]
+
+
+def items_from_collection(collection):
+    """
+    Stream (Item Name, descriptions) pairs from the purchases collection.
+    """
+    pipeline = [
+        {"$group": {"_id": "$Item Name", "descriptions": {"$addToSet": "$Item Description"}}},
+        {"$project": {"descriptions": {"$slice": ["$descriptions", MAX_DESCRIPTIONS]}}},
+    ]
+    for row in collection.aggregate(pipeline, allowDiskUse=True):
+        yield row["_id"], row["descriptions"]
+
+
+def build_from_collection(collection, directory=ITEM_INDEX_DIR):
+    """
+    Build and save the item index for the purchases collection.
+    """
+    index = ItemSearchIndex.build(items_from_collection(collection))
+    index.save(directory)
+    return index
+
+
+_indexes = {}
+
+
+def get_item_index(collection, directory=ITEM_INDEX_DIR):
+    """
+    The item index for a data source, loaded from `directory` or built from the collection on first use.
+    """
+    if directory not in _indexes:
+        if os.path.isdir(directory):
+            _indexes[directory] = ItemSearchIndex.load(directory)
+        else:
+            print(f"Item index not found in {directory}; building it from the collection...")
+            _indexes[directory] = build_from_collection(collection, directory)
+    return _indexes[directory]
+
+
+def search_items(collection, query, k=5, min_ratio=0.5):
+    """
+    Item names matching a question, best first.
+    """
+    return [name for name, _ in get_item_index(collection).search(query, k=k, min_ratio=min_ratio)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the BM25 item index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build")
+    build.add_argument("--output", default=ITEM_INDEX_DIR)
+    search = subparsers.add_parser("search")
+    search.add_argument("query")
+    search.add_argument("--k", type=int, default=5)
+    search.add_argument("--index", default=ITEM_INDEX_DIR)
+    for sub in (build, search):
+        sub.add_argument("--mongo-uri", default="mongodb://localhost:27017/")
+        sub.add_argument("--db", default="purchases_large")
+        sub.add_argument("--collection", default="purchases_dataset")
+    args = parser.parse_args()
+
+    from query_functions import connect_to_mongodb
+    collection = connect_to_mongodb(args.mongo_uri, args.db, args.collection)
+    if args.command == "build":
+        build_from_collection(collection, args.output)
+    else:
+        for name, score in get_item_index(collection, args.index).search(args.query, k=args.k):
+            print(f"{score:8.3f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
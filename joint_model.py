@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+"""
+Joint intent classification + slot extraction.
+
+A DistilBERT encoder with two heads: a sentence-level intent head and a
+token-level BIO tagger for fiscal years, date spans, purchase order numbers,
+departments, suppliers and items. Training data is produced by templating
+updated_balanced_procurement_intents.csv with real entity values from the
+purchases collection, so one forward pass yields both the intent and the
+parameters the query functions need.
+
+Run this file to build the gazetteers and fine-tune the model:
+    python joint_model.py
+"""
+import json
+import os
+import random
+import re
+
+import pandas as pd
+import torch
+from torch import nn
+from transformers import AutoTokenizer, AutoModel
+
+JOINT_MODEL_PATH = "procurement_joint_model"
+ENTITY_TYPES = ["FISCAL_YEAR", "DATE", "PO_NUMBER", "DEPARTMENT", "SUPPLIER", "ITEM"]
+SLOT_LABELS = ["O"] + [f"{prefix}-{entity}" for entity in ENTITY_TYPES for prefix in ("B", "I")]
+SLOT_TO_ID = {label: idx for idx, label in enumerate(SLOT_LABELS)}
+
+# Placeholder spans in the training CSV. The capture group is the entity value.
+MONTHS = "January|February|March|April|May|June|July|August|September|October|November|December"
+PLACEHOLDER_PATTERNS = [
+    ("PO_NUMBER", re.compile(r"\b(PO\d{5,})\b")),
+    ("FISCAL_YEAR", re.compile(r"\b(?:fiscal year|FY)\s+(\d{4}(?:-\d{2,4})?)\b", re.IGNORECASE)),
+    ("DATE", re.compile(
+        r"\b(Q[1-4]\s+\d{4}|\d{4}-\d{2}-\d{2}|\d{1,2}[/-]\d{1,2}[/-]\d{2,4}"
+        r"|(?:last|this)\s+(?:month|year|\d+\s+months)"
+        rf"|(?:{MONTHS})(?:\s+\d{{1,2}},?)?\s+\d{{4}}"
+        rf"|between\s+(?:{MONTHS})\s+and\s+(?:{MONTHS})\s+\d{{4}})\b")),
+    ("SUPPLIER", re.compile(r"\b[Ss]upplier\s+([A-Z][A-Z0-9]*|S\d+)\b")),
+    ("DEPARTMENT", re.compile(r"\bDepartment of (\w+)")),
+    ("DEPARTMENT", re.compile(r"\b(?!Which\b|What\b|Each\b|The\b|Top\b)([A-Z][A-Za-z]+)\s+[Dd]epartment\b")),
+    ("ITEM", re.compile(r"\bitem\s+'([^']+)'")),
+]
+
+# Fallback values used when the database is not reachable while templating
+DEFAULT_GAZETTEERS = {
+    "DEPARTMENT": ["health care services", "education", "transportation", "technology", "finance"],
+    "SUPPLIER": ["Office Depot", "Dell Marketing L.P.", "Grainger", "CDW Government LLC"],
+    "ITEM": ["Laptop", "Desktop", "Toner Cartridge", "Office Chair"],
+    "PO_NUMBER": ["PO12345", "4500012345", "PO67890"],
+    "FISCAL_YEAR": ["2012", "2013", "2014", "2015"],
+}
+
+
+# Gazetteers
+def load_gazetteers(collection=None, limit=500, path=None):
+    """
+    Collect real entity values from the purchases collection (or a saved gazetteer file).
+
+    Args:
+    - collection: MongoDB collection object, or None to use `path` / the defaults.
+    - limit (int): Maximum number of values kept per entity type.
+    - path (str): Optional JSON file previously written by save_gazetteers.
+
+    Returns:
+    - Dict[str, List[str]]: Entity values keyed by entity type.
+    """
+    if path and os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+    if collection is None:
+        return dict(DEFAULT_GAZETTEERS)
+
+    gazetteers = {}
+    for entity, field in [("DEPARTMENT", "Department Name"), ("SUPPLIER", "Supplier Name"),
+                          ("ITEM", "Item Name"), ("FISCAL_YEAR", "Fiscal Year")]:
+        values = [str(value) for value in collection.distinct(field) if value]
+        gazetteers[entity] = values[:limit] or DEFAULT_GAZETTEERS[entity]
+    gazetteers["PO_NUMBER"] = [
+        str(doc["Purchase Order Number"])
+        for doc in collection.find({}, {"Purchase Order Number": 1, "_id": 0}).limit(limit)
+        if doc.get("Purchase Order Number")
+    ] or DEFAULT_GAZETTEERS["PO_NUMBER"]
+    # Fiscal years are stored as "2013-2014"; the queries mention the starting year
+    gazetteers["FISCAL_YEAR"] = sorted({value[:4] for value in gazetteers["FISCAL_YEAR"]})
+    return gazetteers
+
+
+def save_gazetteers(gazetteers, path):
+    with open(path, "w") as f:
+        json.dump(gazetteers, f)
+
+
+# Templating
+def find_placeholders(text):
+    """
+    Locate entity placeholder spans in a training utterance.
+
+    Returns:
+    - List[Tuple[int, int, str]]: Non-overlapping (start, end, entity type) spans.
+    """
+    spans = []
+    for entity, pattern in PLACEHOLDER_PATTERNS:
+        for match in pattern.finditer(text):
+            start, end = match.span(1)
+            if all(end <= s or start >= e for s, e, _ in spans):
+                spans.append((start, end, entity))
+    return sorted(spans)
+
+
+def template_utterance(text, gazetteers, rng):
+    """
+    Replace the placeholder entities of one utterance with sampled real values.
+
+    Returns:
+    - Tuple[str, List[Tuple[int, int, str]]]: The new text and its entity spans.
+    """
+    pieces, spans, cursor, offset = [], [], 0, 0
+    for start, end, entity in find_placeholders(text):
+        value = text[start:end]
+        if entity in gazetteers and gazetteers[entity]:
+            value = rng.choice(gazetteers[entity])
+        pieces.append(text[cursor:start])
+        offset += start - cursor
+        spans.append((offset, offset + len(value), entity))
+        pieces.append(value)
+        offset += len(value)
+        cursor = end
+    pieces.append(text[cursor:])
+    return "".join(pieces), spans
+
+
+def build_training_examples(df, gazetteers, variants=3, seed=42):
+    """
+    Expand the intent CSV into (text, spans, intent) examples with real entity values.
+
+    Utterances without placeholders are kept once; utterances with placeholders are
+    templated `variants` times with different sampled values.
+    """
+    rng = random.Random(seed)
+    examples = []
+    for text, intent in zip(df["user_input"], df["intent"]):
+        if not find_placeholders(text):
+            examples.append((text, [], intent))
+            continue
+        for _ in range(variants):
+            new_text, spans = template_utterance(text, gazetteers, rng)
+            examples.append((new_text, spans, intent))
+    return examples
+
+
+def encode_examples(examples, tokenizer, intent_to_label, max_length=64):
+    """
+    Tokenize templated examples and align character spans to BIO token labels.
+    """
+    encoded = tokenizer([text for text, _, _ in examples], truncation=True, padding="max_length",
+                        max_length=max_length, return_offsets_mapping=True)
+    slot_labels = []
+    for (text, spans, _), offsets in zip(examples, encoded["offset_mapping"]):
+        labels = []
+        for token_start, token_end in offsets:
+            if token_start == token_end:
+                labels.append(-100)  # special and padding tokens
+                continue
+            label = "O"
+            for start, end, entity in spans:
+                if token_start >= start and token_end <= end:
+                    label = f"B-{entity}" if token_start == start else f"I-{entity}"
+                    break
+            labels.append(SLOT_TO_ID[label])
+        slot_labels.append(labels)
+    return {
+        "input_ids": torch.tensor(encoded["input_ids"]),
+        "attention_mask": torch.tensor(encoded["attention_mask"]),
+        "intent_labels": torch.tensor([intent_to_label[intent] for _, _, intent in examples]),
+        "slot_labels": torch.tensor(slot_labels),
+    }
+
+
+# Model
+class JointIntentSlotModel(nn.Module):
+    """
+    Transformer encoder with an intent classification head and a slot tagging head.
+    """
+
+    def __init__(self, encoder, num_intents, num_slots=len(SLOT_LABELS), dropout=0.1):
+        super().__init__()
+        self.encoder = encoder
+        hidden_size = encoder.config.hidden_size
+        self.dropout = nn.Dropout(dropout)
+        self.intent_head = nn.Linear(hidden_size, num_intents)
+        self.slot_head = nn.Linear(hidden_size, num_slots)
+
+    def forward(self, input_ids, attention_mask, intent_labels=None, slot_labels=None):
+        hidden = self.dropout(self.encoder(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state)
+        intent_logits = self.intent_head(hidden[:, 0])
+        slot_logits = self.slot_head(hidden)
+
+        loss = None
+        if intent_labels is not None and slot_labels is not None:
+            loss_fn = nn.CrossEntropyLoss(ignore_index=-100)
+            loss = loss_fn(intent_logits, intent_labels) + loss_fn(
+                slot_logits.reshape(-1, slot_logits.size(-1)), slot_labels.reshape(-1))
+        return loss, intent_logits, slot_logits
+
+    def save(self, path, tokenizer, label_to_intent):
+        os.makedirs(path, exist_ok=True)
+        self.encoder.save_pretrained(path)
+        tokenizer.save_pretrained(path)
+        torch.save({"intent_head": self.intent_head.state_dict(), "slot_head": self.slot_head.state_dict()},
+                   os.path.join(path, "heads.pt"))
+        with open(os.path.join(path, "joint_config.json"), "w") as f:
+            json.dump({"label_to_intent": label_to_intent, "slot_labels": SLOT_LABELS}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "joint_config.json"), "r") as f:
+            config = json.load(f)
+        model = cls(AutoModel.from_pretrained(path), num_intents=len(config["label_to_intent"]),
+                    num_slots=len(config["slot_labels"]))
+        heads = torch.load(os.path.join(path, "heads.pt"), map_location="cpu")
+        model.intent_head.load_state_dict(heads["intent_head"])
+        model.slot_head.load_state_dict(heads["slot_head"])
+        model.eval()
+        return model, config
+
+
+def train_joint_model(csv_path="updated_balanced_procurement_intents.csv", output_dir=JOINT_MODEL_PATH,
+                      collection=None, model_name="distilbert-base-uncased", epochs=20, batch_size=16,
+                      learning_rate=3e-5, max_length=64):
+    """
+    Template the intent CSV with real entity values and fine-tune the joint model.
+    """
+    df = pd.read_csv(csv_path).dropna(subset=["user_input", "intent"])
+    unique_intents = df["intent"].unique()
+    intent_to_label = {intent: idx for idx, intent in enumerate(unique_intents)}
+    label_to_intent = {str(idx): intent for intent, idx in intent_to_label.items()}
+
+    gazetteers = load_gazetteers(collection)
+    examples = build_training_examples(df, gazetteers)
+    print(f"Templated {len(df)} utterances into {len(examples)} training examples.")
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    data = encode_examples(examples, tokenizer, intent_to_label, max_length=max_length)
+    model = JointIntentSlotModel(AutoModel.from_pretrained(model_name), num_intents=len(unique_intents))
+    optimizer = torch.optim.AdamW(model.parameters(), lr=learning_rate, weight_decay=0.01)
+
+    model.train()
+    for epoch in range(epochs):
+        order = torch.randperm(len(examples))
+        total_loss = 0.0
+        for start in range(0, len(order), batch_size):
+            batch = {key: value[order[start:start + batch_size]] for key, value in data.items()}
+            loss, _, _ = model(**batch)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item()
+        print(f"Epoch {epoch + 1}/{epochs} - loss: {total_loss:.4f}")
+
+    model.save(output_dir, tokenizer, label_to_intent)
+    save_gazetteers(gazetteers, os.path.join(output_dir, "gazetteers.json"))
+    return model
+
+
+# Inference
+class JointPredictor:
+    """
+    Predict the intent and the entities of a user message in a single forward pass.
+    """
+
+    def __init__(self, model_path=JOINT_MODEL_PATH, max_length=64):
+        self.model, config = JointIntentSlotModel.load(model_path)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        self.label_to_intent = config["label_to_intent"]
+        self.slot_labels = config["slot_labels"]
+        self.max_length = max_length
+        gazetteers = load_gazetteers(path=os.path.join(model_path, "gazetteers.json"))
+        # Case-insensitive lookup of canonical database values
+        self.canonical = {
+            entity: {str(value).lower(): value for value in values}
+            for entity, values in gazetteers.items()
+        }
+
+    def predict(self, text):
+        """
+        Args:
+        - text (str): The user's message.
+
+        Returns:
+        - Tuple[str, Dict[str, str]]: The intent and the extracted entities keyed by entity type.
+        """
+        tokens = self.tokenizer(text, truncation=True, max_length=self.max_length,
+                                return_offsets_mapping=True, return_tensors="pt")
+        offsets = tokens.pop("offset_mapping")[0].tolist()
+        with torch.no_grad():
+            _, intent_logits, slot_logits = self.model(tokens["input_ids"], tokens["attention_mask"])
+        intent = self.label_to_intent.get(str(int(intent_logits[0].argmax())))
+        slot_ids = slot_logits[0].argmax(dim=-1).tolist()
+        return intent, self._decode_entities(text, offsets, slot_ids)
+
+    def _decode_entities(self, text, offsets, slot_ids):
+        entities = {}
+        current, start, end = None, None, None
+        for (token_start, token_end), slot_id in zip(offsets + [(0, 0)], slot_ids + [0]):
+            label = self.slot_labels[slot_id] if token_start != token_end else "O"
+            if current and (label != f"I-{current}"):
+                entities.setdefault(current, self._normalize(current, text[start:end]))
+                current = None
+            if label.startswith("B-") or (label.startswith("I-") and current is None):
+                current, start = label[2:], token_start
+            if current:
+                end = token_end
+        return entities
+
+    def _normalize(self, entity, value):
+        value = value.strip(" '\"?.,")
+        if entity == "FISCAL_YEAR":
+            year = re.search(r"\d{4}", value)
+            return year.group(0) if year else value
+        return self.canonical.get(entity, {}).get(value.lower(), value)
+
+
+if __name__ == "__main__":
+    from query_functions import connect_to_mongodb
+
+    try:
+        collection = connect_to_mongodb('mongodb://localhost:27017/', 'purchases_large', 'purchases_dataset')
+    except Exception:
+        collection = None
+    train_joint_model(collection=collection)
+    print("Joint model fine-tuned and saved!")
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+Latency percentiles and summaries.
+
+Used by the serving path (response metrics in serialization.py) as well as by
+the benchmark scripts (through bench_utils.py), so this module depends on the
+standard library only.
+"""
+import math
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of numbers (0 for an empty list).
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize_latencies(latencies_ms):
+    """
+    Summarize a list of latencies in milliseconds.
+
+    Returns:
+    - Dict: count, mean, p50, p95, p99 and max latency.
+    """
+    count = len(latencies_ms)
+    return {
+        "count": count,
+        "mean_ms": round(sum(latencies_ms) / count, 4) if count else 0.0,
+        "p50_ms": round(percentile(latencies_ms, 50), 4),
+        "p95_ms": round(percentile(latencies_ms, 95), 4),
+        "p99_ms": round(percentile(latencies_ms, 99), 4),
+        "max_ms": round(max(latencies_ms), 4) if count else 0.0,
+    }
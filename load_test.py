@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+End-to-end load generator for the Flask /chat endpoint.
+
+Replays chat messages from a JSON-lines file (one {"message": ..., "intent": ...}
+object per line; "intent" is optional) against a running app, or generates
+such a file from updated_balanced_procurement_intents.csv.
+
+Two modes:
+- open loop: requests are sent at a fixed arrival rate regardless of how fast
+  the server answers; latency is measured from the scheduled send time so
+  queueing delay is not hidden.
+- closed loop: N concurrent users each send their next message as soon as the
+  previous answer arrives.
+
+The servers' Server-Timing headers (see tracing.py) are collected too, and the
+report summarizes the server-side latency of each phase (detect, extract,
+admission, query, format, encode) next to the client-side latency.
+
+Usage:
+    python load_test.py generate --count 1000 --output chat_replay.jsonl
+    python load_test.py run --replay chat_replay.jsonl --mode open --rate 20 --duration 60
+    python load_test.py run --replay chat_replay.jsonl --mode closed --users 16 --duration 60
+    python load_test.py run --replay chat_replay.jsonl --mode open --rate 50 --priority batch
+    python load_test.py compare --replay chat_replay.jsonl --p95-target-ms 500 \
+        --targets flask=http://127.0.0.1:5000/chat asgi=http://127.0.0.1:8000/chat
+"""
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+
+from bench_utils import environment_info, load_jsonl, summarize_latencies, write_report
+from tracing import parse_server_timing
+
+DEFAULT_URL = "http://127.0.0.1:5000/chat"
+
+
+def generate_replay_file(csv_path, output, count, seed=0):
+    """
+    Sample chat messages from the intent CSV into a replay file.
+    """
+    df = pd.read_csv(csv_path).dropna(subset=["user_input", "intent"])
+    rng = random.Random(seed)
+    rows = list(zip(df["user_input"], df["intent"]))
+    with open(output, "w", encoding="utf-8") as f:
+        for _ in range(count):
+            message, intent = rng.choice(rows)
+            f.write(json.dumps({"message": message, "intent": intent}) + "\n")
+    print(f"Wrote {count} messages to {output}")
+
+
+class LoadRecorder:
+    """
+    Thread-safe collection of per-request outcomes.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = []
+
+    def add(self, sample):
+        with self.lock:
+            self.samples.append(sample)
+
+    def report(self, elapsed):
+        samples = list(self.samples)
+        by_intent = defaultdict(list)
+        for sample in samples:
+            by_intent[sample["intent"] or "unknown"].append(sample)
+
+        def summarize(group):
+            latencies = [s["latency_ms"] for s in group]
+            errors = sum(1 for s in group if s["error"])
+            summary = summarize_latencies(latencies)
+            summary["errors"] = errors
+            summary["error_rate"] = round(errors / len(group), 4) if group else 0.0
+            summary["unsuccessful_answers"] = sum(1 for s in group if not s["error"] and not s["success"])
+            phases = defaultdict(list)
+            for sample in group:
+                for name, ms in sample["phases"].items():
+                    phases[name].append(ms)
+            summary["server_phases"] = {name: summarize_latencies(values) for name, values in phases.items()}
+            return summary
+
+        overall = summarize(samples)
+        overall["throughput_rps"] = round(len(samples) / elapsed, 2) if elapsed else 0.0
+        overall["status_codes"] = dict(sorted(
+            (str(code), sum(1 for s in samples if s["status"] == code)) for code in {s["status"] for s in samples}
+        ))
+        # Requests rejected by the server's admission control (429 with Retry-After)
+        overall["shed"] = sum(1 for s in samples if s["status"] == 429)
+        return {
+            "overall": overall,
+            "by_intent": {intent: summarize(group) for intent, group in sorted(by_intent.items())},
+        }
+
+
+def send_message(session, url, record, recorder, scheduled=None, timeout=30):
+    """
+    Send one chat message and record its outcome.
+
+    Args:
+    - scheduled (float): perf_counter time the request was due (open loop); latency is measured from it.
+    """
+    start = time.perf_counter()
+    status, success, intent, error, phases = None, False, record.get("intent"), None, {}
+    try:
+        response = session.post(url, json={"message": record["message"]}, timeout=timeout)
+        status = response.status_code
+        phases = parse_server_timing(response.headers.get("Server-Timing"))
+        if status != 200:
+            error = f"HTTP {status}"
+        else:
+            body = response.json()
+            success = bool(body.get("success"))
+            intent = body.get("intent") or intent
+    except requests.exceptions.RequestException as e:
+        error = type(e).__name__
+    end = time.perf_counter()
+    recorder.add({
+        "intent": intent,
+        "latency_ms": (end - (scheduled if scheduled is not None else start)) * 1000,
+        "service_ms": (end - start) * 1000,
+        "status": status,
+        "success": success,
+        "error": error,
+        "phases": phases,
+    })
+
+
+def run_open_loop(url, records, rate, duration, max_workers=256, headers=None):
+    """
+    Send requests at a fixed arrival rate for `duration` seconds.
+    """
+    recorder = LoadRecorder()
+    session = requests.Session()
+    session.headers.update(headers or {})
+    adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+    session.mount("http://", adapter)
+    total = int(rate * duration)
+    messages = itertools.cycle(records)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for i in range(total):
+            scheduled = start + i / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send_message, session, url, next(messages), recorder, scheduled)
+    return recorder, time.perf_counter() - start
+
+
+def run_closed_loop(url, records, users, duration, headers=None):
+    """
+    Run `users` concurrent users, each sending back-to-back requests for `duration` seconds.
+    """
+    recorder = LoadRecorder()
+    deadline = time.perf_counter() + duration
+    lock = threading.Lock()
+    messages = itertools.cycle(records)
+
+    def user():
+        session = requests.Session()
+        session.headers.update(headers or {})
+        while time.perf_counter() < deadline:
+            with lock:
+                record = next(messages)
+            send_message(session, url, record, recorder)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=user, daemon=True) for _ in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, time.perf_counter() - start
+
+
+def find_sustained_rate(url, records, rates, duration, p95_target_ms, max_error_rate=0.01):
+    """
+    Step up the open-loop arrival rate until p95 latency or the error rate exceeds its target.
+
+    Returns:
+    - Dict: Per-step results and the highest throughput sustained within the targets.
+    """
+    steps = []
+    for rate in rates:
+        recorder, elapsed = run_open_loop(url, records, rate, duration)
+        overall = recorder.report(elapsed)["overall"]
+        within = overall["p95_ms"] <= p95_target_ms and overall["error_rate"] <= max_error_rate
+        steps.append({"rate": rate, "throughput_rps": overall["throughput_rps"], "p50_ms": overall["p50_ms"],
+                      "p95_ms": overall["p95_ms"], "error_rate": overall["error_rate"], "within_targets": within})
+        print(f"  {rate:>8.1f} req/s offered: {overall['throughput_rps']:>8.1f} req/s, p95 {overall['p95_ms']} ms, "
+              f"errors {overall['error_rate'] * 100:.1f}%")
+        if not within:
+            break
+    sustained = [step["throughput_rps"] for step in steps if step["within_targets"]]
+    return {"steps": steps, "sustained_rps": max(sustained) if sustained else 0.0}
+
+
+def print_summary(result):
+    overall = result["overall"]
+    print(f"\nRequests: {overall['count']}  Throughput: {overall['throughput_rps']} req/s  "
+          f"Errors: {overall['errors']} ({overall['error_rate'] * 100:.1f}%)  Shed (429): {overall['shed']}")
+    print(f"Latency ms  p50={overall['p50_ms']}  p95={overall['p95_ms']}  p99={overall['p99_ms']}  "
+          f"max={overall['max_ms']}")
+    print(f"\n{'intent':<40}{'count':>8}{'p50 ms':>12}{'p95 ms':>12}{'errors':>8}")
+    for intent, summary in result["by_intent"].items():
+        print(f"{intent:<40}{summary['count']:>8}{summary['p50_ms']:>12}{summary['p95_ms']:>12}{summary['errors']:>8}")
+    if overall["server_phases"]:
+        print(f"\n{'server phase (Server-Timing)':<40}{'count':>8}{'p50 ms':>12}{'p95 ms':>12}")
+        for name, summary in overall["server_phases"].items():
+            print(f"{name:<40}{summary['count']:>8}{summary['p50_ms']:>12}{summary['p95_ms']:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the /chat endpoint.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate = subparsers.add_parser("generate", help="Create a replay file from the intent CSV.")
+    generate.add_argument("--csv", default="updated_balanced_procurement_intents.csv")
+    generate.add_argument("--count", type=int, default=1000)
+    generate.add_argument("--seed", type=int, default=0)
+    generate.add_argument("--output", default="chat_replay.jsonl")
+
+    run = subparsers.add_parser("run", help="Replay messages against a running app.")
+    run.add_argument("--replay", required=True)
+    run.add_argument("--url", default=DEFAULT_URL)
+    run.add_argument("--mode", choices=["open", "closed"], default="closed")
+    run.add_argument("--rate", type=float, default=10.0, help="Arrival rate for open loop (req/s).")
+    run.add_argument("--users", type=int, default=8, help="Concurrent users for closed loop.")
+    run.add_argument("--duration", type=float, default=30.0)
+    run.add_argument("--priority", choices=["interactive", "batch"], help="Send X-Request-Priority with every request.")
+    run.add_argument("--output", default="load_report.json")
+    compare = subparsers.add_parser("compare", help="Find the sustained req/s of several servers at the same p95.")
+    compare.add_argument("--replay", required=True)
+    compare.add_argument("--targets", nargs="+", required=True, metavar="NAME=URL",
+                         help="e.g. flask=http://127.0.0.1:5000/chat asgi=http://127.0.0.1:8000/chat")
+    compare.add_argument("--rates", type=float, nargs="+", default=[5, 10, 20, 40, 80, 160])
+    compare.add_argument("--duration", type=float, default=20.0)
+    compare.add_argument("--p95-target-ms", type=float, default=500.0)
+    compare.add_argument("--max-error-rate", type=float, default=0.01)
+    compare.add_argument("--output", default="server_compare.json")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        generate_replay_file(args.csv, args.output, args.count, args.seed)
+        return
+
+    records = [r for r in load_jsonl(args.replay) if r.get("message")]
+    if not records:
+        raise SystemExit(f"No messages found in {args.replay}")
+
+    if args.command == "compare":
+        results = {}
+        for target in args.targets:
+            name, url = target.split("=", 1)
+            print(f"{name} ({url}):")
+            results[name] = find_sustained_rate(url, records, sorted(args.rates), args.duration, args.p95_target_ms,
+                                                args.max_error_rate)
+        print(f"\nSustained req/s with p95 <= {args.p95_target_ms} ms:")
+        for name, result in results.items():
+            print(f"  {name:<12}{result['sustained_rps']:>10.1f}")
+        write_report({
+            "environment": environment_info(),
+            "config": {"rates": sorted(args.rates), "duration_s": args.duration, "p95_target_ms": args.p95_target_ms,
+                       "max_error_rate": args.max_error_rate, "replay": args.replay},
+            "results": results,
+        }, args.output)
+        return
+
+    headers = {"X-Request-Priority": args.priority} if args.priority else None
+    if args.mode == "open":
+        recorder, elapsed = run_open_loop(args.url, records, args.rate, args.duration, headers=headers)
+    else:
+        recorder, elapsed = run_closed_loop(args.url, records, args.users, args.duration, headers=headers)
+
+    result = recorder.report(elapsed)
+    print_summary(result)
+    write_report({
+        "environment": environment_info(),
+        "config": {"url": args.url, "mode": args.mode, "rate": args.rate, "users": args.users,
+                   "duration_s": args.duration, "priority": args.priority, "replay": args.replay},
+        "elapsed_s": round(elapsed, 3),
+        **result,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
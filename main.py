@@ -8,6 +8,8 @@ Created on Tue Nov 19 20:05:50 2024
 from pymongo import MongoClient
 import pandas as pd
 import re
+from item_search import build_from_collection as build_item_index
+from unspsc_index import build_from_collection as build_unspsc_index
 
 # Connection string
 connection_string = 'mongodb://localhost:27017/'
@@ -103,3 +105,9 @@ print(df.head())  # Preview the first few rows of the cleaned DataFrame
 # Drop the existing collection and insert the cleaned data into MongoDB
 collection.drop()
 collection.insert_many(df.to_dict("records"))
+# The item lookups (item_details, unit_price_item) match on Item Name
+collection.create_index("Item Name")
+
+# Rebuild the BM25 item search index and the UNSPSC hierarchy index over the cleaned data
+build_item_index(collection)
+build_unspsc_index(collection)
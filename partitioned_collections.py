@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""
+Per-fiscal-year partitioned collections with a partition catalog.
+
+At ingest every purchase line is written to the collection of its fiscal year
+(purchases_fy_2013_2014, ...), each partition gets an index on Creation Date,
+and a catalog collection records the fiscal year, date range and size of every
+partition. Date-range, fiscal-year and quarter questions are then routed only
+to the partitions that can contain matching lines; questions that span several
+partitions run on them concurrently and the partial results are merged.
+
+All other intents are answered from the full collection, so the partitions can
+be added next to the existing purchases_dataset without changing anything else.
+
+Usage:
+    python partitioned_collections.py build                       # from purchases_dataset
+    python partitioned_collections.py build --synthetic 1000000
+"""
+import argparse
+import functools
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from query_functions import (connect_to_mongodb, date_range_bounds, extract_fiscal_year_from_query, format_currency,
+                             intent_map)
+
+PARTITION_PREFIX = "purchases_fy_"
+CATALOG_COLLECTION = "partition_catalog"
+UNKNOWN_FISCAL_YEAR = "unknown"
+
+
+def partition_name(fiscal_year):
+    """
+    Collection name of the partition holding a fiscal year.
+    """
+    if not fiscal_year:
+        return PARTITION_PREFIX + UNKNOWN_FISCAL_YEAR
+    return PARTITION_PREFIX + re.sub(r"\W+", "_", str(fiscal_year)).strip("_")
+
+
+# Ingestion
+class PartitionedWriter:
+    """
+    Write purchase lines into per-fiscal-year collections and build the catalog on close.
+
+    Has the same write(chunk)/close() interface as the writers in generate_dataset.py.
+    """
+
+    def __init__(self, db, drop=True):
+        self.db = db
+        self.partitions = {}
+        if drop:
+            for name in db.list_collection_names():
+                if name.startswith(PARTITION_PREFIX):
+                    db.drop_collection(name)
+            db.drop_collection(CATALOG_COLLECTION)
+
+    def write_records(self, records):
+        by_partition = {}
+        for record in records:
+            by_partition.setdefault(record.get("Fiscal Year"), []).append(record)
+        for fiscal_year, lines in by_partition.items():
+            name = partition_name(fiscal_year)
+            self.partitions[name] = fiscal_year
+            self.db[name].insert_many(lines, ordered=False)
+
+    def write(self, chunk):
+        from generate_dataset import chunk_to_records
+        self.write_records(chunk_to_records(chunk))
+
+    def close(self):
+        catalog = self.db[CATALOG_COLLECTION]
+        for name, fiscal_year in sorted(self.partitions.items()):
+            partition = self.db[name]
+            partition.create_index("Creation Date")
+            bounds = list(partition.aggregate([{"$group": {
+                "_id": None, "min_date": {"$min": "$Creation Date"}, "max_date": {"$max": "$Creation Date"},
+                "count": {"$sum": 1}}}]))
+            entry = {"collection": name, "fiscal_year": fiscal_year,
+                     "min_date": bounds[0]["min_date"] if bounds else None,
+                     "max_date": bounds[0]["max_date"] if bounds else None,
+                     "count": bounds[0]["count"] if bounds else 0}
+            catalog.replace_one({"collection": name}, entry, upsert=True)
+        print(f"Wrote {len(self.partitions)} partitions; catalog in '{CATALOG_COLLECTION}'")
+
+
+def partition_collection(source, db, batch_size=50000):
+    """
+    Split an existing purchases collection into fiscal-year partitions.
+    """
+    writer = PartitionedWriter(db)
+    batch = []
+    for document in source.find({}, {"_id": 0}, batch_size=10000):
+        batch.append(document)
+        if len(batch) >= batch_size:
+            writer.write_records(batch)
+            batch = []
+    if batch:
+        writer.write_records(batch)
+    writer.close()
+
+
+# Query routing
+class PartitionedPurchases:
+    """
+    Route queries to the partitions listed in the catalog.
+
+    Args:
+    - db: MongoDB database holding the partitions and the catalog.
+    - collection: The full purchases collection, used by intents that are not partition-aware.
+    - max_workers (int): Partitions queried concurrently.
+    """
+
+    def __init__(self, db, collection, max_workers=8):
+        self.db = db
+        self.collection = collection
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.refresh_catalog()
+
+    def refresh_catalog(self):
+        self.catalog = list(self.db[CATALOG_COLLECTION].find({}, {"_id": 0}))
+
+    def dataset_version(self):
+        """
+        Identifies the partitions (the catalog, re-read so a rebuild is also routed to) and the full
+        collection the other intents run on (see answer_cache.dataset_version).
+        """
+        from answer_cache import dataset_version
+        self.refresh_catalog()
+        catalog = tuple(sorted(tuple(sorted(entry.items())) for entry in self.catalog))
+        return catalog, dataset_version(self.collection)
+
+    # pymongo-compatible helper used by the entity extractors
+    def distinct(self, field):
+        return self.collection.distinct(field)
+
+    def for_dates(self, start, end):
+        """
+        Partitions whose Creation Date range overlaps [start, end), see date_range_bounds.
+        """
+        return [entry for entry in self.catalog
+                if entry["min_date"] is not None and entry["min_date"] < end and entry["max_date"] >= start]
+
+    def for_fiscal_year(self, fiscal_year, exact=False):
+        """
+        Partitions whose fiscal year equals (exact) or contains the extracted fiscal year, like the
+        exact and $regex matches of the single-collection handlers.
+        """
+        return [entry for entry in self.catalog if entry["fiscal_year"] is not None and (
+            entry["fiscal_year"] == fiscal_year if exact else re.search(fiscal_year, str(entry["fiscal_year"])))]
+
+    def run(self, partitions, pipeline):
+        """
+        Run the same pipeline on several partitions concurrently.
+
+        Returns:
+        - List[Dict]: The results of all partitions, concatenated.
+        """
+        futures = [self.executor.submit(lambda name: list(self.db[name].aggregate(pipeline)), entry["collection"])
+                   for entry in partitions]
+        return [row for future in futures for row in future.result()]
+
+
+def _merge_sums(rows, field):
+    totals = {}
+    for row in rows:
+        totals[row["_id"]] = totals.get(row["_id"], 0) + row[field]
+    return totals
+
+
+# Partition-aware handlers (same names, signatures and output shapes as query_functions.py)
+def get_total_orders(source, start_date, end_date):
+    try:
+        start_date, end_date = date_range_bounds(start_date, end_date)
+        rows = source.run(source.for_dates(start_date, end_date), [
+            {"$match": {"Creation Date": {"$gte": start_date, "$lt": end_date}}},
+            {"$count": "total_orders"},
+        ])
+        return sum(row["total_orders"] for row in rows)
+    except Exception as e:
+        raise ValueError(f"Error fetching total orders: {e}")
+
+
+QUARTER_STAGE = {"$addFields": {"quarter": {"$ceil": {"$divide": [{"$month": "$Creation Date"}, 3]}}}}
+
+
+def _quarter_totals(source):
+    rows = source.run(source.catalog, [QUARTER_STAGE, {"$group": {"_id": "$quarter", "total": {"$sum": "$Total Price"}}}])
+    return _merge_sums(rows, "total")
+
+
+def get_highest_spending_quarter(source):
+    totals = _quarter_totals(source)
+    if not totals:
+        return {}
+    quarter = max(totals, key=totals.get)
+    return {"_id": f"Q{int(quarter)}", "total_spending": totals[quarter]}
+
+
+def get_total_price_by_quarter(source):
+    totals = _quarter_totals(source)
+    return [{"Quarter": f"Q{int(quarter)}", "Total Price": round(total, 2)} for quarter, total in sorted(totals.items())]
+
+
+def get_fiscal_year_spending(source, query):
+    fiscal_year = extract_fiscal_year_from_query(query)
+    if not fiscal_year:
+        return [{"Message": "Fiscal year not found in the query."}]
+    rows = source.run(source.for_fiscal_year(fiscal_year), [
+        {"$match": {"Fiscal Year": {"$regex": fiscal_year}}},
+        {"$group": {"_id": None, "total_spending": {"$sum": "$Total Price"}}},
+    ])
+    return [{"Fiscal Year": fiscal_year, "Total Spending": sum(row["total_spending"] for row in rows)}] if rows else []
+
+
+def get_fiscal_year_top_department(source, query):
+    fiscal_year = extract_fiscal_year_from_query(query)
+    if not fiscal_year:
+        return [{"Message": "Fiscal year not found in the query."}]
+    # A department can appear in several partitions, so merge full per-partition totals before picking the top
+    rows = source.run(source.for_fiscal_year(fiscal_year), [
+        {"$match": {"Fiscal Year": {"$regex": fiscal_year}}},
+        {"$group": {"_id": "$Department Name", "total_spending": {"$sum": "$Total Price"}}},
+    ])
+    totals = _merge_sums(rows, "total_spending")
+    if not totals:
+        return []
+    department = max(totals, key=totals.get)
+    return [{"Department Name": department, "Total Spending": format_currency(totals[department])}]
+
+
+def get_fiscal_year_expensive_item(source, query):
+    fiscal_year = extract_fiscal_year_from_query(query)
+    if not fiscal_year:
+        return [{"Message": "Fiscal year not found in the query. Could you please specify the fiscal year?"}]
+    rows = source.run(source.for_fiscal_year(fiscal_year, exact=True), [
+        {"$match": {"Fiscal Year": fiscal_year}},
+        {"$sort": {"Unit Price": -1}},
+        {"$limit": 1},
+    ])
+    if not rows:
+        return [{"Message": f"No data found for fiscal year: {fiscal_year}."}]
+    item = max(rows, key=lambda row: row.get("Unit Price", 0))
+    return [{
+        "Item Name": item.get("Item Name", "N/A"),
+        "Unit Price": f"${item.get('Unit Price', 0):,.2f}",
+        "Purchase Order Number": item.get("Purchase Order Number", "N/A"),
+        "Department Name": item.get("Department Name", "N/A"),
+    }]
+
+
+def get_fiscal_year_orders(source, query):
+    fiscal_year = extract_fiscal_year_from_query(query)
+    if not fiscal_year:
+        return [{"Message": "Fiscal year not found in the query. Could you please clarify?"}]
+    rows = source.run(source.for_fiscal_year(fiscal_year, exact=True), [
+        {"$match": {"Fiscal Year": fiscal_year}},
+        {"$count": "total_orders"},
+    ])
+    total_orders = sum(row["total_orders"] for row in rows)
+    if total_orders:
+        return [{"Message": f"The total number of orders placed in fiscal year {fiscal_year} is {total_orders}."}]
+    return [{"Message": f"No orders found for the fiscal year {fiscal_year}."}]
+
+
+def _full_collection(handler):
+    @functools.wraps(handler)
+    def delegate(source, *args):
+        return handler(source.collection, *args)
+    return delegate
+
+
+# Intent-function map: partition-aware handlers, the rest answered from the full collection
+partitioned_intent_map = {intent: _full_collection(handler) for intent, handler in intent_map.items()}
+partitioned_intent_map.update({
+    "total_orders": get_total_orders,
+    "show_highest_spending_quarter": get_highest_spending_quarter,
+    "total_price_by_quarter": get_total_price_by_quarter,
+    "fiscal_year_expensive_item": get_fiscal_year_expensive_item,
+    "fiscal_year_orders": get_fiscal_year_orders,
+    "fiscal_year_spending": get_fiscal_year_spending,
+    "fiscal_year_top_department": get_fiscal_year_top_department,
+})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build per-fiscal-year partitioned collections.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build")
+    build.add_argument("--synthetic", type=int, help="Load this many synthetic rows instead of copying the collection.")
+    build.add_argument("--seed", type=int, default=0)
+    build.add_argument("--mongo-uri", default="mongodb://localhost:27017/")
+    build.add_argument("--db", default="purchases_large")
+    build.add_argument("--collection", default="purchases_dataset")
+    args = parser.parse_args()
+
+    source = connect_to_mongodb(args.mongo_uri, args.db, args.collection)
+    if args.synthetic:
+        from generate_dataset import write_dataset
+        write_dataset(PartitionedWriter(source.database), args.synthetic, seed=args.seed)
+    else:
+        partition_collection(source, source.database)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Purchase-order document cache.
+
+Users usually ask several questions about the same order in a row (its
+details, value, supplier, items). Instead of one pipeline per question, all
+lines of a purchase order are fetched once through the Purchase Order Number
+index and kept as a compact summary: the lines, items with their quantities,
+suppliers, total value, department and creation dates. The four purchase
+order handlers in query_functions.py are served from it.
+
+Entries expire after PO_CACHE_TTL seconds (default 300) and the cache holds at
+most PO_CACHE_SIZE orders (default 1024), least recently used first out.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+PO_CACHE_SIZE = int(os.environ.get("PO_CACHE_SIZE", 1024))
+PO_CACHE_TTL = float(os.environ.get("PO_CACHE_TTL", 300))
+
+
+def summarize_purchase_order(purchase_order_number, lines):
+    """
+    Build the cached summary of a purchase order from its lines.
+
+    Returns:
+    - Dict: Lines, items with total quantities, suppliers, total value, department and date range.
+    """
+    items, suppliers, departments, dates = {}, [], [], []
+    total_value = 0
+    for line in lines:
+        item = line.get("Item Name")
+        items[item] = items.get(item, 0) + (line.get("Quantity") or 0)
+        if line.get("Supplier Name") not in suppliers:
+            suppliers.append(line.get("Supplier Name"))
+        if line.get("Department Name") not in departments:
+            departments.append(line.get("Department Name"))
+        total_value += line.get("Total Price") or 0
+        if line.get("Creation Date") is not None:
+            dates.append(line["Creation Date"])
+    return {
+        "Purchase Order Number": purchase_order_number,
+        "lines": lines,
+        "items": items,
+        "suppliers": suppliers,
+        "departments": departments,
+        "total_value": total_value,
+        "first_date": min(dates) if dates else None,
+        "last_date": max(dates) if dates else None,
+    }
+
+
+class PurchaseOrderCache:
+    """
+    Thread-safe LRU cache of purchase order summaries with a time-to-live.
+
+    Args:
+    - max_orders (int): Maximum number of cached orders.
+    - ttl_seconds (float): Seconds before an entry is fetched again.
+    """
+
+    def __init__(self, max_orders=PO_CACHE_SIZE, ttl_seconds=PO_CACHE_TTL):
+        self.max_orders = max_orders
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.indexed = set()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _ensure_index(self, collection, source):
+        if source in self.indexed:
+            return
+        try:
+            collection.create_index("Purchase Order Number")
+        except Exception as e:
+            print(f"Could not create the Purchase Order Number index: {e}")
+        self.indexed.add(source)
+
+    def get(self, collection, purchase_order_number):
+        """
+        The summary of a purchase order, fetched with one indexed query on a miss.
+        """
+        source = getattr(collection, "full_name", id(collection))
+        key = (source, purchase_order_number)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and now - entry[0] < self.ttl_seconds:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        self._ensure_index(collection, source)
+        lines = list(collection.find({"Purchase Order Number": purchase_order_number}, {"_id": 0}))
+        summary = summarize_purchase_order(purchase_order_number, lines)
+        with self.lock:
+            self.entries[key] = (now, summary)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_orders:
+                self.entries.popitem(last=False)
+        return summary
+
+    def invalidate(self, purchase_order_number=None):
+        """
+        Drop one order (or everything) from the cache, e.g. after re-ingesting data.
+        """
+        with self.lock:
+            if purchase_order_number is None:
+                self.entries.clear()
+            else:
+                for key in [key for key in self.entries if key[1] == purchase_order_number]:
+                    del self.entries[key]
+
+    def stats(self):
+        with self.lock:
+            return {"orders": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+po_cache = PurchaseOrderCache()
+
+
+def get_purchase_order_summary(collection, purchase_order_number):
+    """
+    The cached summary of a purchase order (see PurchaseOrderCache).
+    """
+    return po_cache.get(collection, purchase_order_number)
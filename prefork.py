@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+Pre-fork launcher for the Flask chat apps.
+
+The parent process imports the app once, which loads the intent model,
+tokenizer and label mapping, and preloads the entity gazetteers. It then
+moves every object into the permanent GC generation (gc.freeze(), so garbage
+collection in the workers does not write to, and copy, the shared pages),
+closes its MongoDB client and forks N workers. The workers share the model
+pages copy-on-write, each re-creates its own MongoDB client (pymongo clients
+are not fork-safe) and serves /chat on the listening socket opened by the parent.
+
+The parent restarts workers that exit and reports, per worker, the unique
+memory (pages only that worker has: USS) and the shared memory (pages still
+shared with the parent and the other workers), plus PSS, from
+/proc/<pid>/smaps_rollup (Linux).
+
+Usage:
+    python prefork.py --workers 4 --port 5000
+    python prefork.py --app app --workers 8 --report-interval 60 --report-file prefork_memory.json
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+SMAPS_FIELDS = {"Rss": "rss", "Pss": "pss", "Shared_Clean": "shared", "Shared_Dirty": "shared",
+                "Private_Clean": "unique", "Private_Dirty": "unique"}
+
+
+def memory_usage(pid):
+    """
+    Memory of a process in megabytes.
+
+    Returns:
+    - Dict[str, float]: rss, pss, unique (USS) and shared, or None if /proc is not available.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    usage = {"rss": 0.0, "pss": 0.0, "unique": 0.0, "shared": 0.0}
+    for line in lines:
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].rstrip(":") in SMAPS_FIELDS:
+            usage[SMAPS_FIELDS[parts[0].rstrip(":")]] += int(parts[1]) / 1024
+    return {key: round(value, 1) for key, value in usage.items()}
+
+
+def memory_report(parent_pid, worker_pids):
+    """
+    Per-process memory of the parent and its workers, with totals.
+    """
+    processes = [{"role": "parent", "pid": parent_pid, **(memory_usage(parent_pid) or {})}]
+    processes += [{"role": "worker", "pid": pid, **(memory_usage(pid) or {})} for pid in worker_pids]
+    workers = [p for p in processes if p["role"] == "worker" and "pss" in p]
+    return {
+        "processes": processes,
+        # PSS adds up to the real footprint of the whole group; RSS would count shared pages once per worker
+        "total_pss_mb": round(sum(p.get("pss", 0) for p in processes), 1),
+        "worker_unique_mb": round(sum(p["unique"] for p in workers) / len(workers), 1) if workers else None,
+        "worker_shared_mb": round(sum(p["shared"] for p in workers) / len(workers), 1) if workers else None,
+    }
+
+
+def print_memory_report(report):
+    print(f"{'role':<8}{'pid':>8}{'rss MB':>10}{'pss MB':>10}{'unique MB':>11}{'shared MB':>11}")
+    for p in report["processes"]:
+        if "rss" in p:
+            print(f"{p['role']:<8}{p['pid']:>8}{p['rss']:>10.1f}{p['pss']:>10.1f}{p['unique']:>11.1f}{p['shared']:>11.1f}")
+    print(f"Total PSS: {report['total_pss_mb']} MB; per worker: {report['worker_unique_mb']} MB unique, "
+          f"{report['worker_shared_mb']} MB shared")
+
+
+def load_app(module_name):
+    """
+    Import the app in the parent (eager startup) and preload everything the workers can share.
+    """
+    os.environ["STARTUP_MODE"] = "eager"
+    module = __import__(module_name)
+    if module.collection is not None and hasattr(module.collection, "distinct"):
+        from query_functions import preload_gazetteers
+        try:
+            print(f"Preloaded gazetteers: {preload_gazetteers(module.collection)}")
+        except Exception as e:
+            print(f"Could not preload gazetteers: {e}")
+    if getattr(module, "answer_cache", None) is not None:
+        # No warmer thread may hold the cache's lock across the fork; the workers keep its answers
+        module.answer_cache.stop()
+    _close_client(module.collection)
+    return module
+
+
+def _close_client(collection):
+    client = getattr(getattr(collection, "database", None), "client", None)
+    if client is not None:
+        client.close()
+
+
+def reconnect(module):
+    """
+    Give a freshly forked worker its own MongoDB client and analytics backend.
+    """
+    module.connect_database()
+    if hasattr(module, "load_analytics_backend"):
+        module.load_analytics_backend()
+    if hasattr(module, "start_answer_cache"):
+        module.start_answer_cache()
+
+
+def serve_worker(module, listener, host, port, threaded):
+    from werkzeug.serving import make_server
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    reconnect(module)
+    server = make_server(host, port, module.app, threaded=threaded, fd=listener.fileno())
+    print(f"Worker {os.getpid()} serving on {host}:{port}")
+    server.serve_forever()
+
+
+class PreforkLauncher:
+    """
+    Fork and supervise workers that share the parent's loaded app.
+
+    Args:
+    - module: The imported app module (flask_app_complete_code or app).
+    - workers (int): Number of worker processes.
+    - host, port: Address to listen on.
+    - threaded (bool): Let each worker handle requests in threads.
+    """
+
+    def __init__(self, module, workers, host="127.0.0.1", port=5000, threaded=True):
+        self.module = module
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.threaded = threaded
+        self.pids = set()
+        self.stopping = False
+        self.listener = socket.create_server((host, port), reuse_port=False, backlog=1024)
+        self.listener.set_inheritable(True)
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                serve_worker(self.module, self.listener, self.host, self.port, self.threaded)
+            finally:
+                os._exit(0)
+        self.pids.add(pid)
+        return pid
+
+    def stop(self, signum=None, frame=None):
+        self.stopping = True
+        for pid in list(self.pids):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self, report_interval=0, report_file=None):
+        # Objects loaded so far are never collected; freezing them keeps GC from touching (and copying) their pages
+        gc.collect()
+        gc.freeze()
+        for _ in range(self.workers):
+            self.spawn()
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        print(f"Parent {os.getpid()} started {self.workers} workers on {self.host}:{self.port}")
+
+        next_report = time.monotonic() + (report_interval or 5)
+        while self.pids:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid:
+                self.pids.discard(pid)
+                if not self.stopping:
+                    print(f"Worker {pid} exited with status {status}; restarting")
+                    self.spawn()
+                continue
+            if not self.stopping and time.monotonic() >= next_report:
+                report = memory_report(os.getpid(), sorted(self.pids))
+                print_memory_report(report)
+                if report_file:
+                    from bench_utils import write_report
+                    write_report(report, report_file)
+                if not report_interval:
+                    next_report = float("inf")
+                else:
+                    next_report = time.monotonic() + report_interval
+            time.sleep(0.2)
+        self.listener.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a Flask chat app from pre-forked workers.")
+    parser.add_argument("--app", default="flask_app_complete_code", help="App module (flask_app_complete_code or app).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=1,
+                        help="Intra-op threads per worker (OMP/MKL); more than 1 with fork can deadlock OpenMP.")
+    parser.add_argument("--no-threaded", action="store_true", help="Handle one request at a time per worker.")
+    parser.add_argument("--report-interval", type=float, default=0,
+                        help="Seconds between memory reports (0: once, shortly after the workers start).")
+    parser.add_argument("--report-file", help="Write the latest memory report as JSON to this file.")
+    args = parser.parse_args()
+
+    # Must be set before torch is imported by the app
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(variable, str(args.threads))
+    module = load_app(args.app)
+    launcher = PreforkLauncher(module, args.workers, args.host, args.port, threaded=not args.no_threaded)
+    launcher.run(args.report_interval, args.report_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,36 @@
 # MongoDB Connection
 from datetime import datetime, timedelta
-from pymongo import MongoClient
 import re
-from dateutil.parser import parse
-from dateparser import parse
 import logging
+from po_cache import get_purchase_order_summary
+from date_extraction import extract_date_range, fiscal_year_label
+
+
+def search_items(collection, query, k=5, min_ratio=0.5):
+    # Imported on first use so that importing this module does not load NumPy (see item_search.py)
+    from item_search import search_items as search
+    return search(collection, query, k=k, min_ratio=min_ratio)
+
+
+_item_name_indexed = set()
+
+
+def ensure_item_name_index(collection):
+    """
+    Create the Item Name index the item lookups match on, once per collection (it is also created at ingest).
+    """
+    source = getattr(collection, "full_name", id(collection))
+    if source in _item_name_indexed:
+        return
+    try:
+        collection.create_index("Item Name")
+    except Exception as e:
+        print(f"Could not create the Item Name index: {e}")
+    _item_name_indexed.add(source)
+
+
 def connect_to_mongodb(connection_string, db_name, collection_name):
+    from pymongo import MongoClient
     try:
         client = MongoClient(connection_string)
         client.admin.command('ping')
@@ -53,6 +78,42 @@ def execute_pipeline(collection, pipeline):
         print("Pipeline execution failed:", e)
         return []
 
+# Documents per cursor batch when rows are streamed to the client
+STREAM_BATCH_SIZE = 500
+
+def stream_pipeline(collection, pipeline, batch_size=STREAM_BATCH_SIZE):
+    """
+    Iterate over the results of an aggregation batch by batch, without building the full list.
+
+    Args:
+    - collection: MongoDB collection object.
+    - pipeline (List[Dict]): The aggregation pipeline.
+    - batch_size (int): Documents fetched per round trip.
+
+    Returns:
+    - CommandCursor: The aggregation cursor.
+    """
+    return collection.aggregate(pipeline, allowDiskUse=True, batchSize=batch_size)
+
+def date_range_bounds(start_date, end_date):
+    """
+    Convert an inclusive day range into datetime bounds for matching Creation Date.
+
+    The extracted ranges include their last day, and Creation Date carries a time of day, so the
+    end bound is the midnight after end_date and is exclusive.
+
+    Args:
+    - start_date (str): Start date in 'YYYY-MM-DD' format.
+    - end_date (str): Last included date in 'YYYY-MM-DD' format.
+
+    Returns:
+    - tuple: (start, end) datetimes; match with start <= Creation Date < end.
+    """
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    end = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
+    return start, end
+
+
 # Query Functions
 def get_total_orders(collection, start_date, end_date):
     """
@@ -67,13 +128,12 @@ def get_total_orders(collection, start_date, end_date):
     - int: Total number of orders within the date range.
     """
     try:
-        # Convert date strings to datetime objects
-        start_date = datetime.strptime(start_date, "%Y-%m-%d")
-        end_date = datetime.strptime(end_date, "%Y-%m-%d")
+        # Convert date strings to datetime bounds (the end bound is exclusive)
+        start_date, end_date = date_range_bounds(start_date, end_date)
 
         # MongoDB aggregation pipeline
         pipeline = [
-            {"$match": {"Creation Date": {"$gte": start_date, "$lte": end_date}}},  # Filter by date range
+            {"$match": {"Creation Date": {"$gte": start_date, "$lt": end_date}}},  # Filter by date range
             {"$count": "total_orders"}  # Count the documents
         ]
 
@@ -156,40 +216,53 @@ def get_orders_by_supplier(collection, supplier_name):
     supplier_name = supplier_name.strip()
 
     try:
-        orders = list(collection.find(
-            {"Supplier Name": {"$regex": f"^{supplier_name}$", "$options": "i"}},
-            {"_id": 0, "Purchase Order Number": 1, "Total Price": 1, "Creation Date": 1}
-        ))
-
-        if orders:
-            formatted_orders = []
-            for order in orders:
-                # Handle cases where Total Price is a string or a number
-                total_price = order.get("Total Price", 0)
-                if isinstance(total_price, (int, float)):
-                    formatted_total_price = f"${total_price:,.2f}"
-                else:
-                    formatted_total_price = total_price  # Assume it's already formatted
-
-                # Handle Creation Date formatting
-                creation_date = order.get("Creation Date")
-                if isinstance(creation_date, datetime):
-                    formatted_creation_date = creation_date.strftime("%Y-%m-%d")
-                else:
-                    formatted_creation_date = "N/A"
-
-                formatted_orders.append({
-                    "Purchase Order Number": order.get("Purchase Order Number", "N/A"),
-                    "Total Price": formatted_total_price,
-                    "Creation Date": formatted_creation_date,
-                })
+        formatted_orders = list(iter_orders_by_supplier(collection, supplier_name))
 
+        if formatted_orders:
             return formatted_orders
         else:
             return [{"Message": f"No orders found for supplier: {supplier_name}."}]
     except Exception as e:
         return [{"Message": f"Error fetching orders for supplier {supplier_name}: {str(e)}"}]
 
+def iter_orders_by_supplier(collection, supplier_name, batch_size=STREAM_BATCH_SIZE):
+    """
+    Yield the orders of a supplier one by one as they come off the cursor, formatted like get_orders_by_supplier.
+
+    Args:
+    - collection: MongoDB collection object.
+    - supplier_name (str): The name of the supplier.
+    - batch_size (int): Documents fetched per round trip.
+
+    Returns:
+    - Iterator[Dict]: Purchase Order Number, Total Price and Creation Date of each order.
+    """
+    cursor = collection.find(
+        {"Supplier Name": {"$regex": f"^{supplier_name.strip()}$", "$options": "i"}},
+        {"_id": 0, "Purchase Order Number": 1, "Total Price": 1, "Creation Date": 1},
+        batch_size=batch_size,
+    )
+    for order in cursor:
+        # Handle cases where Total Price is a string or a number
+        total_price = order.get("Total Price", 0)
+        if isinstance(total_price, (int, float)):
+            formatted_total_price = f"${total_price:,.2f}"
+        else:
+            formatted_total_price = total_price  # Assume it's already formatted
+
+        # Handle Creation Date formatting
+        creation_date = order.get("Creation Date")
+        if isinstance(creation_date, datetime):
+            formatted_creation_date = creation_date.strftime("%Y-%m-%d")
+        else:
+            formatted_creation_date = "N/A"
+
+        yield {
+            "Purchase Order Number": order.get("Purchase Order Number", "N/A"),
+            "Total Price": formatted_total_price,
+            "Creation Date": formatted_creation_date,
+        }
+
 
     
     
@@ -205,18 +278,23 @@ def get_acquisition_method_avg_price(collection):
         for result in results
     ]
 
+ACQUISITION_METHOD_DEPARTMENT_PIPELINE = [
+    {"$group": {"_id": {"method": "$Acquisition Method", "department": "$Department Name"}, 
+                "total_spending": {"$sum": "$Total Price"}}},
+    {"$sort": {"_id.method": 1, "_id.department": 1}}
+]
+
+def _acquisition_method_department_row(result):
+    return {"Acquisition Method": result["_id"]["method"], "Department": result["_id"]["department"], 
+            "Total Spending": round(result["total_spending"], 2)}
+
 def get_acquisition_method_department(collection):
-    pipeline = [
-        {"$group": {"_id": {"method": "$Acquisition Method", "department": "$Department Name"}, 
-                    "total_spending": {"$sum": "$Total Price"}}},
-        {"$sort": {"_id.method": 1, "_id.department": 1}}
-    ]
-    results = execute_pipeline(collection, pipeline)
-    return [
-        {"Acquisition Method": result["_id"]["method"], "Department": result["_id"]["department"], 
-         "Total Spending": round(result["total_spending"], 2)}
-        for result in results
-    ]
+    results = execute_pipeline(collection, ACQUISITION_METHOD_DEPARTMENT_PIPELINE)
+    return [_acquisition_method_department_row(result) for result in results]
+
+def iter_acquisition_method_department(collection):
+    for result in stream_pipeline(collection, ACQUISITION_METHOD_DEPARTMENT_PIPELINE):
+        yield _acquisition_method_department_row(result)
 
 def get_acquisition_method_frequency(collection):
     pipeline = [
@@ -376,18 +454,23 @@ def get_calcard_orders(collection):
         for result in results
     ]
 
+CALCARD_TOP_DEPARTMENTS_PIPELINE = [
+    {"$group": {"_id": {"CalCard": "$CalCard", "department": "$Department Name"}, 
+                "total_spending": {"$sum": "$Total Price"}}},
+    {"$sort": {"total_spending": -1}}
+]
+
+def _calcard_top_departments_row(result):
+    return {"CalCard": result["_id"]["CalCard"], "Department": result["_id"]["department"], 
+            "Total Spending": round(result["total_spending"], 2)}
+
 def get_calcard_top_departments(collection):
-    pipeline = [
-        {"$group": {"_id": {"CalCard": "$CalCard", "department": "$Department Name"}, 
-                    "total_spending": {"$sum": "$Total Price"}}},
-        {"$sort": {"total_spending": -1}}
-    ]
-    results = execute_pipeline(collection, pipeline)
-    return [
-        {"CalCard": result["_id"]["CalCard"], "Department": result["_id"]["department"], 
-         "Total Spending": round(result["total_spending"], 2)}
-        for result in results
-    ]
+    results = execute_pipeline(collection, CALCARD_TOP_DEPARTMENTS_PIPELINE)
+    return [_calcard_top_departments_row(result) for result in results]
+
+def iter_calcard_top_departments(collection):
+    for result in stream_pipeline(collection, CALCARD_TOP_DEPARTMENTS_PIPELINE):
+        yield _calcard_top_departments_row(result)
 
 def get_calcard_total_spending(collection):
     pipeline = [
@@ -401,6 +484,34 @@ def get_calcard_total_spending(collection):
     ]
 
 
+# Combined filters
+def get_filtered_spending(collection, query):
+    """
+    Total spending and number of lines for every filter in the question combined, e.g.
+    "CalCard spending for the Health department in fiscal year 2013-2014".
+
+    Args:
+    - collection: MongoDB collection object.
+    - query (str): The user's question.
+
+    Returns:
+    - Dict: The filters applied, total spending and number of lines.
+    """
+    filters = extract_spending_filters(collection, query)
+    if not filters:
+        return {"Message": "No CalCard, department, acquisition type or fiscal year found in the query."}
+    match = {field: value for field, value in filters.items() if field != "Fiscal Year"}
+    if "Fiscal Year" in filters:
+        match["Fiscal Year"] = {"$regex": filters["Fiscal Year"]}
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": None, "total_spending": {"$sum": "$Total Price"}, "count": {"$sum": 1}}}
+    ]
+    results = execute_pipeline(collection, pipeline)
+    spending, count = (results[0]["total_spending"], results[0]["count"]) if results else (0, 0)
+    return {"Filters": filters, "Total Spending": format_currency(spending), "Total Orders": count}
+
+
 # Miscellaneous
 def get_cheapest_item(collection):
     """
@@ -939,12 +1050,14 @@ def get_item_details(collection, query):
     Returns:
     - List[Dict]: List of item details.
     """
-    # Extract item name from the query
-    item_name = extract_item_name_from_query(query)
+    # Resolve the best-matching items with the BM25 item index
+    item_names = search_items(collection, query)
 
-    if item_name:
+    if item_names:
+        ensure_item_name_index(collection)
         pipeline = [
-            {"$match": {"Item Name": item_name}}
+            {"$match": {"Item Name": {"$in": item_names}}},
+            {"$project": {"_id": 0}}
         ]
         result = execute_pipeline(collection, pipeline)
         return result
@@ -967,11 +1080,8 @@ def get_purchase_order_details(collection, query):
     purchase_order_number = extract_purchase_order_number_from_query(query)
 
     if purchase_order_number:
-        pipeline = [
-            {"$match": {"Purchase Order Number": purchase_order_number}}
-        ]
-        result = execute_pipeline(collection, pipeline)
-        return result
+        # All PO intents are served from one cached fetch of the order's lines (see po_cache.py)
+        return get_purchase_order_summary(collection, purchase_order_number)["lines"]
     else:
         return "No purchase order number found in the query. Please clarify."
     
@@ -991,12 +1101,8 @@ def get_purchase_order_supplier(collection, query):
     purchase_order_number = extract_purchase_order_number_from_query(query)
 
     if purchase_order_number:
-        pipeline = [
-            {"$match": {"Purchase Order Number": purchase_order_number}},
-            {"$group": {"_id": "$Supplier Name"}}
-        ]
-        result = execute_pipeline(collection, pipeline)
-        return [{"supplier_name": item["_id"]} for item in result]
+        summary = get_purchase_order_summary(collection, purchase_order_number)
+        return [{"supplier_name": supplier} for supplier in summary["suppliers"]]
     else:
         return "No purchase order number found in the query. Please clarify."
 
@@ -1015,12 +1121,8 @@ def get_purchase_order_value(collection, query):
     purchase_order_number = extract_purchase_order_number_from_query(query)
 
     if purchase_order_number:
-        pipeline = [
-            {"$match": {"Purchase Order Number": purchase_order_number}},
-            {"$group": {"_id": None, "total_value": {"$sum": "$Total Price"}}}
-        ]
-        result = execute_pipeline(collection, pipeline)
-        return result[0]["total_value"] if result else 0
+        summary = get_purchase_order_summary(collection, purchase_order_number)
+        return summary["total_value"] if summary["lines"] else 0
     else:
         return "No purchase order number found in the query. Please clarify."
 
@@ -1039,16 +1141,12 @@ def get_purchase_order_items(collection, query):
     purchase_order_number = extract_purchase_order_number_from_query(query)
 
     if purchase_order_number:
-        # Perform the aggregation query to get items in the purchase order
-        pipeline = [
-            {"$match": {"Purchase Order Number": purchase_order_number}},
-            {"$group": {"_id": "$Item Name", "total_quantity": {"$sum": "$Quantity"}}}
-        ]
-        result = execute_pipeline(collection, pipeline)
+        # Items and their total quantities come from the cached order summary
+        result = get_purchase_order_summary(collection, purchase_order_number)["items"]
 
         if result:
             # Prepare the response with the items in the purchase order
-            items = "\n".join([f"{item['item_name']} (Quantity: {item['total_quantity']})" for item in result])
+            items = "\n".join([f"{item_name} (Quantity: {quantity})" for item_name, quantity in result.items()])
             return f"Items in purchase order {purchase_order_number}:\n{items}"
         else:
             return f"No items found for purchase order number: {purchase_order_number}"
@@ -1100,15 +1198,16 @@ def get_unit_price_item(collection, query):
     - Dict: A readable result containing item details or an error message.
     """
     try:
-        # Extract item name from the query
-        item_name = extract_item_name_from_query(query)
+        # Resolve the best-matching items with the BM25 item index
+        item_names = search_items(collection, query)
 
-        if not item_name:
+        if not item_names:
             return {"Message": "Item name not found in the query. Could you please clarify?"}
 
-        # Query the database for the specific item
+        # Query the database for the matched items
+        ensure_item_name_index(collection)
         pipeline = [
-            {"$match": {"Item Name": {"$regex": f"^{item_name}$", "$options": "i"}}},  # Case-insensitive exact match
+            {"$match": {"Item Name": {"$in": item_names}}},
             {"$project": {
                 "Item Name": 1,
                 "Unit Price": 1,
@@ -1133,7 +1232,7 @@ def get_unit_price_item(collection, query):
                 for item in result
             ]
         else:
-            return {"Message": f"No data found for the item: {item_name}"}
+            return {"Message": f"No data found for the item: {item_names[0]}"}
     except Exception as e:
         return {"Error": f"An error occurred while fetching the item details: {str(e)}"}
 
@@ -1219,86 +1318,56 @@ def handle_unknown_query():
 
 # Functuins to extract specific information from user's query
 
-def extract_dates_from_query(query):
+# Entity gazetteers: the distinct values the extractors below look for in a query. They only change when the
+# dataset is re-ingested, so they are fetched once per process (and before forking by prefork.py).
+GAZETTEER_FIELDS = ["Department Name", "Supplier Name"]
+_gazetteers = {}
+
+
+def get_gazetteer(collection, field):
     """
-    Extract possible dates or date ranges from the user's query.
-    Supports ISO format, natural language ranges, and various patterns.
+    Distinct values of a field, cached per data source.
+
+    Args:
+    - collection: MongoDB collection object (or any source with a distinct() method).
+    - field (str): Field name, e.g. "Department Name".
+
+    Returns:
+    - List: The distinct values of the field.
     """
-    query = query.lower()
-    print("Query:", query)  # Debugging query input
+    key = (getattr(collection, "full_name", id(collection)), field)
+    if key not in _gazetteers:
+        _gazetteers[key] = collection.distinct(field)
+    return _gazetteers[key]
 
-    dates = []
 
-    # Handle natural language date ranges (e.g., "last year", "this year")
-    now = datetime.now()
-    if "last year" in query:
-        start_date = datetime(now.year - 1, 1, 1).strftime('%Y-%m-%d')
-        end_date = datetime(now.year - 1, 12, 31).strftime('%Y-%m-%d')
-        print("Matched 'last year':", [start_date, end_date])  # Debugging output
-        return [start_date, end_date]
-
-    if "this year" in query:
-        start_date = datetime(now.year, 1, 1).strftime('%Y-%m-%d')
-        end_date = datetime(now.year, 12, 31).strftime('%Y-%m-%d')
-        print("Matched 'this year':", [start_date, end_date])  # Debugging output
-        return [start_date, end_date]
-
-    if "last month" in query:
-        if now.month == 1:  # Handle January (last month is December of the previous year)
-            start_date = datetime(now.year - 1, 12, 1).strftime('%Y-%m-%d')
-            end_date = datetime(now.year - 1, 12, 31).strftime('%Y-%m-%d')
-        else:
-            start_date = datetime(now.year, now.month - 1, 1).strftime('%Y-%m-%d')
-            end_date = (datetime(now.year, now.month, 1) - timedelta(days=1)).strftime('%Y-%m-%d')
-        print("Matched 'last month':", [start_date, end_date])
-        return [start_date, end_date]
-
-    if "this month" in query:
-        start_date = datetime(now.year, now.month, 1).strftime('%Y-%m-%d')
-        next_month = datetime(now.year, now.month, 28) + timedelta(days=4)
-        end_date = (next_month - timedelta(days=next_month.day)).strftime('%Y-%m-%d')
-        print("Matched 'this month':", [start_date, end_date])
-        return [start_date, end_date]
-
-    # Match date ranges like "from 01-01-2022 to 12-31-2022"
-    range_match = re.search(r'from\s+([\w/-]+)\s+to\s+([\w/-]+)', query)
-    if range_match:
-        try:
-            start_date = parse(range_match.group(1)).strftime('%Y-%m-%d')
-            end_date = parse(range_match.group(2)).strftime('%Y-%m-%d')
-            print("Matched range:", [start_date, end_date])  # Debugging output
-            return [start_date, end_date]
-        except Exception as e:
-            print("Range parsing failed:", e)  # Debugging errors
-
-    # Match explicit date patterns
-    date_patterns = [
-        r'\b\d{4}-\d{2}-\d{2}\b',  # ISO format: 2022-01-01
-        r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b',  # Formats: 01/01/2022 or 01-01-22
-        r'\b(january|february|march|april|may|june|july|august|september|october|november|december)\s+\d{1,2},?\s+\d{4}\b'  # "January 1, 2022"
-    ]
+def preload_gazetteers(collection, fields=GAZETTEER_FIELDS):
+    """
+    Fetch the gazetteers up front.
+
+    Returns:
+    - Dict[str, int]: Number of values per field.
+    """
+    return {field: len(get_gazetteer(collection, field)) for field in fields}
 
-    for pattern in date_patterns:
-        matches = re.findall(pattern, query)
-        for match in matches:
-            try:
-                parsed_date = parse(match)  # No fuzzy argument
-                dates.append(parsed_date.strftime('%Y-%m-%d'))
-            except Exception as e:
-                print("Date parsing failed for:", match, e)  # Debugging errors
-
-    # Return sorted and deduplicated dates
-    final_dates = sorted(set(dates))
-    if len(final_dates) == 2:  # If two dates, assume it's a range
-        print("Matched dates:", final_dates)
-        return final_dates
-    elif len(final_dates) == 1:  # Single date found
-        print("Matched single date:", final_dates)
-        return [final_dates[0], final_dates[0]]  # Treat as same start and end date
-    else:
-        print("No valid dates found.")
-        return None
 
+def clear_gazetteers():
+    """
+    Forget the cached gazetteers, e.g. after re-ingesting data.
+    """
+    _gazetteers.clear()
+
+
+def extract_dates_from_query(query):
+    """
+    Extract possible dates or date ranges from the user's query.
+    Supports ISO and numeric dates, month names, quarters ("Q2 2023"), fiscal years ("FY2022-23"),
+    relative periods ("last month") and ranges ("from X to Y"); see date_extraction.py.
+
+    Returns:
+    - List[str]: [start_date, end_date] as 'YYYY-MM-DD' strings, or None if no date is found.
+    """
+    return extract_date_range(query)
 
 
 def extract_department_from_query(query, collection):
@@ -1307,7 +1376,7 @@ def extract_department_from_query(query, collection):
     """
     query = query.lower()
 
-    departments = collection.distinct("Department Name")  # Assuming "Department Name" exists
+    departments = get_gazetteer(collection, "Department Name")
 
     for department in departments:
         if department.lower() in query:
@@ -1318,6 +1387,35 @@ def extract_department_from_query(query, collection):
     return None
 
 
+SPENDING_FILTER_FIELDS = ["Department Name", "Acquisition Type"]
+# "non-calcard", "not on a calcard", "without calcard", "excluding calcard" ask for the other purchases
+CALCARD_NEGATION = re.compile(
+    r"\b(?:non[\s-]?|(?:not|without|excluding|except)\s+(?:(?:on|using|by|with|via|through)\s+)?(?:an?\s+|the\s+)?)calcard")
+
+
+def extract_spending_filters(collection, query):
+    """
+    Collect the spending filters mentioned in a question: CalCard, department, acquisition type and fiscal year.
+
+    Returns:
+    - Dict[str, str]: Field -> value, e.g. {"CalCard": "YES", "Department Name": "Health", "Fiscal Year": "2013-2014"}.
+      The same dict is reported as "Filters" by every backend.
+    """
+    lowered = query.lower()
+    filters = {}
+    if "calcard" in lowered:
+        filters["CalCard"] = "NO" if CALCARD_NEGATION.search(lowered) else "YES"
+    for field in SPENDING_FILTER_FIELDS:
+        # The longest mentioned value, so "Health Care Services" wins over "Health"
+        matches = [value for value in get_gazetteer(collection, field) if value and str(value).lower() in lowered]
+        if matches:
+            filters[field] = max(matches, key=lambda value: len(str(value)))
+    fiscal_year = extract_fiscal_year_from_query(query)
+    if fiscal_year:
+        filters["Fiscal Year"] = fiscal_year
+    return filters
+
+
 def get_largest_order(collection):
     """
     Fetch the largest order based on the quantity of items.
@@ -1387,28 +1485,17 @@ def extract_category_from_query(query, collection):
 
 def extract_item_name_from_query(collection, query):
     """
-    Extract the item name from the user's query by searching in MongoDB.
+    Extract the item name from the user's query with the BM25 item index (see item_search.py).
 
     Args:
     - collection: MongoDB collection object.
     - query (str): The user's query containing the item name.
 
     Returns:
-    - str: The extracted item name, or None if not found.
+    - str: The best-matching item name, or None if not found.
     """
-    query = query.lower()  # Convert to lowercase for case-insensitive matching
-
-    # Use a regular expression to find matches for item names in the query
-    # Searching for item names in the MongoDB database based on user's query
-    result = collection.items.find({"item_name": {"$regex": query, "$options": "i"}}, {"item_name": 1, "_id": 0})
-
-    # If we find any matching items, return the first one
-    matching_items = list(result)
-    if matching_items:
-        return matching_items[0]["item_name"]
-    
-    # If no match is found, return None
-    return None
+    matching_items = search_items(collection, query, k=1)
+    return matching_items[0] if matching_items else None
 
 def extract_acquisition_type_from_query(collection, query):
 
@@ -1451,7 +1538,7 @@ def extract_supplier_name_from_query(collection, query):
     query = query.lower()  # Convert query to lowercase for case-insensitive matching
 
     # Extract potential supplier name using the Supplier Name field
-    suppliers = collection.distinct("Supplier Name")
+    suppliers = get_gazetteer(collection, "Supplier Name")
     for supplier in suppliers:
         if supplier.lower() in query:
             return supplier  # Return the exact match from the database
@@ -1494,6 +1581,16 @@ def extract_fiscal_year_from_query(query):
     """
     query = query.lower()
 
+    # An explicit range such as "FY2013-14" or "fiscal year 2013-2014" names one fiscal year exactly
+    fiscal_year = fiscal_year_label(query)
+    if fiscal_year:
+        return fiscal_year
+
+    # So does a bare range of consecutive years ("spending in 2013-2014")
+    range_match = re.search(r'\b(20\d{2})\s*[-/]\s*(20\d{2})\b', query)
+    if range_match and int(range_match.group(2)) == int(range_match.group(1)) + 1:
+        return f"{range_match.group(1)}-{range_match.group(2)}"
+
     # Look for a 4-digit year (e.g., 2021, 2022, etc.)
     year_match = re.search(r'\b(20\d{2})\b', query)
     if year_match:
@@ -1513,6 +1610,74 @@ def extract_fiscal_year_from_query(query):
 
     
     return None  # Return None if no fiscal year found
+# Intent-function map used by the chat endpoint
+intent_map = {
+    "show_highest_spending_quarter": get_highest_spending_quarter,
+    "total_orders": get_total_orders,
+    "frequent_items": get_frequent_line_items,
+    "acquisition_spending": get_spending_by_acquisition_type,
+    "total_quantity": get_total_quantity,
+    "supplier_orders": get_orders_by_supplier,
+    "acquisition_method_avg_price": get_acquisition_method_avg_price,
+    "acquisition_method_department": get_acquisition_method_department,
+    "acquisition_method_frequency": get_acquisition_method_frequency,
+    "acquisition_method_spending": get_acquisition_method_spending,
+    "acquisition_type_department_usage": get_acquisition_type_department_usage,
+    "acquisition_type_orders": get_acquisition_type_orders,
+    "acquisition_type_spending": get_acquisition_spending,
+    "acquisition_type_top_suppliers": get_acquisition_type_top_suppliers,
+    "avg_quantity_per_order": get_avg_quantity_per_order,
+    "avg_unit_price_by_category": get_avg_unit_price_by_category,
+    "bulk_items": get_bulk_items,
+    "calcard_frequent_items": get_calcard_frequent_items,
+    "calcard_orders": get_calcard_orders,
+    "calcard_top_departments": get_calcard_top_departments,
+    "calcard_total_spending": get_calcard_total_spending,
+    "cheapest_item": get_cheapest_item,
+    "classification_frequent_items": get_classification_frequent_items,
+    "classification_items": get_classification_items,
+    "classification_spending_breakdown": get_classification_spending_breakdown,
+    "department_item_count": get_department_item_count,
+    "department_spending_breakdown": get_department_spending_breakdown,
+    "department_suppliers": get_department_suppliers,
+    "department_top_purchases": get_department_top_purchases,
+    "fiscal_year_expensive_item": get_fiscal_year_expensive_item,
+    "fiscal_year_orders": get_fiscal_year_orders,
+    "fiscal_year_spending": get_fiscal_year_spending,
+    "fiscal_year_top_department": get_fiscal_year_top_department,
+    "highest_total_price_order": get_highest_total_price_order,
+    "item_details": get_item_details,
+    "large_quantity_orders": get_large_quantity_orders,
+    "purchase_order_details": get_purchase_order_details,
+    "purchase_order_items": get_purchase_order_items,
+    "purchase_order_supplier": get_purchase_order_supplier,
+    "purchase_order_value": get_purchase_order_value,
+    "quantity_top_department": get_quantity_top_department,
+    "supplier_items": get_supplier_items,
+    "supplier_spending": get_supplier_spending,
+    "supplier_top_orders": get_supplier_top_orders,
+    "supplier_top_revenue": get_supplier_top_revenue,
+    "top_classification_code": get_top_classification_code,
+    "total_price_by_category": get_total_price_by_category,
+    "total_price_by_quarter": get_total_price_by_quarter,
+    "unit_price_item": get_unit_price_item,
+    "greeting": handle_greeting,
+    "department_spending_by_name": get_department_spending_by_name,
+    "frequent_line_items": get_frequent_line_items,
+    "highest_spending_department": get_highest_spending_department,
+    "largest_order": get_largest_order,
+    "department_spending": get_department_spending_breakdown,
+    "filtered_spending": get_filtered_spending
+}
+
+# Row-by-row versions of the handlers with large tabular answers, keyed by the handler they stream.
+# Used by the streaming /chat endpoint; other backends' handlers are not in here and are answered whole.
+streaming_handlers = {
+    get_orders_by_supplier: iter_orders_by_supplier,
+    get_acquisition_method_department: iter_acquisition_method_department,
+    get_calcard_top_departments: iter_calcard_top_departments,
+}
+
 # Example Usage
 if __name__ == "__main__":
     connection_string = 'mongodb://localhost:27017/'
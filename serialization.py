@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+Response encoding for the chat servers.
+
+Answers are serialized with orjson when it is installed (the stdlib json
+module otherwise). BSON and numpy values that handlers may return (ObjectId,
+datetime, Decimal128, numpy scalars and arrays) are encoded natively instead
+of failing: ObjectIds as strings, dates as ISO 8601 strings, decimals and
+numpy numbers as JSON numbers.
+
+The client chooses the response shape and encoding:
+- "orient": "columns" in the request body returns tabular `data` column-oriented,
+  {"columns": [...], "values": {column: [...]}}, so key names are not repeated per row;
+- Accept: application/msgpack (or application/x-msgpack) returns MessagePack if
+  msgpack is installed;
+- Accept-Encoding: br (if brotli is installed) or gzip compresses bodies of at
+  least RESPONSE_COMPRESS_MIN_BYTES (default 1024).
+
+Payload bytes (before and after compression) and encode time are recorded per
+intent and reported by /health.
+
+Usage:
+    curl -X POST localhost:5000/chat -H "Accept-Encoding: gzip" -H "Content-Type: application/json" \
+         -d '{"message": "Show the details of purchase order 4500123456", "orient": "columns"}' --compressed
+"""
+import gzip
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import date, datetime
+from decimal import Decimal
+
+from latency_stats import summarize_latencies
+from tracing import span
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+RESPONSE_COMPRESS_MIN_BYTES = int(os.environ.get("RESPONSE_COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def to_builtin(value):
+    """
+    JSON-compatible form of a value the encoders do not handle themselves.
+
+    Args:
+    - value (Any): An ObjectId, datetime, Decimal/Decimal128, numpy value, set or other object.
+
+    Returns:
+    - Any: A str, float, int or list; unknown types are encoded as their str().
+    """
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, "to_decimal"):  # bson.Decimal128
+        return float(value.to_decimal())
+    if hasattr(value, "tolist"):  # numpy arrays and scalars
+        return value.tolist()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    # ObjectId, Binary, Timestamp, ...
+    return str(value)
+
+
+def dumps(body):
+    """
+    Serialize a response body to compact JSON.
+
+    Returns:
+    - bytes: UTF-8 JSON.
+    """
+    if orjson is not None:
+        return orjson.dumps(body, default=to_builtin, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(body, default=to_builtin, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def dumps_text(body, **kwargs):
+    """
+    dumps() as a str, for text protocols (streamed NDJSON/SSE events); extra json.dumps arguments are ignored.
+    """
+    return dumps(body).decode("utf-8")
+
+
+def to_columns(rows):
+    """
+    Column-oriented form of a list of row dicts.
+
+    Args:
+    - rows (List[Dict]): Rows; rows may have different keys (missing values become None).
+
+    Returns:
+    - Dict: {"columns": [names in first-seen order], "values": {name: [value per row]}}.
+    """
+    columns = {}
+    for row in rows:
+        for key in row:
+            columns.setdefault(key, None)
+    names = list(columns)
+    return {"columns": names, "values": {name: [row.get(name) for row in rows] for name in names}}
+
+
+def orient_body(body, orient=None):
+    """
+    The body with tabular `data` (a non-empty list of dicts) column-oriented when orient is "columns".
+    """
+    data = body.get("data")
+    if orient != "columns" or not isinstance(data, list) or not data or not all(isinstance(row, dict) for row in data):
+        return body
+    return {**body, "data": to_columns(data), "orient": "columns"}
+
+
+def _accepted(header):
+    """
+    Tokens of an Accept or Accept-Encoding header with a non-zero quality.
+    """
+    tokens = set()
+    for part in (header or "").split(","):
+        token, _, params = part.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                pass
+        if token:
+            tokens.add(token.strip().lower())
+    return tokens
+
+
+def negotiate(accept=None, accept_encoding=None):
+    """
+    Response media type and content encoding for the request headers.
+
+    Returns:
+    - Tuple[str, str]: Media type ("application/json" or "application/msgpack") and content encoding
+      ("br", "gzip" or None).
+    """
+    media_type = "application/json"
+    if msgpack is not None and _accepted(accept) & set(MSGPACK_TYPES):
+        media_type = "application/msgpack"
+    encodings = _accepted(accept_encoding)
+    if brotli is not None and "br" in encodings:
+        return media_type, "br"
+    if "gzip" in encodings:
+        return media_type, "gzip"
+    return media_type, None
+
+
+def compress(content, encoding):
+    if encoding == "br":
+        return brotli.compress(content, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(content, compresslevel=GZIP_LEVEL, mtime=0)
+    return content
+
+
+class ResponseMetrics:
+    """
+    Payload size and encode time of the responses sent, per intent.
+
+    Args:
+    - window (int): Encode times kept per intent for the percentiles.
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self.intents = {}
+        self.lock = threading.Lock()
+
+    def record(self, intent, encoding, raw_bytes, wire_bytes, encode_ms):
+        with self.lock:
+            stats = self.intents.get(intent)
+            if stats is None:
+                stats = self.intents[intent] = {"responses": 0, "raw_bytes": 0, "wire_bytes": 0, "encodings": {},
+                                                "encode_ms": deque(maxlen=self.window)}
+            stats["responses"] += 1
+            stats["raw_bytes"] += raw_bytes
+            stats["wire_bytes"] += wire_bytes
+            stats["encodings"][encoding] = stats["encodings"].get(encoding, 0) + 1
+            stats["encode_ms"].append(encode_ms)
+
+    def as_dict(self):
+        """
+        Returns:
+        - Dict[str, Dict]: Per intent: responses, mean raw and sent bytes, compression ratio, encodings used
+          and the encode time summary (milliseconds, serialization plus compression).
+        """
+        with self.lock:
+            return {intent: {
+                "responses": stats["responses"],
+                "mean_raw_bytes": round(stats["raw_bytes"] / stats["responses"], 1),
+                "mean_wire_bytes": round(stats["wire_bytes"] / stats["responses"], 1),
+                "compression_ratio": round(stats["raw_bytes"] / max(stats["wire_bytes"], 1), 2),
+                "encodings": dict(stats["encodings"]),
+                "encode": summarize_latencies(list(stats["encode_ms"])),
+            } for intent, stats in self.intents.items()}
+
+
+class ResponseEncoder:
+    """
+    Encode response bodies according to the request's Accept / Accept-Encoding headers and orient.
+
+    Args:
+    - metrics (ResponseMetrics): Receives the size and timing of every response (None: not recorded).
+    - min_compress_bytes (int): Smaller bodies are sent uncompressed.
+    """
+
+    def __init__(self, metrics=None, min_compress_bytes=RESPONSE_COMPRESS_MIN_BYTES):
+        self.metrics = metrics
+        self.min_compress_bytes = min_compress_bytes
+
+    def encode(self, body, accept=None, accept_encoding=None, orient=None):
+        """
+        Returns:
+        - Tuple[bytes, Dict[str, str]]: The encoded body and the response headers (Content-Type,
+          Content-Encoding, Vary).
+        """
+        start = time.perf_counter()
+        with span("encode") as encode_span:
+            media_type, encoding = negotiate(accept, accept_encoding)
+            body = orient_body(body, orient)
+            if media_type == "application/msgpack":
+                content = msgpack.packb(body, default=to_builtin, strict_types=False)
+            else:
+                # Same line ending as Flask's jsonify
+                content = dumps(body) + b"\n"
+            raw_bytes = len(content)
+            if encoding and raw_bytes < self.min_compress_bytes:
+                encoding = None
+            content = compress(content, encoding)
+            encode_span.set(media_type=media_type, encoding=encoding or "identity", bytes=len(content))
+        encode_ms = (time.perf_counter() - start) * 1000
+
+        if self.metrics is not None:
+            self.metrics.record(body.get("intent") or "none", encoding or "identity", raw_bytes, len(content),
+                                encode_ms)
+        headers = {"Content-Type": media_type, "Vary": "Accept, Accept-Encoding"}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return content, headers
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+Worker side of the sharded aggregations (see sharded_aggregation.py).
+
+ShardedExecutor's pool processes are spawned, so they unpickle their
+functions from this module: it imports nothing but pymongo, and a worker
+does not load the analytics engines, the intent model or the app. When the
+app runs as a script, spawn also re-imports it in every worker; the app
+skips its startup there (startup.spawned_child_bootstrap).
+
+Each worker opens its own MongoClient (MongoClient is not fork-safe).
+"""
+_worker_collection = None
+
+
+def init_worker(connection_string, db_name, collection_name):
+    """
+    Pool initializer: connect this worker to the collection.
+    """
+    global _worker_collection
+    from pymongo import MongoClient
+    client = MongoClient(connection_string)
+    client.admin.command("ping")
+    _worker_collection = client[db_name][collection_name]
+
+
+def partial_aggregate(shard_filter, key, measure, top_k=None, order_by="sum"):
+    """
+    Partial aggregates (sum, count, min, max) per group for one shard.
+    """
+    group = {"_id": f"${key}" if key else None, "count": {"$sum": 1}}
+    if measure:
+        group.update({"sum": {"$sum": f"${measure}"}, "min": {"$min": f"${measure}"}, "max": {"$max": f"${measure}"},
+                      "values": {"$sum": {"$cond": [{"$isNumber": f"${measure}"}, 1, 0]}}})
+    pipeline = [{"$match": shard_filter}, {"$group": group}]
+    if top_k:
+        pipeline += [{"$sort": {order_by: -1}}, {"$limit": top_k}]
+    return list(_worker_collection.aggregate(pipeline, allowDiskUse=True))
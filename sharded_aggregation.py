@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+Sharded execution of the heavy group-by intents.
+
+A MongoDB aggregation runs on a single thread, so one $group over the whole
+collection cannot use more than one core. In this mode the collection is split
+into shards, either one per fiscal year or by hash of Purchase Order Number,
+and a process pool (one worker per core, each with its own MongoClient) runs
+the same $group on every shard. Workers return partial aggregates per group
+(sum, count, min, max), which are merged exactly: sums and counts add,
+minimums and maximums combine, and averages are computed from the merged
+sum and count of numeric values. When the group key is the shard key (Purchase Order Number
+with po_hash sharding) every group lives in exactly one shard, so workers only
+return their local top-k candidates.
+
+The results have the same shapes as the query_functions handlers. Running
+this module benchmarks each query against the single-pass handler and checks
+that the answers match.
+
+Hash sharding uses $toHashedIndexKey (MongoDB 7.0+). The workers run the
+lightweight shard_worker.py.
+
+Usage:
+    python sharded_aggregation.py --mode fiscal_year --workers 8 --output sharded_bench.json
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from latency_stats import summarize_latencies
+from query_functions import connect_to_mongodb, format_currency, intent_map
+from shard_worker import init_worker, partial_aggregate
+
+SHARD_MODES = ["fiscal_year", "po_hash"]
+
+
+class ShardedQuery:
+    """
+    A group-by that can be computed from per-shard partial aggregates.
+
+    Args:
+    - key (str): Field to group by (None for a single total).
+    - measure (str): Numeric field to aggregate (None to only count).
+    - order_by (str): "sum", "count" or "avg"; groups are sorted by it in descending order.
+    - limit (int): Keep only the top groups.
+    - format_row (Callable): (group value, merged partial) -> output row.
+    """
+
+    def __init__(self, key, measure, order_by="sum", limit=None, format_row=None):
+        self.key = key
+        self.measure = measure
+        self.order_by = order_by
+        self.limit = limit
+        self.format_row = format_row
+
+    def finalize(self, groups):
+        ordered = sorted(groups.items(), key=lambda item: _metric(item[1], self.order_by), reverse=True)
+        if self.limit:
+            ordered = ordered[:self.limit]
+        return [self.format_row(value, partial) for value, partial in ordered]
+
+
+def _metric(partial, name):
+    if name == "avg":
+        # Like $avg, only numeric values count towards the average
+        return partial["sum"] / partial["values"] if partial["values"] else 0
+    return partial[name] or 0
+
+
+# Heavy group-bys from query_functions.intent_map, with the same output shapes
+SHARDED_QUERIES = {
+    "department_spending_breakdown": ShardedQuery(
+        "Department Name", "Total Price",
+        format_row=lambda d, p: {"Department Name": d, "Total Spending": format_currency(p["sum"])}),
+    "acquisition_method_avg_price": ShardedQuery(
+        "Acquisition Method", "Unit Price", order_by="avg",
+        format_row=lambda m, p: {"Acquisition Method": m, "Average Price": round(_metric(p, "avg"), 2)}),
+    "acquisition_method_spending": ShardedQuery(
+        "Acquisition Method", "Total Price",
+        format_row=lambda m, p: {"Acquisition Method": m, "Total Spending": round(p["sum"], 2)}),
+    "acquisition_type_spending": ShardedQuery(
+        "Acquisition Type", "Total Price",
+        format_row=lambda t, p: {"Acquisition Type": t, "Total Spending": round(p["sum"], 2)}),
+    "acquisition_type_orders": ShardedQuery(
+        "Acquisition Type", None, order_by="count",
+        format_row=lambda t, p: {"Acquisition Type": t, "Total Orders": p["count"]}),
+    "avg_unit_price_by_category": ShardedQuery(
+        "Classification Codes", "Unit Price", order_by="avg",
+        format_row=lambda c, p: {"Classification Code": c, "Average Unit Price": round(_metric(p, "avg"), 2)}),
+    "calcard_total_spending": ShardedQuery(
+        "CalCard", "Total Price",
+        format_row=lambda c, p: {"CalCard": c, "Total Spending": round(p["sum"], 2)}),
+    "total_price_by_category": ShardedQuery(
+        "Classification Codes", "Total Price",
+        format_row=lambda c, p: {"Classification Code": c, "Total Price": round(p["sum"], 2)}),
+    "classification_spending_breakdown": ShardedQuery(
+        "Classification Codes", "Total Price",
+        format_row=lambda c, p: {"Classification Code": c, "Total Spending": round(p["sum"], 2)}),
+    "supplier_top_revenue": ShardedQuery(
+        "Supplier Name", "Total Price", limit=10,
+        format_row=lambda s, p: {"supplier_name": s, "total_revenue": p["sum"]}),
+    "frequent_items": ShardedQuery(
+        "Item Name", None, order_by="count", limit=5,
+        format_row=lambda i, p: {"Item Name": i, "Frequency": p["count"]}),
+    "highest_total_price_order": ShardedQuery(
+        "Purchase Order Number", "Total Price", limit=1,
+        format_row=lambda o, p: {"Purchase Order Number": o, "Total Price": round(p["sum"], 2)}),
+}
+
+
+def merge_partials(partials):
+    """
+    Merge per-shard partial aggregates exactly.
+
+    Args:
+    - partials (List[List[Dict]]): One list of {"_id", "sum", "count", "values", "min", "max"} per shard.
+
+    Returns:
+    - Dict[Any, Dict]: Group value -> merged partial aggregate.
+    """
+    merged = {}
+    for rows in partials:
+        for row in rows:
+            entry = merged.setdefault(row["_id"], {"sum": 0, "count": 0, "values": 0, "min": None, "max": None})
+            entry["sum"] += row.get("sum") or 0
+            entry["count"] += row["count"]
+            entry["values"] += row.get("values", 0)
+            for name, pick in (("min", min), ("max", max)):
+                if row.get(name) is not None:
+                    entry[name] = row[name] if entry[name] is None else pick(entry[name], row[name])
+    return merged
+
+
+# Coordinator side
+class ShardedExecutor:
+    """
+    Run SHARDED_QUERIES over a process pool.
+
+    Args:
+    - connection_string, db_name, collection_name (str): MongoDB location.
+    - mode (str): "fiscal_year" (one shard per fiscal year) or "po_hash" (hash of Purchase Order Number).
+    - workers (int): Pool size; defaults to one worker per core.
+    """
+
+    def __init__(self, connection_string="mongodb://localhost:27017/", db_name="purchases_large",
+                 collection_name="purchases_dataset", mode="fiscal_year", workers=None):
+        if mode not in SHARD_MODES:
+            raise ValueError(f"Unknown shard mode '{mode}'. Available modes: {', '.join(SHARD_MODES)}")
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self.collection = connect_to_mongodb(connection_string, db_name, collection_name)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=init_worker,
+                                        initargs=(connection_string, db_name, collection_name))
+        self.shards = self._shard_filters()
+
+    def _shard_filters(self):
+        if self.mode == "fiscal_year":
+            years = self.collection.distinct("Fiscal Year")
+            # Documents without a fiscal year form their own shard
+            return [{"Fiscal Year": year} for year in years] + [{"Fiscal Year": {"$nin": years}}]
+        shards = self.workers
+        hashed = {"$abs": {"$mod": [{"$toHashedIndexKey": "$Purchase Order Number"}, shards]}}
+        return [{"$expr": {"$eq": [hashed, shard]}} for shard in range(shards)]
+
+    def run(self, name):
+        """
+        Compute one of SHARDED_QUERIES across all shards.
+        """
+        query = SHARDED_QUERIES[name]
+        # Groups keyed by the shard key never span shards, so local top-k candidates are exact
+        top_k = query.limit if (self.mode == "po_hash" and query.key == "Purchase Order Number"
+                                and query.order_by != "avg") else None
+        futures = [self.pool.submit(partial_aggregate, shard, query.key, query.measure, top_k, query.order_by)
+                   for shard in self.shards]
+        return query.finalize(merge_partials(future.result() for future in futures))
+
+    def intent_map(self):
+        """
+        A copy of query_functions.intent_map with the sharded queries swapped in.
+        """
+        sharded = dict(intent_map)
+        for name in SHARDED_QUERIES:
+            sharded[name] = self._handler(name)
+        return sharded
+
+    def _handler(self, name):
+        # Takes only the collection, like the handler it replaces (so its answer can be cached)
+        def handler(collection):
+            return self.run(name)
+        handler.__name__ = intent_map[name].__name__
+        return handler
+
+    def close(self):
+        self.pool.shutdown()
+
+
+def _time(function, repeats):
+    result = function()
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return result, summarize_latencies(latencies)
+
+
+def main():
+    # Benchmark-only helpers: not imported by the app or by the shard workers
+    from bench_utils import compare_results, environment_info, write_report
+
+    parser = argparse.ArgumentParser(description="Benchmark sharded aggregation against single-pass handlers.")
+    parser.add_argument("--mode", choices=SHARD_MODES, default="fiscal_year")
+    parser.add_argument("--workers", type=int, help="Defaults to one per core.")
+    parser.add_argument("--queries", nargs="*", help="Subset of SHARDED_QUERIES.")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/")
+    parser.add_argument("--db", default="purchases_large")
+    parser.add_argument("--collection", default="purchases_dataset")
+    parser.add_argument("--output", default="sharded_bench.json")
+    args = parser.parse_args()
+
+    executor = ShardedExecutor(args.mongo_uri, args.db, args.collection, args.mode, args.workers)
+    print(f"{len(executor.shards)} shards ({args.mode}), {executor.workers} workers")
+    results = []
+    print(f"{'query':<40}{'single ms':>12}{'sharded ms':>12}{'speedup':>10}  match")
+    try:
+        for name in args.queries or sorted(SHARDED_QUERIES):
+            expected, single = _time(lambda: intent_map[name](executor.collection), args.repeats)
+            actual, sharded = _time(lambda: executor.run(name), args.repeats)
+            speedup = round(single["p50_ms"] / sharded["p50_ms"], 2) if sharded["p50_ms"] else math.nan
+            match = compare_results(expected, actual)
+            results.append({"query": name, "single_median_ms": single["p50_ms"], "single_p95_ms": single["p95_ms"],
+                            "sharded_median_ms": sharded["p50_ms"], "sharded_p95_ms": sharded["p95_ms"],
+                            "speedup": speedup, "match": match})
+            print(f"{name:<40}{single['p50_ms']:>12.1f}{sharded['p50_ms']:>12.1f}{speedup:>10}  {match}")
+    finally:
+        executor.close()
+
+    write_report({"environment": environment_info(), "mode": args.mode, "workers": executor.workers,
+                  "shards": len(executor.shards), "results": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
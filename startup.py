@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Startup profiling and background loading for the Flask apps.
+
+Every startup phase (imports, DB connect, tokenizer load, model load, warmup
+inference, ...) is timed by a StartupProfiler and printed as a breakdown once
+the app is ready, so cold-start time can be tracked as a number.
+
+STARTUP_MODE selects how the apps start:
+- "eager" (default): everything is loaded at import time, as before.
+- "lazy": heavy modules (transformers/torch, pymongo, analytics engines) are
+  imported by a background thread that also connects to MongoDB and loads and
+  warms the model. The app serves /health immediately (503 until ready) and
+  /chat answers 503 until the model is loaded.
+
+STARTUP_DB_TIMEOUT_MS (default 3000) bounds how long startup waits for MongoDB.
+
+Usage:
+    STARTUP_MODE=lazy python flask_app_complete_code.py
+    python startup.py flask_app_complete_code --mode lazy --output startup_profile.json
+"""
+import argparse
+import importlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+STARTUP_MODE = os.environ.get("STARTUP_MODE", "eager")
+STARTUP_DB_TIMEOUT_MS = int(os.environ.get("STARTUP_DB_TIMEOUT_MS", 3000))
+WARMUP_TEXT = "What is the total spending by department?"
+
+
+def spawned_child_bootstrap():
+    """
+    True while a spawned child process (inference replica, shard worker) re-imports the parent's main module.
+
+    multiprocessing's spawn start method imports the main script again in every child before running its
+    target; an app started as a script must not load its model or start its workers during that import.
+    (multiprocessing.parent_process() is only set after this import, so the flag spawn sets for it is used.)
+    """
+    return getattr(multiprocessing.current_process(), "_inheriting", False)
+
+
+class StartupProfiler:
+    """
+    Wall-clock timings of named startup phases, in milliseconds.
+    """
+
+    def __init__(self, mode=STARTUP_MODE):
+        self.mode = mode
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.ready_ms = None
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.phases[name] = self.phases.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    def mark_ready(self):
+        self.ready_ms = (time.perf_counter() - self.started) * 1000
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                "mode": self.mode,
+                "phases_ms": {name: round(ms, 2) for name, ms in self.phases.items()},
+                "ready_ms": round(self.ready_ms, 2) if self.ready_ms is not None else None,
+            }
+
+    def report(self):
+        print(f"Startup timing ({self.mode} mode):")
+        for name, ms in self.as_dict()["phases_ms"].items():
+            print(f"  {name:<20}{ms:>10.1f} ms")
+        if self.ready_ms is not None:
+            print(f"  {'ready after':<20}{self.ready_ms:>10.1f} ms")
+
+
+class StartupLoader:
+    """
+    Run the startup steps of an app, in the calling thread (eager) or a background thread (lazy).
+
+    Args:
+    - profiler (StartupProfiler): Receives the step timings.
+    - steps (List[Tuple[str, Callable]]): (phase name, function) pairs run in order. A step may time its own
+      sub-phases through the profiler; pass None as the name to skip the outer timing.
+    """
+
+    def __init__(self, profiler, steps):
+        self.profiler = profiler
+        self.steps = steps
+        self.ready = threading.Event()
+        self.finished = threading.Event()
+        self.error = None
+
+    def run(self):
+        for name, step in self.steps:
+            if name:
+                with self.profiler.phase(name):
+                    step()
+            else:
+                step()
+        self.profiler.mark_ready()
+        self.ready.set()
+        self.profiler.report()
+
+    def _run_logged(self):
+        try:
+            self.run()
+        except Exception as e:
+            self.error = e
+            logging.error(f"Startup failed: {e}")
+        finally:
+            self.finished.set()
+
+    def start(self, background=False):
+        if background:
+            threading.Thread(target=self._run_logged, name="startup-loader", daemon=True).start()
+        else:
+            self.run()
+            self.finished.set()
+        return self
+
+    def wait(self, timeout=None):
+        """
+        Wait until startup has finished; True if the app is ready, False if it failed or timed out.
+        """
+        self.finished.wait(timeout)
+        return self.ready.is_set()
+
+    def status(self):
+        """
+        Readiness for /health.
+
+        Returns:
+        - Tuple[Dict, int]: Status body ("ready", "loading" or "failed" plus the timings) and HTTP status code.
+        """
+        body = {"status": "ready" if self.ready.is_set() else "failed" if self.error else "loading",
+                "startup": self.profiler.as_dict()}
+        if self.error:
+            body["error"] = str(self.error)
+        return body, 200 if self.ready.is_set() else 503
+
+
+def load_intent_pipeline(model_path, profiler, warmup_text=WARMUP_TEXT):
+    """
+    Load the fine-tuned intent classifier with the tokenizer, model and warmup timed separately.
+
+    Returns:
+    - transformers.Pipeline: The text-classification pipeline.
+    """
+    with profiler.phase("imports_transformers"):
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
+    with profiler.phase("tokenizer_load"):
+        tokenizer = AutoTokenizer.from_pretrained(model_path)
+    with profiler.phase("model_load"):
+        model = AutoModelForSequenceClassification.from_pretrained(model_path)
+        nlp_model = pipeline("text-classification", model=model, tokenizer=tokenizer)
+    with profiler.phase("warmup_inference"):
+        nlp_model(warmup_text)
+    return nlp_model
+
+
+def connect_collection(connection_string, db_name, collection_name, profiler):
+    """
+    Connect to MongoDB (import and first round trip timed) and return the collection.
+    """
+    with profiler.phase("imports_pymongo"):
+        from pymongo import MongoClient
+    with profiler.phase("db_connect"):
+        client = MongoClient(connection_string)
+        # Probe with a short server-selection timeout so an unreachable server does not hold up readiness
+        # for pymongo's default 30 s; as before, queries then report the connection error themselves
+        probe = MongoClient(connection_string, serverSelectionTimeoutMS=STARTUP_DB_TIMEOUT_MS)
+        try:
+            probe.admin.command("ping")
+            client.admin.command("ping")
+        except Exception as e:
+            logging.error(f"MongoDB is not reachable: {e}")
+        finally:
+            probe.close()
+    return client[db_name][collection_name]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the cold start of a Flask app module.")
+    parser.add_argument("module", nargs="?", default="flask_app_complete_code")
+    parser.add_argument("--mode", choices=["eager", "lazy"], default=STARTUP_MODE)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--output", help="Write the timings as JSON to this file.")
+    args = parser.parse_args()
+
+    os.environ["STARTUP_MODE"] = args.mode
+    start = time.perf_counter()
+    module = importlib.import_module(args.module)
+    import_ms = (time.perf_counter() - start) * 1000
+    ready = module.startup.wait(args.timeout)
+    total_ms = (time.perf_counter() - start) * 1000
+
+    body, _ = module.startup.status()
+    body.update({"module": args.module, "module_import_ms": round(import_ms, 2), "cold_start_ms": round(total_ms, 2)})
+    print(f"Module import (time until /health answers): {import_ms:.1f} ms")
+    if ready:
+        print(f"Cold start until ready: {total_ms:.1f} ms")
+    else:
+        print(f"Not ready after {total_ms:.1f} ms: {body.get('error', 'timed out')}")
+    if args.output:
+        from bench_utils import write_report
+        write_report(body, args.output)
+
+
+if __name__ == "__main__":
+    main()
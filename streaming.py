@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Streamed /chat answers as NDJSON or Server-Sent Events.
+
+A streamed answer is a sequence of events:
+- {"type": "header", "intent": ...} as soon as the intent is detected, before the query runs;
+- {"type": "row", "data": {...}} for every result row, sent as it comes off the MongoDB cursor;
+- {"type": "end", "success": ..., "count": ..., "message": ...} once the rows are exhausted, or
+  {"type": "error", "count": ..., "message": ...} if the query fails part-way.
+
+NDJSON writes one JSON event per line (application/x-ndjson). SSE writes each event
+as "event: <type>" plus a "data:" line (text/event-stream), for EventSource clients.
+The client asks for a format with "format" in the request body or through its
+Accept header; NDJSON is the default.
+
+Usage:
+    curl -N -X POST localhost:5000/chat/stream -H "Content-Type: application/json" \
+         -d '{"message": "Which departments spend the most with CalCard?"}'
+    curl -N -X POST localhost:5000/chat/stream -H "Accept: text/event-stream" -d '{"message": "..."}' ...
+"""
+import json
+
+STREAM_FORMATS = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+
+def negotiate_format(requested=None, accept=None):
+    """
+    Pick the stream format from the request.
+
+    Args:
+    - requested (str): "ndjson" or "sse" from the request body, if given.
+    - accept (str): The Accept header.
+
+    Returns:
+    - str: "ndjson" or "sse".
+    """
+    if requested in STREAM_FORMATS:
+        return requested
+    if accept and STREAM_FORMATS["sse"] in accept:
+        return "sse"
+    return "ndjson"
+
+
+def encode_event(event, stream_format, dumps=json.dumps):
+    """
+    Encode one event for the wire.
+
+    Args:
+    - event (Dict): The event, with its "type".
+    - stream_format (str): "ndjson" or "sse".
+    - dumps (Callable): JSON encoder (serialization.dumps_text, so rows are encoded as in non-streamed answers).
+
+    Returns:
+    - str: The encoded event, newline-terminated.
+    """
+    data = dumps(event, separators=(",", ":"))
+    if stream_format == "sse":
+        return f"event: {event['type']}\ndata: {data}\n\n"
+    return data + "\n"
+
+
+def row_events(rows, message=None, success=True):
+    """
+    Row events followed by the end event (or an error event if iterating the rows fails).
+
+    Args:
+    - rows (Iterable[Dict]): The result rows, typically a lazy cursor-backed iterator.
+    - message (str): Final message; by default a count of the rows sent.
+    - success (bool): Outcome reported with an explicit message.
+
+    Returns:
+    - Iterator[Dict]: The events.
+    """
+    count = 0
+    try:
+        for row in rows:
+            yield {"type": "row", "data": row}
+            count += 1
+    except Exception as e:
+        yield {"type": "error", "count": count, "message": f"An error occurred: {str(e)}"}
+        return
+    if message is None:
+        success = count > 0
+        message = f"Found {count} results." if count else "No data found for the query."
+    yield {"type": "end", "success": success, "count": count, "message": message}
+
+
+def encode_stream(events, stream_format, dumps=json.dumps):
+    """
+    Encode a sequence of events lazily, one chunk per event.
+    """
+    for event in events:
+        yield encode_event(event, stream_format, dumps)
@@ -0,0 +1,399 @@
+# -*- coding: utf-8 -*-
+"""
+Lightweight request tracing for the chat servers.
+
+Every /chat request gets a trace whose spans time the phases of the answer:
+detect (intent model), extract (one span per message parameter, including the
+gazetteer `distinct` calls), admission (waiting for a slot), query (the
+handler's database work), format (generate_response) and encode (response
+serialization). Spans carry attributes such as the intent, the handler and
+its parameters, the rows returned, whether the call was coalesced and the
+number of MongoDB round trips (counted by a pymongo command listener).
+
+Every traced response has a Server-Timing header with the time per phase
+(e.g. "detect;dur=18.2, extract;dur=3.1, query;dur=41.0, total;dur=63.5") and
+a W3C traceparent header; an incoming traceparent is continued.
+
+Finished traces are exported in the background, batched, in the OTLP/HTTP JSON
+encoding:
+- TRACE_EXPORTER=file: appended as JSON lines to TRACE_FILE (default traces.jsonl);
+- TRACE_EXPORTER=otlp: posted to OTEL_EXPORTER_OTLP_ENDPOINT (default
+  http://localhost:4318) at /v1/traces, e.g. an OpenTelemetry Collector or Jaeger.
+With TRACE_EXPORTER=none (default) traces only feed the Server-Timing headers.
+
+Usage:
+    TRACE_EXPORTER=file TRACE_FILE=traces.jsonl python flask_app_complete_code.py
+    TRACE_EXPORTER=otlp OTEL_EXPORTER_OTLP_ENDPOINT=http://localhost:4318 python asgi_app.py
+"""
+import contextvars
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+
+TRACE_EXPORTER = os.environ.get("TRACE_EXPORTER", "none")
+TRACE_FILE = os.environ.get("TRACE_FILE", "traces.jsonl")
+OTLP_ENDPOINT = os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318")
+SERVICE_NAME = os.environ.get("OTEL_SERVICE_NAME", "procurement-chatbot")
+EXPORT_BATCH_SIZE = 64
+EXPORT_INTERVAL = 2.0
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_listener_installed = False
+
+
+class Span:
+    """
+    A timed phase of a request, with attributes.
+    """
+
+    def __init__(self, name, trace, parent_id=None, attributes=None):
+        self.name = name
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.start_perf = time.perf_counter_ns()
+        self.duration_ns = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+        return self
+
+    def add(self, key, amount=1):
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def end(self):
+        if self.duration_ns is None:
+            self.duration_ns = time.perf_counter_ns() - self.start_perf
+
+    def finish(self):
+        """
+        End a span started with start_span() and record it in its trace.
+        """
+        self.end()
+        self.trace.spans.append(self)
+
+    def elapsed_ms(self):
+        duration = self.duration_ns if self.duration_ns is not None else time.perf_counter_ns() - self.start_perf
+        return duration / 1e6
+
+
+class _NoopSpan:
+    # Returned outside a traced request, so instrumented code needs no checks
+    def set(self, **attributes):
+        return self
+
+    def add(self, key, amount=1):
+        pass
+
+    def finish(self):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """
+    The spans of one request under a root span.
+
+    Args:
+    - name (str): Root span name (e.g. "POST /chat").
+    - traceparent (str): Incoming W3C traceparent header to continue, if any.
+    - attributes: Root span attributes.
+    """
+
+    def __init__(self, name, traceparent=None, **attributes):
+        parent_id = None
+        parts = (traceparent or "").split("-")
+        if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+            self.trace_id, parent_id = parts[1], parts[2]
+        else:
+            self.trace_id = os.urandom(16).hex()
+        self.root = Span(name, self, parent_id, attributes)
+        self.spans = []
+
+    def activate(self):
+        """
+        Make the root span current in this thread / task, so span() calls attach to this trace.
+        """
+        _current_span.set(self.root)
+        return self
+
+    def deactivate(self):
+        _current_span.set(None)
+
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.root.span_id}-01"
+
+    def phase_ms(self):
+        """
+        Milliseconds per span name (summed over spans with the same name), in order of first start.
+        """
+        phases = {}
+        for span in sorted(self.spans, key=lambda s: s.start_perf):
+            if span.duration_ns is not None:
+                phases[span.name] = phases.get(span.name, 0.0) + span.duration_ns / 1e6
+        return phases
+
+    def server_timing(self):
+        """
+        Server-Timing header value for the phases finished so far plus the total.
+        """
+        entries = [f"{name};dur={ms:.2f}" for name, ms in self.phase_ms().items()]
+        entries.append(f"total;dur={self.root.elapsed_ms():.2f}")
+        return ", ".join(entries)
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time a phase as a child of the current span; a no-op outside a traced request.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+    child = Span(name, parent.trace, parent.span_id, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = str(e)
+        raise
+    finally:
+        child.end()
+        _current_span.reset(token)
+        parent.trace.spans.append(child)
+
+
+def start_span(name, **attributes):
+    """
+    A child of the current span that is not made current, for phases spread over a generator's
+    iterations (streamed answers); end it with finish().
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return NOOP_SPAN
+    return Span(name, parent.trace, parent.span_id, attributes)
+
+
+def current_span():
+    return _current_span.get() or NOOP_SPAN
+
+
+def current_server_timing():
+    """
+    Server-Timing of the current request so far ("" outside a traced request).
+    """
+    active = _current_span.get()
+    return active.trace.server_timing() if active is not None else ""
+
+
+def parse_server_timing(header):
+    """
+    Phase durations from a Server-Timing header (or a streamed end event's "server_timing").
+
+    Returns:
+    - Dict[str, float]: Milliseconds per phase, including "total"; phases without a duration are left out.
+    """
+    phases = {}
+    for entry in (header or "").split(","):
+        name, *params = [part.strip() for part in entry.split(";")]
+        for param in params:
+            if param.startswith("dur="):
+                try:
+                    phases[name] = float(param[4:])
+                except ValueError:
+                    pass
+    return phases
+
+
+def install_pymongo_listener():
+    """
+    Count MongoDB round trips (commands, including getMore) on the span that issued them.
+
+    Must run before the MongoClient is created; later calls are no-ops.
+    """
+    global _listener_installed
+    if _listener_installed:
+        return
+    from pymongo import monitoring
+
+    class RoundTripListener(monitoring.CommandListener):
+        def started(self, event):
+            active = _current_span.get()
+            if active is not None:
+                active.add("db.round_trips")
+                if active is not active.trace.root:
+                    active.trace.root.add("db.round_trips")
+
+        def succeeded(self, event):
+            pass
+
+        def failed(self, event):
+            pass
+
+    monitoring.register(RoundTripListener())
+    _listener_installed = True
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(span):
+    record = {
+        "traceId": span.trace.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": 2 if span is span.trace.root else 1,  # SERVER for the root, INTERNAL otherwise
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.start_ns + (span.duration_ns or 0)),
+        "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()],
+        "status": {"code": 2, "message": span.error} if span.error else {"code": 0},
+    }
+    if span.parent_id:
+        record["parentSpanId"] = span.parent_id
+    return record
+
+
+def to_otlp(traces):
+    """
+    OTLP/HTTP JSON export request (ExportTraceServiceRequest) for finished traces.
+    """
+    spans = [_otlp_span(s) for trace in traces for s in [trace.root] + trace.spans]
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": "procurement-chatbot.tracing"}, "spans": spans}],
+    }]}
+
+
+class BatchExporter:
+    """
+    Export finished traces from a background thread, in batches, so requests never wait on export.
+
+    The thread is started by the first submit in each process: threads are not carried into forked
+    children (prefork.py workers), so every worker starts its own, with a queue of its own.
+    """
+
+    def __init__(self, batch_size=EXPORT_BATCH_SIZE, interval=EXPORT_INTERVAL):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.queue = None
+        self.pid = None
+        self.lock = threading.Lock()
+        self.dropped = 0
+
+    def submit(self, trace):
+        if self.pid != os.getpid():
+            self._start()
+        try:
+            self.queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            # Traces queued by the parent before the fork are the parent's to export
+            self.queue = queue.Queue(maxsize=10000)
+            self.dropped = 0
+            threading.Thread(target=self._run, args=(self.queue,), name="trace-exporter", daemon=True).start()
+            self.pid = os.getpid()
+
+    def _run(self, traces):
+        while True:
+            batch = [traces.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size and time.monotonic() < deadline:
+                try:
+                    batch.append(traces.get(timeout=max(deadline - time.monotonic(), 0.01)))
+                except queue.Empty:
+                    break
+            try:
+                self.export(batch)
+            except Exception as e:
+                logging.warning(f"Trace export failed ({len(batch)} traces): {e}")
+
+    def export(self, traces):
+        raise NotImplementedError
+
+
+class FileExporter(BatchExporter):
+    """
+    Append each batch as one OTLP JSON line (the OpenTelemetry Collector file format).
+    """
+
+    def __init__(self, path=TRACE_FILE, **kwargs):
+        self.path = path
+        super().__init__(**kwargs)
+
+    def export(self, traces):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(to_otlp(traces), separators=(",", ":")) + "\n")
+
+
+class OTLPExporter(BatchExporter):
+    """
+    POST each batch to an OTLP/HTTP collector (JSON encoding).
+    """
+
+    def __init__(self, endpoint=OTLP_ENDPOINT, timeout=5, **kwargs):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def export(self, traces):
+        body = json.dumps(to_otlp(traces), separators=(",", ":")).encode("utf-8")
+        request = urllib.request.Request(self.url, data=body, method="POST",
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class Tracer:
+    """
+    Starts request traces and hands finished ones to the exporter.
+
+    Args:
+    - exporter (BatchExporter): Receives finished traces (None: not exported).
+    """
+
+    def __init__(self, exporter=None):
+        self.exporter = exporter
+
+    def start_trace(self, name, traceparent=None, **attributes):
+        return Trace(name, traceparent, **attributes)
+
+    def finish(self, trace, error=None):
+        trace.root.end()
+        if error is not None:
+            trace.root.error = str(error)
+        if self.exporter is not None:
+            self.exporter.submit(trace)
+
+
+def create_tracer_from_env():
+    """
+    Tracer exporting as configured by TRACE_EXPORTER ("none", "file" or "otlp").
+    """
+    if TRACE_EXPORTER == "file":
+        return Tracer(FileExporter())
+    if TRACE_EXPORTER == "otlp":
+        return Tracer(OTLPExporter())
+    return Tracer()
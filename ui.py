@@ -1,7 +1,15 @@
+import json
+import time
+
 import streamlit as st
 import requests
 import pandas as pd
 
+from tracing import parse_server_timing
+
+# Answers stream in row by row (see streaming.py); the table is redrawn at most this often, in seconds
+TABLE_REFRESH_INTERVAL = 0.25
+
 # Initialize session state for storing messages
 if "messages" not in st.session_state:
     st.session_state["messages"] = [{"role": "bot", "content": "Hi, how may I assist you today?"}]
@@ -25,29 +33,59 @@ if st.button("Send"):
     if user_query.strip():  # Ensure the input is not empty
         with st.spinner("Processing..."):
             try:
-                # Call the Flask backend
-                response = requests.post("http://127.0.0.1:5000/chat", json={"message": user_query})
-                if response.status_code == 200:
-                    response_data = response.json()
-
-                    # Extract and handle the bot's reply
-                    if response_data.get("success"):
-                        bot_reply = response_data.get("message", "The assistant responded, but no message was found.")
-
-                        # Check if the response contains structured tabular data
-                        if "data" in response_data and isinstance(response_data["data"], list):
-                            st.write("### Tabular Response")
-                            df = pd.DataFrame(response_data["data"])
-                            st.table(df)  # Display the tabular data as a table
-                        else:
-                            # Append the user's query and bot's response to the chat history
-                            st.session_state["messages"].append({"role": "user", "content": user_query})
-                            st.session_state["messages"].append({"role": "bot", "content": bot_reply})
-                            st.write(f"**🤖 Bot:** {bot_reply}")
+                # Call the Flask backend; the answer arrives as NDJSON events
+                with requests.post("http://127.0.0.1:5000/chat/stream",
+                                   json={"message": user_query, "format": "ndjson"}, stream=True) as response:
+                    if response.status_code != 200:
+                        # Busy (429) and still-starting (503) responses carry a message for the user
+                        try:
+                            message = response.json().get("message")
+                        except ValueError:
+                            message = None
+                        st.error(message or f"Server error: {response.status_code}. Please try again later.")
+                    elif not response.headers.get("Content-Type", "").startswith("application/x-ndjson"):
+                        # Messages rejected before streaming starts are answered with a plain JSON body
+                        st.error(response.json().get("message", "An error occurred while processing your request."))
                     else:
-                        st.error(response_data.get("message", "An error occurred while processing your request."))
-                else:
-                    st.error(f"Server error: {response.status_code}. Please try again later.")
+                        rows, table, last_refresh = [], None, 0.0
+                        for line in response.iter_lines():
+                            if not line:
+                                continue
+                            event = json.loads(line)
+
+                            if event["type"] == "header":
+                                st.caption(f"Intent: {event['intent']}")
+
+                            elif event["type"] == "row":
+                                # Show the rows received so far while the rest are still arriving
+                                rows.append(event["data"])
+                                if table is None:
+                                    st.write("### Tabular Response")
+                                    table = st.empty()
+                                if time.monotonic() - last_refresh >= TABLE_REFRESH_INTERVAL:
+                                    table.dataframe(pd.DataFrame(rows))
+                                    last_refresh = time.monotonic()
+
+                            elif event["type"] == "end":
+                                if table is not None:
+                                    table.dataframe(pd.DataFrame(rows))  # Display the complete tabular data
+                                phases = parse_server_timing(event.get("server_timing"))
+                                if phases:
+                                    st.caption("Server time: " + " · ".join(f"{name} {ms:.0f} ms"
+                                                                            for name, ms in phases.items()))
+                                if not event["success"]:
+                                    st.error(event.get("message", "An error occurred while processing your request."))
+                                elif not rows:
+                                    bot_reply = event.get("message", "The assistant responded, but no message was found.")
+                                    # Append the user's query and bot's response to the chat history
+                                    st.session_state["messages"].append({"role": "user", "content": user_query})
+                                    st.session_state["messages"].append({"role": "bot", "content": bot_reply})
+                                    st.write(f"**🤖 Bot:** {bot_reply}")
+
+                            elif event["type"] == "error":
+                                if table is not None:
+                                    table.dataframe(pd.DataFrame(rows))
+                                st.error(event["message"])
             except requests.exceptions.RequestException as e:
                 st.error(f"Error communicating with the server: {e}")
     else:
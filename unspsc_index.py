@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+UNSPSC hierarchy index with precomputed rollups.
+
+UNSPSC codes are 8 digits: segment (2), family (4), class (6) and commodity
+(8). At ingest every purchase line's code (Normalized UNSPSC, or the first
+8-digit code in Classification Codes) is parsed into those four levels, and
+spending, quantity, line count and unit-price sum are rolled up for every
+prefix. Questions such as "spending in segment 43" or "top families in
+segment 44" are then answered by a dictionary lookup instead of a scan with
+string-prefix logic.
+
+The index is rebuilt at ingest (main.py) and saved to UNSPSC_INDEX_PATH
+(default "unspsc_index.json").
+
+Usage:
+    python unspsc_index.py build
+    python unspsc_index.py query "spending in segment 43"
+"""
+import argparse
+import json
+import os
+import re
+
+from query_functions import format_currency, format_large_number
+
+UNSPSC_INDEX_PATH = os.environ.get("UNSPSC_INDEX_PATH", "unspsc_index.json")
+LEVELS = {"segment": 2, "family": 4, "class": 6, "commodity": 8}
+LEVEL_BY_LENGTH = {length: level for level, length in LEVELS.items()}
+MEASURES = ["spending", "quantity", "count", "unit_price_sum"]
+CODE_PATTERN = re.compile(r"\b(\d{8})\b")
+QUERY_PATTERN = re.compile(r"\b(segments?|famil(?:y|ies)|class(?:es)?|commodit(?:y|ies))\b(?:\s+(?:code\s+)?(\d{2,8}))?")
+
+
+def parse_unspsc(normalized=None, classification_codes=None):
+    """
+    The 8-digit UNSPSC code of a purchase line, or None.
+
+    Args:
+    - normalized: Normalized UNSPSC value (number or string; 0 when missing).
+    - classification_codes (str): Raw Classification Codes, used when Normalized UNSPSC is missing.
+    """
+    try:
+        code = int(float(normalized))
+        if 10000000 <= code <= 99999999:
+            return str(code)
+    except (TypeError, ValueError):
+        pass
+    match = CODE_PATTERN.search(str(classification_codes or ""))
+    return match.group(1) if match else None
+
+
+def _level_name(level):
+    return level.capitalize()
+
+
+class UnspscIndex:
+    """
+    Rollups per UNSPSC prefix at every level.
+
+    Args:
+    - rollups (Dict[str, Dict[str, Dict[str, float]]]): Level -> prefix -> measure totals.
+    - unclassified (Dict[str, float]): Totals of lines without a parsable code.
+    """
+
+    def __init__(self, rollups, unclassified):
+        self.rollups = rollups
+        self.unclassified = unclassified
+
+    @classmethod
+    def build(cls, rows):
+        """
+        Args:
+        - rows (Iterable[Dict]): Pre-aggregated rows with "unspsc", "codes" and the MEASURES totals.
+        """
+        rollups = {level: {} for level in LEVELS}
+        unclassified = dict.fromkeys(MEASURES, 0)
+        for row in rows:
+            code = parse_unspsc(row.get("unspsc"), row.get("codes"))
+            targets = ([rollups[level].setdefault(code[:length], dict.fromkeys(MEASURES, 0))
+                        for level, length in LEVELS.items()] if code else [unclassified])
+            for totals in targets:
+                for measure in MEASURES:
+                    totals[measure] += row.get(measure) or 0
+        return cls(rollups, unclassified)
+
+    def save(self, path=UNSPSC_INDEX_PATH):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"rollups": self.rollups, "unclassified": self.unclassified}, f)
+        print(f"UNSPSC index with {len(self.rollups['commodity']):,} commodities saved to {path}")
+
+    @classmethod
+    def load(cls, path=UNSPSC_INDEX_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["rollups"], data["unclassified"])
+
+    def lookup(self, prefix):
+        """
+        Totals for a segment, family, class or commodity code (level inferred from its length).
+        """
+        level = LEVEL_BY_LENGTH.get(len(prefix))
+        return self.rollups[level].get(prefix) if level else None
+
+    def top(self, level, prefix="", k=10, measure="spending"):
+        """
+        The k largest entries of a level, optionally under a parent prefix.
+
+        Returns:
+        - List[Tuple[str, Dict]]: (code, totals), largest first.
+        """
+        entries = [(code, totals) for code, totals in self.rollups[level].items() if code.startswith(prefix)]
+        entries.sort(key=lambda entry: entry[1][measure], reverse=True)
+        return entries[:k] if k else entries
+
+
+def rows_from_collection(collection):
+    """
+    Aggregate the purchases collection per distinct code pair, ready for UnspscIndex.build.
+    """
+    pipeline = [
+        {"$group": {
+            "_id": {"unspsc": "$Normalized UNSPSC", "codes": "$Classification Codes"},
+            "spending": {"$sum": "$Total Price"},
+            "quantity": {"$sum": "$Quantity"},
+            "count": {"$sum": 1},
+            "unit_price_sum": {"$sum": "$Unit Price"},
+        }},
+    ]
+    for row in collection.aggregate(pipeline, allowDiskUse=True):
+        yield {**row["_id"], **{measure: row[measure] for measure in MEASURES}}
+
+
+def build_from_collection(collection, path=UNSPSC_INDEX_PATH):
+    """
+    Build and save the UNSPSC index for the purchases collection.
+    """
+    index = UnspscIndex.build(rows_from_collection(collection))
+    index.save(path)
+    return index
+
+
+_indexes = {}
+
+
+def get_unspsc_index(collection, path=UNSPSC_INDEX_PATH):
+    """
+    The UNSPSC index, loaded from `path` or built from the collection on first use.
+    """
+    if path not in _indexes:
+        if os.path.exists(path):
+            _indexes[path] = UnspscIndex.load(path)
+        else:
+            print(f"UNSPSC index not found at {path}; building it from the collection...")
+            _indexes[path] = build_from_collection(collection, path)
+    return _indexes[path]
+
+
+def _parse_level(word, code):
+    level = next(name for name in LEVELS if word.startswith(name[:5]))
+    if code and len(code) != LEVELS[level]:
+        # "family 4321" is fine; "segment 4321" really names a family
+        level = LEVEL_BY_LENGTH.get(len(code), level)
+    return level
+
+
+def parse_hierarchy_query(query):
+    """
+    Find a UNSPSC level, an optional code and an optional parent code in a question.
+
+    Returns:
+    - Tuple[str, str, str]: (level, code or None, parent code or None), e.g. ("segment", "43", None) for
+      "spending in segment 43" or ("family", None, "44") for "top families in segment 44"; None if no
+      level is mentioned.
+    """
+    mentions = [(_parse_level(word, code), code) for word, code in QUERY_PATTERN.findall(query.lower())]
+    if not mentions:
+        return None
+    coded = next(((level, code) for level, code in mentions if code), None)
+    asked = next((level for level, code in mentions if not code), None)
+    if asked and coded and LEVELS[asked] > len(coded[1]):
+        return asked, None, coded[1]
+    if coded:
+        return coded[0], coded[1], None
+    return asked, None, None
+
+
+def _totals_row(level, code, totals):
+    return {
+        _level_name(level): code,
+        "Total Spending": format_currency(totals["spending"]),
+        "Total Quantity": format_large_number(totals["quantity"]),
+        "Line Items": totals["count"],
+        "Average Unit Price": round(totals["unit_price_sum"] / totals["count"], 2) if totals["count"] else 0,
+    }
+
+
+def get_classification_rollup(collection, query, top_n=10, path=UNSPSC_INDEX_PATH):
+    """
+    Answer a segment/family/class/commodity question from the UNSPSC index.
+
+    Args:
+    - collection: Data source (only used to build the index if it is missing).
+    - query (str): The user's question, e.g. "spending in segment 43" or "top families in segment 44".
+
+    Returns:
+    - Dict or List[Dict]: Totals for the code with a breakdown of its children, or the top entries of a level.
+    """
+    parsed = parse_hierarchy_query(query)
+    if not parsed:
+        return {"Message": "No UNSPSC segment, family, class or commodity found in the query."}
+    level, code, parent = parsed
+    index = get_unspsc_index(collection, path)
+
+    if not code:
+        top = index.top(level, prefix=parent or "", k=top_n)
+        if not top and parent:
+            return {"Message": f"No purchases found for UNSPSC {LEVEL_BY_LENGTH[len(parent)]} {parent}."}
+        return [_totals_row(level, c, totals) for c, totals in top]
+
+    totals = index.lookup(code)
+    if not totals:
+        return {"Message": f"No purchases found for UNSPSC {level} {code}."}
+    result = _totals_row(level, code, totals)
+    child_levels = [name for name, length in LEVELS.items() if length > len(code)]
+    if child_levels:
+        child = child_levels[0]
+        result["Breakdown"] = [_totals_row(child, c, t) for c, t in index.top(child, prefix=code, k=top_n)]
+    return result
+
+
+def format_classification_rollup(result):
+    """
+    Readable text for a get_classification_rollup result.
+    """
+    if isinstance(result, dict) and "Message" in result:
+        return result["Message"]
+    if not result:
+        return "No purchases found for that UNSPSC level."
+
+    def line(row):
+        level = next(key for key in row if key in {_level_name(name) for name in LEVELS})
+        return f"{level} {row[level]}: {row['Total Spending']} spent, {row['Line Items']} line items"
+
+    if isinstance(result, list):
+        return "\n".join(line(row) for row in result)
+    breakdown = [f"  {line(row)}" for row in result.get("Breakdown", [])]
+    return "\n".join([line(result)] + breakdown)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the UNSPSC hierarchy index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build")
+    query = subparsers.add_parser("query")
+    query.add_argument("question")
+    for sub in (build, query):
+        sub.add_argument("--index", default=UNSPSC_INDEX_PATH)
+        sub.add_argument("--mongo-uri", default="mongodb://localhost:27017/")
+        sub.add_argument("--db", default="purchases_large")
+        sub.add_argument("--collection", default="purchases_dataset")
+    args = parser.parse_args()
+
+    from query_functions import connect_to_mongodb
+    collection = connect_to_mongodb(args.mongo_uri, args.db, args.collection)
+    if args.command == "build":
+        build_from_collection(collection, args.index)
+    else:
+        print(json.dumps(get_classification_rollup(collection, args.question, path=args.index), indent=2))
+
+
+if __name__ == "__main__":
+    main()